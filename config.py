@@ -6,5 +6,86 @@ load_dotenv()
 class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     GROUP_CHAT_ID = os.getenv("GROUP_CHAT_ID")
-    
-config = Config() 
\ No newline at end of file
+
+    # Хранилище данных: json или sqlite
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+    # Каталог с данными (JSON коллекции, журналы, базы SQLite)
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(DATA_DIR, "bot.sqlite3"))
+
+    # Режим JSON хранилища: file - перезапись файла целиком, wal - журнал изменений,
+    # memory - данные в памяти с фоновым сохранением
+    JSON_STORAGE_MODE = os.getenv("JSON_STORAGE_MODE", "file")
+    # Количество записей в журнале, после которого он сворачивается в снапшот
+    WAL_COMPACT_THRESHOLD = int(os.getenv("WAL_COMPACT_THRESHOLD", "500"))
+    # Интервал фонового сохранения в режиме memory (секунды)
+    MEMORY_FLUSH_INTERVAL = float(os.getenv("MEMORY_FLUSH_INTERVAL", "5"))
+    # Окно объединения одновременных изменений файла в режиме file (секунды)
+    GROUP_COMMIT_WINDOW = float(os.getenv("GROUP_COMMIT_WINDOW", "0.01"))
+
+    # Кэш хранилища: максимальное число записей и время жизни (секунды)
+    CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "1024"))
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+    # Окна статистики посещений в днях и окно по умолчанию
+    ATTENDANCE_WINDOWS = [int(days) for days in os.getenv("ATTENDANCE_WINDOWS", "7,30,90").split(",")]
+    ATTENDANCE_STATS_WINDOW = int(os.getenv("ATTENDANCE_STATS_WINDOW", "30"))
+    # Сколько дней хранит индекс посещаемости: самое длинное из окон
+    ATTENDANCE_HORIZON = max(ATTENDANCE_WINDOWS + [ATTENDANCE_STATS_WINDOW])
+
+    # Через сколько начислений сохранять снапшот баланса команды в журнале баллов
+    LEDGER_SNAPSHOT_EVERY = int(os.getenv("LEDGER_SNAPSHOT_EVERY", "100"))
+
+    # Число участников на одной странице панели отметки присутствия
+    ATTENDANCE_PAGE_SIZE = int(os.getenv("ATTENDANCE_PAGE_SIZE", "10"))
+
+    # Поиск участников в inline режиме: число вариантов и время кэширования ответа в Telegram (секунды)
+    INLINE_RESULTS_LIMIT = int(os.getenv("INLINE_RESULTS_LIMIT", "50"))
+    INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "30"))
+
+    # Минимальный интервал между изменениями клавиатуры одного сообщения (секунды)
+    EDIT_DEBOUNCE_INTERVAL = float(os.getenv("EDIT_DEBOUNCE_INTERVAL", "0.5"))
+    # Для скольких последних сообщений помнить отправленную клавиатуру и время изменения
+    EDIT_TRACKED_MESSAGES = int(os.getenv("EDIT_TRACKED_MESSAGES", "1000"))
+
+    # Лимиты исходящих запросов к Bot API (запросов в секунду):
+    # всего, в личный чат и в группу (20 сообщений в минуту)
+    OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+    OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+    OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", str(20 / 60)))
+
+    # Адрес Bot API (например, локального тестового сервера), по умолчанию api.telegram.org
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+    # Бюджет времени холодного запуска (секунды), 0 - без проверки
+    STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "3"))
+
+    # Локальный HTTP сервер метрик в формате Prometheus (GET /metrics), порт 0 - отключен.
+    # В режиме нескольких воркеров воркер i слушает METRICS_PORT + i
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    # Webhook: внешний адрес (за обратным прокси), путь и секретный токен (обязателен)
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    # Адрес локального webhook сервера (по умолчанию доступен только обратному прокси на этой машине)
+    WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+    WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+    # Максимум одновременно обрабатываемых обновлений
+    WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "100"))
+    # Сколько ждать обработки принятых обновлений при остановке (секунды)
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "25"))
+
+    # Число процессов-воркеров (больше 1 - режим нескольких воркеров, нужен STORAGE_BACKEND=sqlite)
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    # Хранилище состояний FSM: sqlite (сохраняется между перезапусками) или memory
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+    # База состояний FSM, общая для воркеров
+    FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", os.path.join(DATA_DIR, "fsm.sqlite3"))
+    # Через сколько секунд без изменений сессия FSM считается брошенной
+    FSM_TTL = float(os.getenv("FSM_TTL", str(24 * 60 * 60)))
+
+config = Config()
\ No newline at end of file
@@ -1,9 +1,21 @@
-from .json_storage import db
+from config import config
+
+if config.STORAGE_BACKEND == "sqlite":
+    from .sqlite_storage import SqliteStorage
+    db = SqliteStorage(config.SQLITE_PATH)
+else:
+    from .json_storage import JsonStorage
+    db = JsonStorage()
 
 async def init_db():
     """
     Функция инициализации базы данных.
-    В случае с JSON просто убеждаемся, что все файлы созданы
+    Для JSON файлы создаются при инициализации JsonStorage, здесь коллекции
+    открываются (в режиме журнала - загружаются и восстанавливаются).
+    Для SQLite создается схема.
     """
-    # JsonStorage создаст все необходимые файлы при инициализации
-    pass 
\ No newline at end of file
+    await db.open()
+
+async def close_db():
+    """Закрытие базы данных при остановке бота"""
+    await db.close()
@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+MISSING = object()
+
+class StorageCache:
+    """
+    LRU кэш с ограничением размера и временем жизни записей.
+    У каждой коллекции есть счетчик поколений, который увеличивается при
+    каждой записи: записи кэша от предыдущих поколений считаются устаревшими.
+    Закрепленные записи (снимки коллекций) хранятся отдельно от LRU и не
+    вытесняются производными значениями, сколько бы тех ни было.
+    """
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, float, Any]]" = OrderedDict()
+        self._pinned: Dict[Tuple[str, Hashable], Tuple[int, float, Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self, collection: str) -> int:
+        return self._generations.get(collection, 0)
+
+    def bump(self, collection: str) -> None:
+        """Новое поколение коллекции после записи"""
+        self._generations[collection] = self.generation(collection) + 1
+
+    def get(self, collection: str, key: Hashable) -> Any:
+        """Возвращает значение или MISSING"""
+        entries = self._pinned if (collection, key) in self._pinned else self._entries
+        entry = entries.get((collection, key))
+        if entry is not None:
+            generation, expires_at, value = entry
+            if generation == self.generation(collection) and expires_at > time.monotonic():
+                if entries is self._entries:
+                    self._entries.move_to_end((collection, key))
+                self.hits += 1
+                return value
+            del entries[(collection, key)]
+        self.misses += 1
+        return MISSING
+
+    def set(
+        self,
+        collection: str,
+        key: Hashable,
+        value: Any,
+        generation: Optional[int] = None,
+        pinned: bool = False
+    ) -> None:
+        """
+        Сохранение значения. generation - поколение коллекции на момент начала
+        чтения: если за время чтения была запись, значение не попадет в кэш.
+        pinned - запись не участвует в LRU и не вытесняется.
+        """
+        if generation is None:
+            generation = self.generation(collection)
+        if generation != self.generation(collection) or self.maxsize <= 0:
+            return
+        if pinned:
+            self._pinned[(collection, key)] = (generation, time.monotonic() + self.ttl, value)
+            return
+        self._entries[(collection, key)] = (generation, time.monotonic() + self.ttl, value)
+        self._entries.move_to_end((collection, key))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, collection: str, key: Hashable) -> None:
+        self._entries.pop((collection, key), None)
+        self._pinned.pop((collection, key), None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "pinned": len(self._pinned),
+            "maxsize": self.maxsize,
+            "hit_rate": (self.hits / total * 100) if total else 0
+        }
@@ -0,0 +1,188 @@
+import asyncio
+from typing import Dict, List, Optional
+from utils.logger import logger
+from utils.error_handler import DatabaseError
+from database.persistence import read_json_file, write_json_file, apply_ops
+from database.wal import WriteAheadLog
+from database.writer import GroupCommitWriter
+
+class FileEngine:
+    """
+    Режим по умолчанию: коллекции хранятся только в файлах.
+    Все изменения файла проходят через его единственного писателя,
+    который объединяет одновременные изменения в одну запись.
+    """
+    def __init__(self, commit_window: float) -> None:
+        self.commit_window = commit_window
+        self._writers: Dict[str, GroupCommitWriter] = {}
+
+    async def open(self, paths: List[str]) -> None:
+        pass
+
+    async def load(self, path: str) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, read_json_file, path)
+
+    async def mutate(self, path: str, ops: List[Dict]) -> Dict:
+        writer = self._writers.get(path)
+        if writer is None:
+            writer = self._writers[path] = GroupCommitWriter(path, self.commit_window)
+        return await writer.submit(ops)
+
+    async def sync(self, paths: List[str]) -> None:
+        """Изменение уже на диске, когда mutate возвращает управление"""
+
+    async def close(self) -> None:
+        for writer in self._writers.values():
+            await writer.close()
+
+class InMemoryEngine:
+    """Базовый движок: коллекции загружаются один раз и хранятся в памяти"""
+    def __init__(self) -> None:
+        self._data: Dict[str, Dict] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def open(self, paths: List[str]) -> None:
+        for path in paths:
+            await self._open_collection(path)
+
+    async def _open_collection(self, path: str) -> None:
+        if path in self._data:
+            return
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, self._read_collection, path)
+        self._data[path] = data
+        self._locks[path] = asyncio.Lock()
+
+    def _read_collection(self, path: str) -> Dict:
+        return read_json_file(path)
+
+    async def load(self, path: str) -> Dict:
+        await self._open_collection(path)
+        return self._data[path]
+
+class WalEngine(InMemoryEngine):
+    """
+    Режим журнала изменений: коллекции держатся в памяти,
+    изменения дописываются в журнал за O(размер записи).
+    """
+    def __init__(self, compact_threshold: int) -> None:
+        super().__init__()
+        self.compact_threshold = compact_threshold
+        self._logs: Dict[str, WriteAheadLog] = {}
+
+    def _read_collection(self, path: str) -> Dict:
+        wal = WriteAheadLog(path)
+        data = wal.load()
+        self._logs[path] = wal
+        logger.info(f"Коллекция {path} загружена, записей в журнале: {wal.records}")
+        return data
+
+    async def mutate(self, path: str, ops: List[Dict]) -> Dict:
+        await self._open_collection(path)
+        wal = self._logs[path]
+        data = self._data[path]
+        loop = asyncio.get_running_loop()
+
+        async with self._locks[path]:
+            applied = apply_ops(data, ops)
+            try:
+                await loop.run_in_executor(None, wal.append, applied)
+            except Exception as e:
+                # Запись в журнал не удалась - сохраняем состояние снапшотом
+                logger.error(f"Ошибка записи в журнал {wal.log_path}: {e}")
+                await self._compact(path)
+                return data
+
+            if wal.records >= self.compact_threshold:
+                await self._compact(path)
+        return data
+
+    async def sync(self, paths: List[str]) -> None:
+        """Записи журнала сбрасываются на диск в mutate"""
+
+    async def _compact(self, path: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._logs[path].compact, self._data[path])
+        except Exception as e:
+            raise DatabaseError(f"Ошибка при сворачивании журнала {path}", {"error": str(e)})
+
+    async def close(self) -> None:
+        for path, wal in self._logs.items():
+            async with self._locks[path]:
+                if wal.records:
+                    await self._compact(path)
+                wal.close()
+
+class MemoryEngine(InMemoryEngine):
+    """
+    Режим памяти: все чтения обслуживаются из памяти, измененные коллекции
+    сбрасываются на диск в фоне раз в flush_interval секунд и при остановке.
+    """
+    def __init__(self, flush_interval: float) -> None:
+        super().__init__()
+        self.flush_interval = flush_interval
+        self._dirty = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def open(self, paths: List[str]) -> None:
+        await super().open(paths)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def mutate(self, path: str, ops: List[Dict]) -> Dict:
+        await self._open_collection(path)
+        async with self._locks[path]:
+            apply_ops(self._data[path], ops)
+            self._dirty.add(path)
+        return self._data[path]
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Остановка цикла не должна прерывать запись файла на середине
+            await asyncio.shield(self.flush())
+
+    async def flush(self, paths: Optional[List[str]] = None) -> None:
+        """Сброс измененных коллекций (по умолчанию всех) на диск"""
+        loop = asyncio.get_running_loop()
+        for path in [path for path in list(self._dirty) if paths is None or path in paths]:
+            # Блокировка не дает изменять коллекцию, пока она сериализуется в потоке
+            async with self._locks[path]:
+                self._dirty.discard(path)
+                try:
+                    await loop.run_in_executor(None, write_json_file, path, self._data[path])
+                except Exception as e:
+                    self._dirty.add(path)
+                    logger.error(f"Ошибка при сохранении {path}: {e}")
+
+    async def sync(self, paths: List[str]) -> None:
+        """Немедленный сброс коллекций paths, не дожидаясь фонового сохранения"""
+        await self.flush(paths)
+        failed = sorted(self._dirty.intersection(paths))
+        if failed:
+            raise DatabaseError("Не удалось сохранить коллекции", {"collections": failed})
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        if self._dirty:
+            raise DatabaseError("Не удалось сохранить коллекции", {"collections": sorted(self._dirty)})
+
+def create_engine(mode: str, wal_compact_threshold: int = 500, flush_interval: float = 5.0,
+                  commit_window: float = 0.01):
+    """Создание движка хранения по режиму из конфигурации"""
+    if mode == "wal":
+        return WalEngine(wal_compact_threshold)
+    if mode == "memory":
+        return MemoryEngine(flush_interval)
+    if mode == "file":
+        return FileEngine(commit_window)
+    raise DatabaseError(f"Неизвестный режим хранения: {mode}")
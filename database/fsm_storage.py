@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Union
+from aiogram.dispatcher.storage import BaseStorage
+from utils.logger import logger
+from utils.error_handler import DatabaseError
+
+Address = Union[str, int, None]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    chat TEXT NOT NULL,
+    user TEXT NOT NULL,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    bucket TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (chat, user)
+);
+CREATE INDEX IF NOT EXISTS fsm_updated ON fsm(updated_at);
+"""
+
+def encode(value: Dict) -> str:
+    """Компактная запись данных состояния: JSON без пробелов"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+class SqliteFSMStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в SQLite.
+    Одна база может использоваться несколькими процессами бота одновременно,
+    состояния сохраняются между перезапусками. Сессии, не менявшиеся дольше
+    ttl секунд, считаются брошенными: они не читаются и удаляются при записи
+    (не чаще раза в purge_interval секунд).
+    """
+    def __init__(self, db_path: str, ttl: float = 0, purge_interval: float = 60) -> None:
+        self.db_path = db_path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._purged = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Состояния можно потерять при сбое питания, но не при падении процесса
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _execute(self, func: Callable[[sqlite3.Connection], object], write: bool = True):
+        """Выполнение функции в потоке базы данных одной транзакцией"""
+        def run():
+            conn = self._connect()
+            try:
+                with conn:
+                    if write:
+                        conn.execute("BEGIN IMMEDIATE")
+                        self._purge(conn)
+                    return func(conn)
+            except sqlite3.Error as e:
+                raise DatabaseError("Ошибка хранилища состояний", {"error": str(e)})
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run)
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl if self.ttl else 0
+
+    def _purge(self, conn: sqlite3.Connection) -> None:
+        """Удаление брошенных сессий"""
+        now = time.time()
+        if not self.ttl or now - self._purged < self.purge_interval:
+            return
+        self._purged = now
+        deleted = conn.execute("DELETE FROM fsm WHERE updated_at < ?", (self._expired_before(),)).rowcount
+        if deleted:
+            logger.info(f"Удалено устаревших состояний FSM: {deleted}")
+
+    def _drop_expired(self, conn: sqlite3.Connection, chat: str, user: str) -> None:
+        """Новая сессия не должна унаследовать поля брошенной"""
+        if self.ttl:
+            conn.execute(
+                "DELETE FROM fsm WHERE chat = ? AND user = ? AND updated_at < ?",
+                (chat, user, self._expired_before())
+            )
+
+    def _address(self, chat: Address, user: Address):
+        chat, user = self.check_address(chat=chat, user=user)
+        return str(chat), str(user)
+
+    async def _get(self, chat: Address, user: Address, column: str):
+        chat, user = self._address(chat, user)
+
+        def query(conn):
+            row = conn.execute(
+                f"SELECT {column} FROM fsm WHERE chat = ? AND user = ? AND updated_at >= ?",
+                (chat, user, self._expired_before())
+            ).fetchone()
+            return row[0] if row else None
+        return await self._execute(query, write=False)
+
+    async def _set(self, chat: Address, user: Address, column: str, value) -> None:
+        chat, user = self._address(chat, user)
+
+        def query(conn):
+            self._drop_expired(conn, chat, user)
+            conn.execute(
+                f"INSERT INTO fsm (chat, user, {column}, updated_at) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT (chat, user) DO UPDATE SET {column} = excluded.{column}, updated_at = excluded.updated_at",
+                (chat, user, value, time.time())
+            )
+        await self._execute(query)
+
+    async def _update(self, chat: Address, user: Address, column: str, changes: Dict) -> None:
+        """Чтение и изменение словаря в одной транзакции"""
+        chat, user = self._address(chat, user)
+
+        def query(conn):
+            self._drop_expired(conn, chat, user)
+            row = conn.execute(f"SELECT {column} FROM fsm WHERE chat = ? AND user = ?", (chat, user)).fetchone()
+            value = json.loads(row[0]) if row else {}
+            value.update(changes)
+            conn.execute(
+                f"INSERT INTO fsm (chat, user, {column}, updated_at) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT (chat, user) DO UPDATE SET {column} = excluded.{column}, updated_at = excluded.updated_at",
+                (chat, user, encode(value), time.time())
+            )
+        await self._execute(query)
+
+    async def close(self) -> None:
+        def close_conn():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, close_conn)
+
+    async def wait_closed(self) -> None:
+        pass
+
+    async def get_state(self, *, chat: Address = None, user: Address = None,
+                        default: Optional[str] = None) -> Optional[str]:
+        state = await self._get(chat, user, "state")
+        return state if state is not None else default
+
+    async def get_data(self, *, chat: Address = None, user: Address = None,
+                       default: Optional[Dict] = None) -> Dict:
+        data = await self._get(chat, user, "data")
+        return json.loads(data) if data is not None else (default or {})
+
+    async def set_state(self, *, chat: Address = None, user: Address = None, state: Optional[str] = None):
+        await self._set(chat, user, "state", state)
+
+    async def set_data(self, *, chat: Address = None, user: Address = None, data: Dict = None):
+        await self._set(chat, user, "data", encode(data or {}))
+
+    async def update_data(self, *, chat: Address = None, user: Address = None, data: Dict = None, **kwargs):
+        await self._update(chat, user, "data", dict(data or {}, **kwargs))
+
+    def has_bucket(self) -> bool:
+        return True
+
+    async def get_bucket(self, *, chat: Address = None, user: Address = None,
+                         default: Optional[Dict] = None) -> Dict:
+        bucket = await self._get(chat, user, "bucket")
+        return json.loads(bucket) if bucket is not None else (default or {})
+
+    async def set_bucket(self, *, chat: Address = None, user: Address = None, bucket: Dict = None):
+        await self._set(chat, user, "bucket", encode(bucket or {}))
+
+    async def update_bucket(self, *, chat: Address = None, user: Address = None, bucket: Dict = None, **kwargs):
+        await self._update(chat, user, "bucket", dict(bucket or {}, **kwargs))
+
+    async def reset_state(self, *, chat: Address = None, user: Address = None, with_data: Optional[bool] = True):
+        """Сброс состояния; строка без состояния и данных удаляется"""
+        chat, user = self._address(chat, user)
+
+        def query(conn):
+            if with_data:
+                conn.execute("DELETE FROM fsm WHERE chat = ? AND user = ? AND bucket = '{}'", (chat, user))
+                conn.execute(
+                    "UPDATE fsm SET state = NULL, data = '{}', updated_at = ? WHERE chat = ? AND user = ?",
+                    (time.time(), chat, user)
+                )
+            else:
+                conn.execute(
+                    "UPDATE fsm SET state = NULL, updated_at = ? WHERE chat = ? AND user = ?",
+                    (time.time(), chat, user)
+                )
+        await self._execute(query)
@@ -0,0 +1,276 @@
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+STATUSES = ("present", "absent", "excused")
+# Верхняя граница строк с заданным префиксом
+PREFIX_END = "\U0010ffff"
+
+def username_key(username: Optional[str]) -> Optional[str]:
+    """Ключ поиска по имени: без @ и без учета регистра"""
+    if not username:
+        return None
+    return username.strip().lstrip("@").casefold() or None
+
+def session_day(session: str) -> date:
+    """День занятия по его ключу (ISO дата или дата со временем)"""
+    return date.fromisoformat(session[:10])
+
+def make_stats(counts: Dict[str, int], consecutive_absences: int) -> dict:
+    """Статистика посещений в формате get_user_attendance_stats"""
+    stats = {
+        'present': counts.get('present', 0),
+        'absent': counts.get('absent', 0),
+        'excused': counts.get('excused', 0),
+        'consecutive_absences': consecutive_absences,
+        'total_marked': counts.get('total', 0)
+    }
+    if stats['total_marked'] > 0:
+        stats['attendance_rate'] = (stats['present'] / stats['total_marked']) * 100
+    else:
+        stats['attendance_rate'] = 0
+    return stats
+
+class DayBuckets:
+    """
+    Счетчики статусов по дням за последние horizon дней.
+    Любое окно не длиннее horizon считается суммой не более window корзин,
+    корзины старше horizon удаляются автоматически.
+    """
+    __slots__ = ("horizon", "days", "counts")
+
+    def __init__(self, horizon: int) -> None:
+        self.horizon = horizon
+        self.days: List[date] = []
+        self.counts: Dict[date, Dict[str, int]] = {}
+
+    def _expire(self, today: date) -> None:
+        cutoff = today - timedelta(days=self.horizon)
+        expired = bisect_left(self.days, cutoff)
+        if expired:
+            for day in self.days[:expired]:
+                del self.counts[day]
+            del self.days[:expired]
+
+    def add(self, day: date, status: str, delta: int = 1) -> None:
+        today = date.today()
+        if day < today - timedelta(days=self.horizon):
+            return
+        bucket = self.counts.get(day)
+        if bucket is None:
+            bucket = self.counts[day] = {"total": 0}
+            if not self.days or day > self.days[-1]:
+                self.days.append(day)
+            else:
+                insort(self.days, day)
+        bucket[status] = bucket.get(status, 0) + delta
+        bucket["total"] += delta
+        self._expire(today)
+
+    def window(self, today: date, days: int) -> Dict[str, int]:
+        """Сумма корзин за последние days дней (включая границу, как и раньше)"""
+        if days > self.horizon:
+            # Корзины старше horizon уже удалены, сумма была бы неполной
+            raise ValueError(f"Окно {days} дн. длиннее хранимых {self.horizon} дн.")
+        self._expire(today)
+        cutoff = today - timedelta(days=days)
+        result = {"total": 0}
+        for day in reversed(self.days):
+            if day < cutoff:
+                break
+            for status, count in self.counts[day].items():
+                result[status] = result.get(status, 0) + count
+        return result
+
+class UserTimeline:
+    """
+    Записи посещаемости одного участника, упорядоченные по времени занятия,
+    и счетчики по статусам за все время, обновляемые при каждой отметке
+    """
+    __slots__ = ("sessions", "records", "last_status", "current_streak", "counts", "buckets")
+
+    def __init__(self, horizon: int) -> None:
+        self.sessions: List[str] = []
+        self.records: Dict[str, dict] = {}
+        self.last_status: Optional[str] = None
+        self.current_streak = 0
+        self.counts: Dict[str, int] = {status: 0 for status in STATUSES}
+        self.counts["total"] = 0
+        self.buckets = DayBuckets(horizon)
+
+    def add(self, session: str, record: dict) -> None:
+        previous = self.records.get(session)
+        if previous is None:
+            if not self.sessions or session > self.sessions[-1]:
+                self.sessions.append(session)
+            else:
+                insort(self.sessions, session)
+            self.counts["total"] += 1
+        else:
+            self.counts[previous["status"]] -= 1
+            self.buckets.add(session_day(session), previous["status"], -1)
+        self.records[session] = record
+        self.counts[record["status"]] = self.counts.get(record["status"], 0) + 1
+        self.buckets.add(session_day(session), record["status"])
+
+        if session == self.sessions[-1]:
+            self.last_status = record["status"]
+            if record["status"] == "absent":
+                self.current_streak = record.get("consecutive_absences", 0)
+            else:
+                self.current_streak = 0
+
+    def last_record(self) -> Optional[dict]:
+        if not self.sessions:
+            return None
+        return self.records[self.sessions[-1]]
+
+
+class AttendanceIndex:
+    """
+    Индекс посещаемости по участникам.
+    Последний статус и текущая серия пропусков доступны за O(1),
+    статистика за скользящее окно - суммой дневных корзин.
+    horizon - самое длинное окно в днях, которое нужно поддерживать.
+    """
+    def __init__(self, horizon: int) -> None:
+        self.horizon = horizon
+        self._users: Dict[str, UserTimeline] = {}
+
+    @classmethod
+    def build(cls, attendance: Dict, horizon: int) -> "AttendanceIndex":
+        index = cls(horizon)
+        for session in sorted(attendance.keys()):
+            for user_id, record in attendance[session].items():
+                index.add(user_id, session, record)
+        return index
+
+    def add(self, user_id: str, session: str, record: dict) -> None:
+        timeline = self._users.get(user_id)
+        if timeline is None:
+            timeline = self._users[user_id] = UserTimeline(self.horizon)
+        timeline.add(session, record)
+
+    def timeline(self, user_id: str) -> Optional[UserTimeline]:
+        return self._users.get(user_id)
+
+    def last_record(self, user_id: str) -> Optional[dict]:
+        timeline = self._users.get(user_id)
+        return timeline.last_record() if timeline else None
+
+    def consecutive_absences(self, user_id: str) -> int:
+        timeline = self._users.get(user_id)
+        return timeline.current_streak if timeline else 0
+
+    def totals(self, user_id: str) -> dict:
+        """Статистика за все время из счетчиков, O(1)"""
+        timeline = self._users.get(user_id)
+        if timeline is None:
+            return make_stats({}, 0)
+        return make_stats(timeline.counts, timeline.current_streak)
+
+    def window_stats(self, user_id: str, today: date, days: int) -> dict:
+        """Статистика за последние days дней, не зависит от длины истории"""
+        timeline = self._users.get(user_id)
+        if timeline is None:
+            return make_stats({}, 0)
+        return make_stats(timeline.buckets.window(today, days), timeline.current_streak)
+
+    def user_ids(self) -> List[str]:
+        return list(self._users.keys())
+
+
+class MembershipIndex:
+    """
+    Обратный индекс составов команд: команды участника за O(1) и
+    участники без команды без обхода всех команд.
+    Порядок участников без команды - порядок их появления в индексе.
+    """
+    def __init__(self) -> None:
+        self._teams: Dict[str, List[str]] = {}
+        self._unassigned: Dict[str, None] = {}
+
+    @classmethod
+    def build(cls, users: Dict, teams: Dict) -> "MembershipIndex":
+        index = cls()
+        for user_id in users:
+            index.add_user(user_id)
+        for team_id, team in teams.items():
+            for user_id in team["members"]:
+                index.join(team_id, user_id)
+        return index
+
+    def add_user(self, user_id: str) -> None:
+        if not self._teams.get(user_id):
+            self._unassigned[user_id] = None
+
+    def join(self, team_id: str, user_id: str) -> None:
+        teams = self._teams.setdefault(user_id, [])
+        if team_id not in teams:
+            teams.append(team_id)
+        self._unassigned.pop(user_id, None)
+
+    def leave(self, team_id: str, user_id: str) -> None:
+        teams = self._teams.get(user_id)
+        if teams and team_id in teams:
+            teams.remove(team_id)
+            if not teams:
+                del self._teams[user_id]
+                self._unassigned[user_id] = None
+
+    def drop_team(self, team_id: str, members: List[str]) -> None:
+        for user_id in members:
+            self.leave(team_id, user_id)
+
+    def teams_of(self, user_id: str) -> List[str]:
+        return self._teams.get(user_id, [])
+
+    def unassigned(self) -> List[str]:
+        return list(self._unassigned)
+
+
+class UsernameIndex:
+    """
+    Отсортированный массив ключей имен участников.
+    Точный поиск и поиск по префиксу - двоичным поиском, O(log n + k).
+    """
+    def __init__(self) -> None:
+        self._entries: List[Tuple[str, str]] = []
+        self._keys: Dict[str, str] = {}
+
+    @classmethod
+    def build(cls, users: Dict) -> "UsernameIndex":
+        index = cls()
+        for user_id, user in users.items():
+            key = username_key(user.get("username"))
+            if key is not None:
+                index._keys[user_id] = key
+                index._entries.append((key, user_id))
+        index._entries.sort()
+        return index
+
+    def add(self, user_id: str, username: Optional[str]) -> None:
+        previous = self._keys.pop(user_id, None)
+        if previous is not None:
+            self._entries.pop(bisect_left(self._entries, (previous, user_id)))
+        key = username_key(username)
+        if key is not None:
+            self._keys[user_id] = key
+            insort(self._entries, (key, user_id))
+
+    def find(self, username: str) -> Optional[str]:
+        """ID участника с таким именем или None"""
+        key = username_key(username)
+        if key is None:
+            return None
+        position = bisect_left(self._entries, (key, ""))
+        if position < len(self._entries) and self._entries[position][0] == key:
+            return self._entries[position][1]
+        return None
+
+    def prefix(self, prefix: str, limit: int) -> List[str]:
+        """ID участников, чьи имена начинаются с prefix, по алфавиту"""
+        key = username_key(prefix) or ""
+        start = bisect_left(self._entries, (key, ""))
+        end = bisect_left(self._entries, (key + PREFIX_END, ""), start)
+        return [user_id for _, user_id in self._entries[start:min(end, start + limit)]]
@@ -1,20 +1,42 @@
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
 from utils.logger import logger
 from utils.error_handler import DatabaseError, UserError, TeamError
-from functools import lru_cache
+from config import config
+from database.engines import create_engine
+from database.indexes import AttendanceIndex, MembershipIndex, UsernameIndex, username_key
+from database.cache import StorageCache, MISSING
+from database.ledger import PointsLedger
+from database.wal import RedoJournal
+from utils.metrics import metrics
 import asyncio
 
 class JsonStorage:
     def __init__(self) -> None:
-        self.data_dir = "data"
+        self.data_dir = config.DATA_DIR
         self.users_file = os.path.join(self.data_dir, "users.json")
         self.teams_file = os.path.join(self.data_dir, "teams.json")
         self.attendance_file = os.path.join(self.data_dir, "attendance.json")
-        self._cache = {}
-        self._cache_lock = asyncio.Lock()
+        # Старая история начислений, используется только для импорта в журнал
+        self.points_history_file = os.path.join(self.data_dir, "points_history.json")
+        self.collections = [self.users_file, self.teams_file, self.attendance_file]
+        self._engine = create_engine(
+            config.JSON_STORAGE_MODE,
+            wal_compact_threshold=config.WAL_COMPACT_THRESHOLD,
+            flush_interval=config.MEMORY_FLUSH_INTERVAL,
+            commit_window=config.GROUP_COMMIT_WINDOW
+        )
+        self._cache = StorageCache(config.CACHE_MAXSIZE, config.CACHE_TTL)
+        self._attendance_index: Optional[AttendanceIndex] = None
+        self._membership_index: Optional[MembershipIndex] = None
+        self._username_index: Optional[UsernameIndex] = None
+        self._ledger = PointsLedger(os.path.join(self.data_dir, "ledger"), config.LEDGER_SNAPSHOT_EVERY)
+        # Завершение отметки меняет посещаемость, баллы команд и журнал начислений
+        self._finalize_journal = RedoJournal(os.path.join(self.data_dir, "finalize.journal"))
+        self._finalize_lock = asyncio.Lock()
+        self._create_team_lock = asyncio.Lock()
         self._init_storage()
 
     def _init_storage(self) -> None:
@@ -25,77 +47,101 @@ class JsonStorage:
                 logger.info(f"Создана директория {self.data_dir}")
             
             # Создаем файлы если их нет
-            for file_path in [self.users_file, self.teams_file, self.attendance_file]:
+            for file_path in self.collections:
                 if not os.path.exists(file_path):
                     with open(file_path, 'w', encoding='utf-8') as f:
                         json.dump({}, f, ensure_ascii=False, indent=4)
         except Exception as e:
             raise DatabaseError("Ошибка при инициализации хранилища", {"error": str(e)})
 
-    def _load_json(self, file_path: str) -> Dict:
-        """Загрузка данных из JSON файла"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
-            logger.warning(f"Ошибка декодирования JSON в {file_path}: {e}")
-            return {}
-        except Exception as e:
-            raise DatabaseError(f"Ошибка при чтении файла {file_path}", {"error": str(e)})
-
-    def _save_json(self, data: dict, file_path: str):
-        """Сохранение данных в JSON файл"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, ensure_ascii=False, indent=4, fp=f)
-
-    async def _get_cached_data(self, key: str) -> Optional[Dict]:
-        """Простое кэширование без TTL"""
-        async with self._cache_lock:
-            return self._cache.get(key)
-
-    async def _set_cache(self, key: str, data: Dict):
-        """Сохранение данных в кэш"""
-        async with self._cache_lock:
-            self._cache[key] = data
-
-    async def _invalidate_cache(self, key: str):
-        """Инвалидация кэша"""
-        async with self._cache_lock:
-            self._cache.pop(key, None)
+    async def _cached(self, collection: str, key, loader: Callable):
+        """
+        Значение из кэша или результат loader().
+        Запись в коллекцию увеличивает ее поколение, поэтому данные,
+        прочитанные до записи, в кэш не попадут и не будут отданы после нее.
+        """
+        value = self._cache.get(collection, key)
+        if value is not MISSING:
+            return value
+        generation = self._cache.generation(collection)
+        value = await loader()
+        self._cache.set(collection, key, value, generation)
+        return value
+
+    def cache_stats(self) -> dict:
+        """Счетчики попаданий и промахов кэша"""
+        return self._cache.stats()
 
-    @lru_cache(maxsize=100)
     async def get_user(self, telegram_id: int) -> Optional[Dict]:
-        """Получение информации о пользователе с кэшированием"""
-        cache_key = f"user_{telegram_id}"
-        cached_data = await self._get_cached_data(cache_key)
-        if cached_data:
-            return cached_data
+        """Получение информации о пользователе"""
+        users = await self._load_json_async(self.users_file)
+        return users.get(str(telegram_id))
 
+    async def get_users_by_ids(self, telegram_ids: Iterable[int]) -> Dict[int, dict]:
+        """Пользователи по списку ID одним чтением коллекции (отсутствующие пропускаются)"""
         users = await self._load_json_async(self.users_file)
-        user_data = users.get(str(telegram_id))
-        if user_data:
-            await self._set_cache(cache_key, user_data)
-        return user_data
+        result = {}
+        for telegram_id in telegram_ids:
+            user = users.get(str(telegram_id))
+            if user is not None:
+                result[int(telegram_id)] = user
+        return result
+
+    async def open(self) -> None:
+        """Открытие хранилища (в режимах wal и memory - загрузка коллекций в память)"""
+        await self._engine.open(self.collections)
+        await self._get_attendance_index()
+        await self._get_membership_index()
+        await self._get_username_index()
+        await self._ledger.open(self.points_history_file)
+
+        if self._finalize_journal.read() is not None:
+            logger.warning("Найдено незавершенное завершение отметки, изменения применяются повторно")
+            async with self._finalize_lock:
+                await self._replay_pending_finalize()
+
+        mismatches = await self.verify_team_points()
+        for team_id, values in mismatches.items():
+            logger.warning(
+                f"Баллы команды {team_id} не совпадают с журналом начислений: "
+                f"{values['points']} != {values['ledger']}"
+            )
+
+    async def close(self) -> None:
+        """Закрытие хранилища с сохранением несброшенных изменений"""
+        await self._engine.close()
 
     async def _load_json_async(self, file_path: str) -> Dict:
-        """Асинхронная загрузка JSON файла"""
+        """Асинхронная загрузка коллекции с кэшированием до следующей записи"""
+        data = self._cache.get(file_path, "*")
+        if data is not MISSING:
+            return data
+
+        generation = self._cache.generation(file_path)
         try:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._load_json, file_path)
+            with metrics.timer("storage_seconds", op="load", collection=os.path.basename(file_path)):
+                data = await self._engine.load(file_path)
         except Exception as e:
             logger.error(f"Ошибка при асинхронной загрузке JSON: {e}")
             return {}
+        # Снимок коллекции закреплен: производные значения (статистика по участникам,
+        # поиск по префиксам) не должны вытеснять его из LRU
+        self._cache.set(file_path, "*", data, generation, pinned=True)
+        return data
 
-    async def _save_json_async(self, data: dict, file_path: str):
-        """Асинхронное сохранение JSON файла"""
+    async def _mutate(self, file_path: str, ops: List[Dict]) -> Dict:
+        """Применение изменений к коллекции, возвращает ее актуальное состояние"""
         try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._save_json, data, file_path)
+            with metrics.timer("storage_seconds", op="mutate", collection=os.path.basename(file_path)):
+                return await self._engine.mutate(file_path, ops)
+        except DatabaseError:
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при асинхронном сохранении JSON: {e}")
+            raise DatabaseError(f"Ошибка при сохранении {file_path}", {"error": str(e)})
+        finally:
+            self._cache.bump(file_path)
 
     async def create_user(self, telegram_id: int, username: str, is_admin: bool = False) -> dict:
-        users = await self._load_json_async(self.users_file)
         # Автоматически даем права администратора указанным пользователям
         admin_ids = [804636463]  # Добавьте сюда нужные ID
         is_admin = is_admin or telegram_id in admin_ids
@@ -106,103 +152,274 @@ class JsonStorage:
             "is_admin": is_admin,
             "created_at": datetime.now().isoformat()
         }
-        users[str(telegram_id)] = user
-        await self._save_json_async(users, self.users_file)
+        usernames = await self._get_username_index()
+        await self._mutate_members(self.users_file, [
+            {"op": "set", "path": [str(telegram_id)], "value": user}
+        ], lambda index: index.add_user(str(telegram_id)))
+        usernames.add(str(telegram_id), username)
         return user
 
     async def get_all_users(self) -> List[dict]:
-        users = await self._load_json_async(self.users_file)
-        return list(users.values())
+        async def load():
+            users = await self._load_json_async(self.users_file)
+            return list(users.values())
+        return await self._cached(self.users_file, "all", load)
+
+    async def _get_username_index(self) -> UsernameIndex:
+        """Индекс имен участников, строится один раз при первом обращении"""
+        if self._username_index is None:
+            users = await self._load_json_async(self.users_file)
+            self._username_index = UsernameIndex.build(users)
+        return self._username_index
+
+    async def find_user_by_username(self, username: str) -> Optional[dict]:
+        """Пользователь по имени без учета регистра и @"""
+        index = await self._get_username_index()
+        user_id = index.find(username)
+        return await self.get_user(int(user_id)) if user_id else None
+
+    async def search_users(self, prefix: str, limit: int = 50) -> List[dict]:
+        """Пользователи, чьи имена начинаются с prefix, по алфавиту"""
+        async def load():
+            users = await self._load_json_async(self.users_file)
+            index = await self._get_username_index()
+            return [users[user_id] for user_id in index.prefix(prefix, limit) if user_id in users]
+        return await self._cached(self.users_file, ("prefix", username_key(prefix), limit), load)
+
+    async def _get_membership_index(self) -> MembershipIndex:
+        """Обратный индекс составов команд, строится один раз при первом обращении"""
+        if self._membership_index is None:
+            users = await self._load_json_async(self.users_file)
+            teams = await self._load_json_async(self.teams_file)
+            self._membership_index = MembershipIndex.build(users, teams)
+        return self._membership_index
+
+    async def _mutate_members(
+        self,
+        file_path: str,
+        ops: List[Dict],
+        update: Callable[[MembershipIndex], None]
+    ) -> Dict:
+        """Изменение коллекции с обновлением индекса составов после сохранения"""
+        index = await self._get_membership_index()
+        try:
+            data = await self._mutate(file_path, ops)
+        except DatabaseError:
+            # Индекс мог разойтись с файлом - перестроим его при следующем обращении
+            self._membership_index = None
+            raise
+        update(index)
+        return data
 
     # Методы для работы с посещаемостью
+    async def _get_attendance_index(self) -> AttendanceIndex:
+        """Индекс посещаемости по участникам, строится один раз при первом обращении"""
+        if self._attendance_index is None:
+            attendance = await self._load_json_async(self.attendance_file)
+            self._attendance_index = AttendanceIndex.build(attendance, config.ATTENDANCE_HORIZON)
+        return self._attendance_index
+
     async def get_consecutive_absences(self, user_id: int) -> int:
         """Получить количество пропусков подряд"""
-        attendance = await self._load_json_async(self.attendance_file)
-        dates = sorted(attendance.keys(), reverse=True)
-        consecutive = 0
-        
-        for date in dates:
-            if str(user_id) in attendance[date]:
-                if attendance[date][str(user_id)]["status"] == "absent":
-                    consecutive += 1
-                else:
-                    break
-            else:
-                break
-        
-        return consecutive
+        index = await self._get_attendance_index()
+        return index.consecutive_absences(str(user_id))
 
     async def mark_attendance(self, user_id: int, status: str, marked_by: int):
         """Отметка посещаемости"""
-        attendance = self._load_json(self.attendance_file)
+        await self.mark_attendance_bulk({user_id: status}, marked_by)
+
+    async def mark_attendance_bulk(self, marks: Dict[int, str], marked_by: int) -> Dict[int, dict]:
+        """
+        Отметка посещаемости всего занятия за одну загрузку и одно сохранение.
+        marks - статусы участников {user_id: status}.
+        Возвращает сохраненные записи {user_id: record}.
+        """
         current_datetime = datetime.now().isoformat()
-        
-        if current_datetime not in attendance:
-            attendance[current_datetime] = {}
-        
-        # Получаем все даты и сортируем их от новых к старым
-        dates = sorted(attendance.keys(), reverse=True)
-        consecutive_absences = 0
-        
-        if status == "absent":
-            # Проверяем предыдущие даты
-            for prev_date in dates:
-                if prev_date == current_datetime:  # Пропускаем текущую дату
-                    continue
-                    
-                if str(user_id) in attendance[prev_date]:
-                    prev_status = attendance[prev_date][str(user_id)]["status"]
-                    prev_consecutive = attendance[prev_date][str(user_id)].get("consecutive_absences", 0)
-                    
-                    if prev_status == "absent":
-                        consecutive_absences = prev_consecutive + 1
+        index = await self._get_attendance_index()
+        records = {}
+        ops = []
+
+        for user_id, status in marks.items():
+            consecutive_absences = 0
+            if status == "absent":
+                # Предыдущая запись участника берется из индекса за O(1)
+                prev = index.last_record(str(user_id))
+                if prev and prev["status"] == "absent":
+                    consecutive_absences = prev.get("consecutive_absences", 0) + 1
+                else:
+                    consecutive_absences = 1
+
+            records[user_id] = {
+                "status": status,
+                "marked_by": marked_by,
+                "timestamp": current_datetime,
+                "consecutive_absences": consecutive_absences
+            }
+            ops.append({"op": "set", "path": [current_datetime, str(user_id)], "value": records[user_id]})
+            # Индекс обновляется сразу, чтобы следующая отметка видела эту запись
+            index.add(str(user_id), current_datetime, records[user_id])
+
+        try:
+            await self._mutate(self.attendance_file, ops)
+        except DatabaseError:
+            # Индекс мог разойтись с файлом - перестроим его при следующем обращении
+            self._attendance_index = None
+            raise
+
+        return records
+
+    async def finalize_attendance(
+        self,
+        marks: Dict[int, str],
+        marked_by: int,
+        penalty: int,
+        reason: str
+    ) -> dict:
+        """
+        Завершение отметки занятия: записи посещаемости, пропуски подряд и
+        списание penalty баллов у команд, где кто-то отсутствовал.
+        Все изменения фиксируются одной записью журнала повтора.
+        Возвращает {"records": {user_id: record}, "penalties": {team_id: points}}.
+        """
+        timestamp = datetime.now().isoformat()
+        await self._ledger.open(self.points_history_file)
+        async with self._finalize_lock:
+            await self._replay_pending_finalize()
+            index = await self._get_attendance_index()
+            membership = await self._get_membership_index()
+            teams = await self._load_json_async(self.teams_file)
+            records = {}
+            absent = set()
+            for user_id, status in marks.items():
+                consecutive_absences = 0
+                if status == "absent":
+                    absent.add(str(user_id))
+                    prev = index.last_record(str(user_id))
+                    if prev and prev["status"] == "absent":
+                        consecutive_absences = prev.get("consecutive_absences", 0) + 1
                     else:
                         consecutive_absences = 1
-                    break
-            
-            if consecutive_absences == 0:
-                consecutive_absences = 1
-        
-        attendance[current_datetime][str(user_id)] = {
-            "status": status,
-            "marked_by": marked_by,
-            "timestamp": current_datetime,
-            "consecutive_absences": consecutive_absences
-        }
-        
-        self._save_json(attendance, self.attendance_file)
-        await self._invalidate_cache(f"attendance_stats_{user_id}")
+                records[user_id] = {
+                    "status": status,
+                    "marked_by": marked_by,
+                    "timestamp": timestamp,
+                    "consecutive_absences": consecutive_absences
+                }
+
+            penalties = {
+                team_id: penalty for user_id in absent for team_id in membership.teams_of(user_id)
+                if team_id in teams
+            }
+            record = {
+                "attendance": [
+                    {"op": "set", "path": [timestamp, str(user_id)], "value": value}
+                    for user_id, value in records.items()
+                ],
+                "ledger": {
+                    team_id: {"points": points, "reason": reason, "admin_id": marked_by, "timestamp": timestamp}
+                    for team_id, points in penalties.items()
+                },
+                # Баллы до списания: по ним при восстановлении видно, применено ли оно
+                "points": {team_id: teams[team_id].get("points", 0) for team_id in penalties}
+            }
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._finalize_journal.write, record)
+            await self._apply_finalize(record)
+            for user_id, value in records.items():
+                index.add(str(user_id), timestamp, value)
+
+        return {"records": records, "penalties": penalties}
+
+    async def _replay_pending_finalize(self) -> None:
+        """Применение записи, оставшейся после неудачного завершения (вызывается под _finalize_lock)"""
+        pending = self._finalize_journal.read()
+        if pending is not None:
+            await self._apply_finalize(pending, recovering=True)
+
+    async def _apply_finalize(self, record: dict, recovering: bool = False) -> None:
+        """Применение записи журнала повтора к коллекциям и журналу начислений"""
+        try:
+            if recovering:
+                # Начисления, уже попавшие в журнал до сбоя, повторно не добавляются,
+                # удаленные с тех пор команды пропускаются
+                teams = await self._load_json_async(self.teams_file)
+                ledger = {}
+                for team_id, entry in record["ledger"].items():
+                    if team_id in teams and entry not in (await self._ledger.history(team_id))[-1:]:
+                        ledger[team_id] = entry
+                # Списание повторяется, только если баллы команды еще прежние: пока запись
+                # не применена, другие начисления ждут _finalize_lock
+                points = [
+                    {"op": "incr", "path": [team_id, "points"], "value": entry["points"]}
+                    for team_id, entry in record["ledger"].items()
+                    if team_id in teams and teams[team_id].get("points", 0) == record["points"][team_id]
+                ]
+                writes = [self._mutate(self.attendance_file, record["attendance"])]
+                if points:
+                    writes.append(self._mutate(self.teams_file, points))
+                writes.extend(self._ledger.append(team_id, entry) for team_id, entry in ledger.items())
+            else:
+                writes = [self._mutate(self.attendance_file, record["attendance"])]
+                if record["ledger"]:
+                    writes.append(self._mutate(self.teams_file, [
+                        {"op": "incr", "path": [team_id, "points"], "value": entry["points"]}
+                        for team_id, entry in record["ledger"].items()
+                    ]))
+                    writes.extend(self._ledger.append(team_id, entry) for team_id, entry in record["ledger"].items())
+            # Коллекции и сегменты журнала начислений пишутся параллельно; ошибка поднимается
+            # только после завершения всех записей, чтобы повтор не застал их в процессе
+            for result in await asyncio.gather(*writes, return_exceptions=True):
+                if isinstance(result, BaseException):
+                    raise result
+            if recovering:
+                self._attendance_index = None
+            # Запись журнала удаляется только после того, как изменения дошли до диска
+            # (в режиме memory коллекции иначе сохраняются лишь фоновым сбросом)
+            await self._engine.sync([self.attendance_file, self.teams_file])
+        except Exception:
+            # Запись журнала остается и будет применена при следующем открытии
+            self._attendance_index = None
+            raise
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._finalize_journal.clear)
 
     async def get_attendance(self, date: str = None) -> Dict:
-        # Используем кэширование
-        if not hasattr(self, '_attendance_cache'):
-            self._attendance_cache = await self._load_json_async(self.attendance_file)
-        
+        attendance = await self._load_json_async(self.attendance_file)
         if date:
-            return self._attendance_cache.get(date, {})
-        return self._attendance_cache
+            return attendance.get(date, {})
+        return attendance
 
     # Методы для работы с командами
     async def create_team(self, name: str, members: List[int]) -> dict:
-        teams = await self._load_json_async(self.teams_file)
-        team_id = str(len(teams) + 1)
-        team = {
-            "id": team_id,
-            "name": name,
-            "members": [str(m) for m in members],
-            "points": 0,
-            "created_at": datetime.now().isoformat()
-        }
-        teams[team_id] = team
-        await self._save_json_async(teams, self.teams_file)
+        # Номер выбирается и занимается под блокировкой, чтобы две команды не получили один id
+        async with self._create_team_lock:
+            teams = await self._load_json_async(self.teams_file)
+            # Следующий за наибольшим, как в SQLite: после удаления команды номера не сдвигаются
+            team_id = str(max((int(key) for key in teams if key.isdigit()), default=0) + 1)
+            team = {
+                "id": team_id,
+                "name": name,
+                "members": [str(m) for m in members],
+                "points": 0,
+                "created_at": datetime.now().isoformat()
+            }
+
+            def update(index: MembershipIndex) -> None:
+                for member_id in team["members"]:
+                    index.join(team_id, member_id)
+
+            await self._mutate_members(self.teams_file, [
+                {"op": "set", "path": [team_id], "value": team}
+            ], update)
         return team
 
     async def add_team_member(self, team_id: str, user_id: int):
         teams = await self._load_json_async(self.teams_file)
         if team_id in teams:
             if str(user_id) not in teams[team_id]["members"]:
-                teams[team_id]["members"].append(str(user_id))
-                await self._save_json_async(teams, self.teams_file)
+                await self._mutate_members(self.teams_file, [
+                    {"op": "append", "path": [team_id, "members"], "value": str(user_id)}
+                ], lambda index: index.join(team_id, str(user_id)))
 
     async def get_team(self, team_id: str) -> Optional[dict]:
         teams = await self._load_json_async(self.teams_file)
@@ -210,18 +427,13 @@ class JsonStorage:
 
     async def get_all_teams(self, season: int = None) -> List[dict]:
         """Получение списка команд с кэшированием"""
-        cache_key = f"teams_{season if season else 'all'}"
-        cached_data = await self._get_cached_data(cache_key)
-        if cached_data:
-            return cached_data
-
-        teams = await self._load_json_async(self.teams_file)
-        teams_list = list(teams.values())
-        if season is not None:
-            teams_list = [team for team in teams_list if team.get("season") == season]
-
-        await self._set_cache(cache_key, teams_list)
-        return teams_list
+        async def load():
+            teams = await self._load_json_async(self.teams_file)
+            teams_list = list(teams.values())
+            if season is not None:
+                teams_list = [team for team in teams_list if team.get("season") == season]
+            return teams_list
+        return await self._cached(self.teams_file, ("all", season), load)
 
     async def toggle_admin_status(self, telegram_id: int) -> bool:
         """
@@ -232,107 +444,134 @@ class JsonStorage:
         user_id = str(telegram_id)
         
         if user_id in users:
-            users[user_id]["is_admin"] = not users[user_id]["is_admin"]
-            await self._save_json_async(users, self.users_file)
-            return users[user_id]["is_admin"]
+            new_status = not users[user_id]["is_admin"]
+            await self._mutate(self.users_file, [
+                {"op": "set", "path": [user_id, "is_admin"], "value": new_status}
+            ])
+            return new_status
         return False
 
     async def add_team_points(self, team_id: str, points: int, reason: str, admin_id: int) -> dict:
         teams = await self._load_json_async(self.teams_file)
-        history = await self._load_json_async(os.path.join(self.data_dir, "points_history.json"))
         
         if team_id not in teams:
             return None
         
-        # Обновляем баллы команды
-        teams[team_id]["points"] += points
-        
-        # Записываем в историю
-        if team_id not in history:
-            history[team_id] = []
-        
-        history[team_id].append({
-            "points": points,
-            "reason": reason,
-            "admin_id": admin_id,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        await self._save_json_async(teams, self.teams_file)
-        await self._save_json_async(history, os.path.join(self.data_dir, "points_history.json"))
+        # Обновляем баллы команды и дописываем начисление в журнал (параллельно)
+        await self._ledger.open(self.points_history_file)
+        async with self._finalize_lock:
+            # Баллы не меняются, пока не применена запись журнала повтора
+            await self._replay_pending_finalize()
+            teams, _ = await asyncio.gather(
+                self._mutate(self.teams_file, [
+                    {"op": "incr", "path": [team_id, "points"], "value": points}
+                ]),
+                self._ledger.append(team_id, {
+                    "points": points,
+                    "reason": reason,
+                    "admin_id": admin_id,
+                    "timestamp": datetime.now().isoformat()
+                })
+            )
         return teams[team_id]
 
     async def get_team_points_history(self, team_id: str) -> List[dict]:
-        history = await self._load_json_async(os.path.join(self.data_dir, "points_history.json"))
-        return history.get(team_id, [])
+        await self._ledger.open(self.points_history_file)
+        return await self._ledger.history(team_id)
+
+    async def get_leaderboard_version(self) -> tuple:
+        """
+        Версия данных рейтинга: поколения коллекций команд (баллы и составы)
+        и пользователей (имена участников)
+        """
+        return (self._cache.generation(self.teams_file), self._cache.generation(self.users_file))
+
+    async def iter_points_history(
+        self,
+        team_ids: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        chunk_size: int = 500
+    ) -> AsyncIterator[List[dict]]:
+        """
+        История начислений порциями для выгрузки. Записи дополнены полем team_id,
+        since и until - границы по времени в формате ISO (until не включается).
+        """
+        await self._ledger.open(self.points_history_file)
+        if team_ids is None:
+            team_ids = [team['id'] for team in await self.get_all_teams()]
+        for team_id in team_ids:
+            async for entries in self._ledger.iter_history(team_id, chunk_size):
+                chunk = [
+                    dict(entry, team_id=team_id) for entry in entries
+                    if (since is None or entry['timestamp'] >= since)
+                    and (until is None or entry['timestamp'] < until)
+                ]
+                if chunk:
+                    yield chunk
+
+    async def verify_team_points(self) -> Dict[str, dict]:
+        """Команды, у которых баллы расходятся с суммой начислений в журнале"""
+        await self._ledger.open(self.points_history_file)
+        teams = await self._load_json_async(self.teams_file)
+        mismatches = {}
+        for team_id, team in teams.items():
+            balance = self._ledger.balance(team_id)
+            if team.get("points", 0) != balance:
+                mismatches[team_id] = {"points": team.get("points", 0), "ledger": balance}
+        return mismatches
 
     async def get_available_members(self) -> List[dict]:
         """Получить список пользователей, не состоящих в командах"""
         users = await self._load_json_async(self.users_file)
-        teams = await self._load_json_async(self.teams_file)
-        
-        # Собираем всех участников команд
-        team_members = set()
-        for team in teams.values():
-            team_members.update(team["members"])
-        
-        # Возвращаем пользователей, не состоящих в командах
-        available_users = []
-        for user_id, user in users.items():
-            if user_id not in team_members:  # Убрали проверку на админа
-                available_users.append(user)
-        
-        return available_users
+        index = await self._get_membership_index()
+        return [users[user_id] for user_id in index.unassigned() if user_id in users]
+
+    async def get_users_outside_team(self, team_id: str) -> List[dict]:
+        """Пользователи, которых можно добавить в команду"""
+        users = await self.get_all_users()
+        index = await self._get_membership_index()
+        return [user for user in users if team_id not in index.teams_of(str(user["telegram_id"]))]
 
     async def remove_team_member(self, team_id: str, user_id: int):
         teams = await self._load_json_async(self.teams_file)
         if team_id in teams:
-            teams[team_id]["members"] = [m for m in teams[team_id]["members"] if m != str(user_id)]
-            await self._save_json_async(teams, self.teams_file)
+            await self._mutate_members(self.teams_file, [
+                {"op": "remove", "path": [team_id, "members"], "value": str(user_id)}
+            ], lambda index: index.leave(team_id, str(user_id)))
 
     async def delete_team(self, team_id: str):
         teams = await self._load_json_async(self.teams_file)
         if team_id in teams:
-            del teams[team_id]
-            await self._save_json_async(teams, self.teams_file)
-
-    async def get_user_attendance_stats(self, user_id: int) -> dict:
-        """Получение статистики посещений с кэшированием"""
-        cache_key = f"attendance_stats_{user_id}"
-        cached_data = await self._get_cached_data(cache_key)
-        if cached_data:
-            return cached_data
-
-        attendance = await self._load_json_async(self.attendance_file)
-        current_date = datetime.now().date()
-        dates = sorted([
-            date for date in attendance.keys()
-            if (current_date - datetime.fromisoformat(date).date()).days <= 30
-        ])
-
-        stats = {
-            'present': 0,
-            'absent': 0,
-            'excused': 0,
-            'consecutive_absences': 0,
-            'total_marked': 0
+            members = list(teams[team_id]["members"])
+            await self._mutate_members(self.teams_file, [
+                {"op": "delete", "path": [team_id]}
+            ], lambda index: index.drop_team(team_id, members))
+            await self._ledger.archive(team_id)
+
+    async def get_user_attendance_stats(self, user_id: int, window: int = None) -> dict:
+        """Получение статистики посещений за последние window дней (по умолчанию из конфигурации)"""
+        window = window or config.ATTENDANCE_STATS_WINDOW
+        today = datetime.now().date()
+        return await self._cached(
+            self.attendance_file,
+            ("stats", user_id, window, today),
+            lambda: self._compute_attendance_stats(user_id, today, window)
+        )
+
+    async def _compute_attendance_stats(self, user_id: int, today, window: int) -> dict:
+        index = await self._get_attendance_index()
+        return index.window_stats(str(user_id), today, window)
+
+    async def get_all_attendance_stats(self, window: int = None) -> Dict[str, dict]:
+        """Статистика посещений за последние window дней для всех отмеченных участников"""
+        index = await self._get_attendance_index()
+        return {
+            user_id: await self.get_user_attendance_stats(int(user_id), window)
+            for user_id in index.user_ids()
         }
 
-        for date in dates:
-            if str(user_id) in attendance[date]:
-                stats['total_marked'] += 1
-                status = attendance[date][str(user_id)]["status"]
-                stats[status] += 1
-                
-                if date == dates[-1]:
-                    stats['consecutive_absences'] = attendance[date][str(user_id)].get("consecutive_absences", 0)
-
-        if stats['total_marked'] > 0:
-            stats['attendance_rate'] = (stats['present'] / stats['total_marked']) * 100
-        else:
-            stats['attendance_rate'] = 0
-
-        await self._set_cache(cache_key, stats)
-        return stats
-
-db = JsonStorage() 
\ No newline at end of file
+    async def get_attendance_totals(self) -> Dict[str, dict]:
+        """Статистика посещений за все время для всех участников, O(число участников)"""
+        index = await self._get_attendance_index()
+        return {user_id: index.totals(user_id) for user_id in index.user_ids()}
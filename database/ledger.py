@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from utils.logger import logger
+from utils.metrics import metrics
+from database.persistence import read_json_file, write_json_file
+
+class PointsLedger:
+    """
+    Журнал начислений баллов, разбитый на сегменты по командам.
+    Каждое начисление дописывается строкой в data/ledger/team_<id>.jsonl,
+    раз в snapshot_every записей сохраняется снапшот баланса со смещением
+    в байтах, поэтому при открытии читается только хвост сегмента.
+    """
+    def __init__(self, ledger_dir: str, snapshot_every: int) -> None:
+        self.ledger_dir = ledger_dir
+        self.snapshot_every = snapshot_every
+        # team_id -> {"balance", "entries", "offset", "snapshot_entries"}
+        self._teams: Dict[str, Dict[str, int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+
+    def _segment_path(self, team_id: str) -> str:
+        return os.path.join(self.ledger_dir, f"team_{team_id}.jsonl")
+
+    def _snapshot_path(self, team_id: str) -> str:
+        return os.path.join(self.ledger_dir, f"team_{team_id}.snapshot.json")
+
+    async def open(self, legacy_history_path: Optional[str] = None) -> None:
+        """Загрузка балансов; при первом запуске - импорт points_history.json"""
+        async with self._open_lock:
+            if self._opened:
+                return
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._open_sync, legacy_history_path)
+            self._opened = True
+
+    def _open_sync(self, legacy_history_path: Optional[str]) -> None:
+        if not os.path.isdir(self.ledger_dir):
+            history = read_json_file(legacy_history_path) if legacy_history_path else {}
+            self._import(history)
+
+        for name in os.listdir(self.ledger_dir):
+            if name.startswith("team_") and name.endswith(".jsonl"):
+                self._load_team(name[len("team_"):-len(".jsonl")])
+
+    def _import(self, history: Dict[str, List[dict]]) -> None:
+        """Импорт старой истории во временный каталог и его атомарное переименование"""
+        tmp_dir = f"{self.ledger_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for team_id, entries in history.items():
+            segment = os.path.join(tmp_dir, f"team_{team_id}.jsonl")
+            with open(segment, 'wb') as f:
+                for entry in entries:
+                    f.write(self._encode(entry))
+                f.flush()
+                os.fsync(f.fileno())
+            write_json_file(os.path.join(tmp_dir, f"team_{team_id}.snapshot.json"), {
+                "balance": sum(entry["points"] for entry in entries),
+                "entries": len(entries),
+                "offset": os.path.getsize(segment)
+            })
+        os.replace(tmp_dir, self.ledger_dir)
+        logger.info(f"История начислений импортирована в {self.ledger_dir}: команд {len(history)}")
+
+    @staticmethod
+    def _encode(entry: dict) -> bytes:
+        return (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def _load_team(self, team_id: str) -> None:
+        """Снапшот баланса + записи сегмента после него"""
+        segment = self._segment_path(team_id)
+        snapshot = read_json_file(self._snapshot_path(team_id))
+        size = os.path.getsize(segment)
+        if snapshot.get("offset", 0) > size:
+            logger.warning(f"Снапшот {team_id} не соответствует сегменту, баланс пересчитывается")
+            snapshot = {}
+
+        state = {
+            "balance": snapshot.get("balance", 0),
+            "entries": snapshot.get("entries", 0),
+            "offset": snapshot.get("offset", 0)
+        }
+        with open(segment, 'rb') as f:
+            f.seek(state["offset"])
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("неполная запись")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Оборванная запись в конце сегмента (сбой во время записи)
+                    logger.warning(f"Повреждена запись в сегменте {segment}, хвост отброшен")
+                    break
+                state["balance"] += entry["points"]
+                state["entries"] += 1
+                state["offset"] += len(line)
+
+        if state["offset"] < size:
+            with open(segment, 'r+b') as f:
+                f.truncate(state["offset"])
+        state["snapshot_entries"] = snapshot.get("entries", 0)
+        self._teams[team_id] = state
+
+    def _lock(self, team_id: str) -> asyncio.Lock:
+        lock = self._locks.get(team_id)
+        if lock is None:
+            lock = self._locks[team_id] = asyncio.Lock()
+        return lock
+
+    async def append(self, team_id: str, entry: dict) -> int:
+        """Дописывает начисление в сегмент команды, возвращает новый баланс"""
+        async with self._lock(team_id):
+            loop = asyncio.get_running_loop()
+            with metrics.timer("storage_seconds", op="append", collection="ledger"):
+                return await loop.run_in_executor(None, self._append_sync, team_id, entry)
+
+    def _append_sync(self, team_id: str, entry: dict) -> int:
+        line = self._encode(entry)
+        with open(self._segment_path(team_id), 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.inc("storage_bytes_total", len(line), op="append", file="ledger")
+
+        state = self._teams.setdefault(
+            team_id, {"balance": 0, "entries": 0, "offset": 0, "snapshot_entries": 0}
+        )
+        state["balance"] += entry["points"]
+        state["entries"] += 1
+        state["offset"] += len(line)
+        if state["entries"] - state["snapshot_entries"] >= self.snapshot_every:
+            write_json_file(self._snapshot_path(team_id), {
+                "balance": state["balance"],
+                "entries": state["entries"],
+                "offset": state["offset"]
+            })
+            state["snapshot_entries"] = state["entries"]
+        return state["balance"]
+
+    async def history(self, team_id: str) -> List[dict]:
+        """Все начисления команды (читается только ее сегмент)"""
+        state = self._teams.get(team_id)
+        if state is None:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read_segment, team_id, state["offset"])
+
+    def _read_segment(self, team_id: str, end: int) -> List[dict]:
+        with open(self._segment_path(team_id), 'rb') as f:
+            data = f.read(end)
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+    async def iter_history(self, team_id: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        """Начисления команды порциями по chunk_size записей без чтения всего сегмента"""
+        state = self._teams.get(team_id)
+        if state is None:
+            return
+        loop = asyncio.get_running_loop()
+        offset, end = 0, state["offset"]
+        while offset < end:
+            entries, offset = await loop.run_in_executor(
+                None, self._read_chunk, team_id, offset, end, chunk_size
+            )
+            if entries:
+                yield entries
+
+    def _read_chunk(self, team_id: str, offset: int, end: int, chunk_size: int) -> Tuple[List[dict], int]:
+        entries = []
+        with open(self._segment_path(team_id), 'rb') as f:
+            f.seek(offset)
+            while offset < end and len(entries) < chunk_size:
+                line = f.readline()
+                if not line:
+                    # Сегмент укоротили (команду удалили во время чтения)
+                    return entries, end
+                offset += len(line)
+                if line.strip():
+                    entries.append(json.loads(line))
+        return entries, offset
+
+    def balance(self, team_id: str) -> int:
+        state = self._teams.get(team_id)
+        return state["balance"] if state else 0
+
+    def balances(self) -> Dict[str, int]:
+        return {team_id: state["balance"] for team_id, state in self._teams.items()}
+
+    async def archive(self, team_id: str) -> None:
+        """Убирает сегмент удаленной команды, чтобы новая команда с тем же id начинала с нуля"""
+        async with self._lock(team_id):
+            if self._teams.pop(team_id, None) is None:
+                return
+            suffix = datetime.now().strftime("%Y%m%d%H%M%S")
+            for path in (self._segment_path(team_id), self._snapshot_path(team_id)):
+                if os.path.exists(path):
+                    os.replace(path, f"{path}.deleted-{suffix}")
+
+def read_ledger_history(data_dir: str) -> Dict[str, List[dict]]:
+    """
+    История начислений всех команд для импорта в другие хранилища:
+    из журнала, если он уже создан, иначе из points_history.json
+    """
+    ledger_dir = os.path.join(data_dir, "ledger")
+    if not os.path.isdir(ledger_dir):
+        return read_json_file(os.path.join(data_dir, "points_history.json"))
+
+    history = {}
+    for name in sorted(os.listdir(ledger_dir)):
+        if name.startswith("team_") and name.endswith(".jsonl"):
+            with open(os.path.join(ledger_dir, name), 'rb') as f:
+                entries = []
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    entries.append(json.loads(line))
+            history[name[len("team_"):-len(".jsonl")]] = entries
+    return history
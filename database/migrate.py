@@ -0,0 +1,30 @@
+"""
+Импорт данных из JSON файлов в SQLite.
+
+Использование:
+    python -m database.migrate [--data-dir data] [--db data/bot.sqlite3]
+"""
+import argparse
+import asyncio
+from config import config
+from database.sqlite_storage import SqliteStorage
+from utils.logger import logger
+
+async def migrate(data_dir: str, db_path: str) -> None:
+    storage = SqliteStorage(db_path)
+    try:
+        await storage.open()
+        counts = await storage.import_json(data_dir)
+        logger.info(f"Импорт из {data_dir} в {db_path} завершен: {counts}")
+    finally:
+        await storage.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Импорт данных из JSON файлов в SQLite")
+    parser.add_argument("--data-dir", default=config.DATA_DIR, help="каталог с JSON файлами")
+    parser.add_argument("--db", default=config.SQLITE_PATH, help="путь к базе SQLite")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.data_dir, args.db))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict, List
+from utils.logger import logger
+from utils.error_handler import DatabaseError
+from utils.metrics import metrics
+
+def read_json_file(file_path: str) -> Dict:
+    """Чтение JSON файла коллекции"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            metrics.inc("storage_bytes_total", os.fstat(f.fileno()).st_size, op="read", file=os.path.basename(file_path))
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        logger.warning(f"Ошибка декодирования JSON в {file_path}: {e}")
+        return {}
+    except Exception as e:
+        raise DatabaseError(f"Ошибка при чтении файла {file_path}", {"error": str(e)})
+
+def write_json_file(file_path: str, data: Dict) -> None:
+    """Атомарная запись JSON файла: временный файл + переименование"""
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.replace(tmp_path, file_path)
+        metrics.inc("storage_bytes_total", written, op="write", file=os.path.basename(file_path))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _resolve(data: Dict, path: List) -> Any:
+    """Возвращает контейнер для последнего ключа пути, создавая словари по пути"""
+    container = data
+    for key in path[:-1]:
+        if isinstance(container, list):
+            container = container[key]
+        else:
+            container = container.setdefault(key, {})
+    return container
+
+def apply_ops(data: Dict, ops: List[Dict]) -> List[Dict]:
+    """
+    Применяет операции к данным коллекции.
+    Поддерживаются операции set, delete, incr, append и remove.
+    Возвращает те же изменения в виде идемпотентных операций set/delete,
+    которые можно безопасно повторно применить при восстановлении журнала.
+    """
+    applied = []
+    for op in ops:
+        kind = op["op"]
+        path = op["path"]
+        container = _resolve(data, path)
+        key = path[-1]
+
+        if kind == "set":
+            value = op["value"]
+            if isinstance(container, list) and key == len(container):
+                container.append(value)
+            else:
+                container[key] = value
+            applied.append({"op": "set", "path": path, "value": value})
+        elif kind == "delete":
+            if isinstance(container, dict):
+                container.pop(key, None)
+            applied.append({"op": "delete", "path": path})
+        elif kind == "incr":
+            value = container.get(key, 0) + op["value"]
+            container[key] = value
+            applied.append({"op": "set", "path": path, "value": value})
+        elif kind == "append":
+            items = container.setdefault(key, [])
+            items.append(op["value"])
+            applied.append({"op": "set", "path": path + [len(items) - 1], "value": op["value"]})
+        elif kind == "remove":
+            items = [item for item in container.get(key, []) if item != op["value"]]
+            container[key] = items
+            applied.append({"op": "set", "path": path, "value": items})
+        else:
+            raise DatabaseError(f"Неизвестная операция: {kind}", {"op": op})
+    return applied
@@ -0,0 +1,793 @@
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from config import config
+from utils.logger import logger
+from utils.error_handler import DatabaseError
+from database.persistence import read_json_file
+from database.indexes import PREFIX_END, make_stats, username_key
+from database.ledger import read_ledger_history
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    telegram_id INTEGER PRIMARY KEY,
+    username TEXT,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    -- Имя без учета регистра для поиска (см. username_key)
+    username_key TEXT
+);
+CREATE TABLE IF NOT EXISTS teams (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0,
+    season INTEGER,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS team_members (
+    team_id TEXT NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (team_id, user_id)
+);
+-- Обратный индекс: команда участника и участники без команды
+CREATE INDEX IF NOT EXISTS team_members_user ON team_members(user_id);
+CREATE TABLE IF NOT EXISTS attendance (
+    user_id TEXT NOT NULL,
+    session TEXT NOT NULL,
+    status TEXT NOT NULL,
+    marked_by INTEGER,
+    timestamp TEXT,
+    consecutive_absences INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, session)
+);
+CREATE INDEX IF NOT EXISTS attendance_session ON attendance(session);
+CREATE TABLE IF NOT EXISTS attendance_counters (
+    user_id TEXT PRIMARY KEY,
+    present INTEGER NOT NULL DEFAULT 0,
+    absent INTEGER NOT NULL DEFAULT 0,
+    excused INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    last_session TEXT,
+    current_streak INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS attendance_counters_insert AFTER INSERT ON attendance
+BEGIN
+    -- Без OR IGNORE: конфликтный режим внешнего INSERT OR REPLACE переопределил бы его
+    INSERT INTO attendance_counters (user_id)
+    SELECT NEW.user_id WHERE NOT EXISTS (
+        SELECT 1 FROM attendance_counters WHERE user_id = NEW.user_id
+    );
+    UPDATE attendance_counters SET
+        present = present + (NEW.status = 'present'),
+        absent = absent + (NEW.status = 'absent'),
+        excused = excused + (NEW.status = 'excused'),
+        total = total + 1,
+        current_streak = CASE
+            WHEN last_session IS NULL OR NEW.session >= last_session
+            THEN CASE WHEN NEW.status = 'absent' THEN NEW.consecutive_absences ELSE 0 END
+            ELSE current_streak END,
+        last_session = CASE
+            WHEN last_session IS NULL OR NEW.session >= last_session
+            THEN NEW.session ELSE last_session END
+    WHERE user_id = NEW.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_counters_delete AFTER DELETE ON attendance
+BEGIN
+    UPDATE attendance_counters SET
+        present = present - (OLD.status = 'present'),
+        absent = absent - (OLD.status = 'absent'),
+        excused = excused - (OLD.status = 'excused'),
+        total = total - 1
+    WHERE user_id = OLD.user_id;
+END;
+CREATE TABLE IF NOT EXISTS points_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_id TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    reason TEXT,
+    admin_id INTEGER,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS points_history_team ON points_history(team_id, id);
+-- История удаленных команд: новая команда с тем же id начинает с нуля
+CREATE TABLE IF NOT EXISTS points_history_archive (
+    id INTEGER PRIMARY KEY,
+    team_id TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    reason TEXT,
+    admin_id INTEGER,
+    timestamp TEXT,
+    deleted_at TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('leaderboard_version', 0);
+"""
+
+# Версия рейтинга увеличивается при любом изменении баллов, команд,
+# их составов или имен участников (в том числе из другого процесса)
+LEADERBOARD_TRIGGERS = [
+    ("teams_insert", "INSERT ON teams"),
+    ("teams_update", "UPDATE OF name, points, season ON teams"),
+    ("teams_delete", "DELETE ON teams"),
+    ("members_insert", "INSERT ON team_members"),
+    ("members_delete", "DELETE ON team_members"),
+    ("users_insert", "INSERT ON users"),
+    ("users_update", "UPDATE OF username ON users"),
+    ("users_delete", "DELETE ON users"),
+]
+SCHEMA += "".join(
+    f"CREATE TRIGGER IF NOT EXISTS leaderboard_{name} AFTER {event}\n"
+    f"BEGIN UPDATE meta SET value = value + 1 WHERE key = 'leaderboard_version'; END;\n"
+    for name, event in LEADERBOARD_TRIGGERS
+)
+
+# Пересчет счетчиков посещаемости по таблице attendance
+REBUILD_COUNTERS = """
+DELETE FROM attendance_counters;
+INSERT INTO attendance_counters (user_id, present, absent, excused, total, last_session)
+SELECT user_id, SUM(status = 'present'), SUM(status = 'absent'), SUM(status = 'excused'),
+       COUNT(*), MAX(session)
+FROM attendance GROUP BY user_id;
+UPDATE attendance_counters SET current_streak = COALESCE((
+    SELECT CASE WHEN a.status = 'absent' THEN a.consecutive_absences ELSE 0 END
+    FROM attendance a
+    WHERE a.user_id = attendance_counters.user_id AND a.session = attendance_counters.last_session
+), 0);
+"""
+
+class SqliteStorage:
+    """
+    Хранилище на SQLite с тем же набором методов, что и JsonStorage.
+    Все обращения к базе выполняются в отдельном потоке.
+    """
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            # Ожидание блокировки, пока пишет другой процесс (режим нескольких воркеров)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            # REPLACE в attendance должен вызывать триггер удаления для счетчиков
+            conn.execute("PRAGMA recursive_triggers=ON")
+            conn.executescript(SCHEMA)
+            self._backfill_counters(conn)
+            self._backfill_username_keys(conn)
+            self._conn = conn
+        return self._conn
+
+    async def _execute(self, func: Callable[[sqlite3.Connection], object], write: bool = False):
+        """
+        Выполнение функции с соединением в потоке базы данных.
+        write=True - блокировка на запись берется до первого чтения, чтобы
+        чтение и запись не разделил другой процесс.
+        """
+        def run():
+            conn = self._connect()
+            try:
+                with conn:
+                    if write:
+                        conn.execute("BEGIN IMMEDIATE")
+                    return func(conn)
+            except sqlite3.Error as e:
+                raise DatabaseError("Ошибка при работе с SQLite", {"error": str(e)})
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run)
+
+    @staticmethod
+    def _backfill_counters(conn: sqlite3.Connection) -> None:
+        """Заполнение счетчиков для базы, созданной до их появления"""
+        has_counters = conn.execute("SELECT 1 FROM attendance_counters LIMIT 1").fetchone()
+        has_attendance = conn.execute("SELECT 1 FROM attendance LIMIT 1").fetchone()
+        if has_attendance and not has_counters:
+            conn.executescript(REBUILD_COUNTERS)
+            logger.info("Счетчики посещаемости пересчитаны")
+
+    @staticmethod
+    def _backfill_username_keys(conn: sqlite3.Connection) -> None:
+        """Ключи поиска по имени для базы, созданной до их появления"""
+        columns = [row["name"] for row in conn.execute("PRAGMA table_info(users)")]
+        if "username_key" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE users ADD COLUMN username_key TEXT")
+                conn.executemany(
+                    "UPDATE users SET username_key = ? WHERE telegram_id = ?",
+                    [(username_key(row["username"]), row["telegram_id"])
+                     for row in conn.execute("SELECT telegram_id, username FROM users")]
+                )
+            logger.info("Ключи поиска по имени заполнены")
+        conn.execute("CREATE INDEX IF NOT EXISTS users_username_key ON users(username_key)")
+
+    async def open(self) -> None:
+        """Открытие базы и создание схемы"""
+        await self._execute(lambda conn: None)
+        logger.info(f"База данных SQLite открыта: {self.db_path}")
+
+    async def close(self) -> None:
+        """Закрытие соединения"""
+        def close_conn():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, close_conn)
+
+    # Преобразование строк в формат JsonStorage
+    @staticmethod
+    def _user_row(row: sqlite3.Row) -> dict:
+        return {
+            "telegram_id": row["telegram_id"],
+            "username": row["username"],
+            "is_admin": bool(row["is_admin"]),
+            "created_at": row["created_at"]
+        }
+
+    @staticmethod
+    def _attendance_row(row: sqlite3.Row) -> dict:
+        return {
+            "status": row["status"],
+            "marked_by": row["marked_by"],
+            "timestamp": row["timestamp"],
+            "consecutive_absences": row["consecutive_absences"]
+        }
+
+    @staticmethod
+    def _history_row(row: sqlite3.Row) -> dict:
+        return {
+            "points": row["points"],
+            "reason": row["reason"],
+            "admin_id": row["admin_id"],
+            "timestamp": row["timestamp"]
+        }
+
+    @staticmethod
+    def _load_teams(conn: sqlite3.Connection, where: str = "", params: tuple = ()) -> List[dict]:
+        teams = []
+        for row in conn.execute(f"SELECT * FROM teams {where} ORDER BY CAST(id AS INTEGER)", params):
+            team = {
+                "id": row["id"],
+                "name": row["name"],
+                "members": [
+                    m["user_id"] for m in conn.execute(
+                        "SELECT user_id FROM team_members WHERE team_id = ? ORDER BY position",
+                        (row["id"],)
+                    )
+                ],
+                "points": row["points"],
+                "created_at": row["created_at"]
+            }
+            if row["season"] is not None:
+                team["season"] = row["season"]
+            teams.append(team)
+        return teams
+
+    # Пользователи
+    async def get_user(self, telegram_id: int) -> Optional[Dict]:
+        def query(conn):
+            row = conn.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+            return self._user_row(row) if row else None
+        return await self._execute(query)
+
+    async def get_users_by_ids(self, telegram_ids: Iterable[int]) -> Dict[int, dict]:
+        """Пользователи по списку ID (отсутствующие пропускаются)"""
+        ids = list({int(telegram_id) for telegram_id in telegram_ids if telegram_id is not None})
+
+        def query(conn):
+            result = {}
+            # Ограничение SQLite на число параметров в одном запросе
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT * FROM users WHERE telegram_id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                for row in rows:
+                    result[row["telegram_id"]] = self._user_row(row)
+            return result
+        return await self._execute(query)
+
+    async def create_user(self, telegram_id: int, username: str, is_admin: bool = False) -> dict:
+        # Автоматически даем права администратора указанным пользователям
+        admin_ids = [804636463]  # Добавьте сюда нужные ID
+        is_admin = is_admin or telegram_id in admin_ids
+
+        user = {
+            "telegram_id": telegram_id,
+            "username": username,
+            "is_admin": is_admin,
+            "created_at": datetime.now().isoformat()
+        }
+
+        def query(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO users (telegram_id, username, is_admin, created_at, username_key) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (telegram_id, username, int(is_admin), user["created_at"], username_key(username))
+            )
+        await self._execute(query)
+        return user
+
+    async def get_all_users(self) -> List[dict]:
+        def query(conn):
+            return [self._user_row(row) for row in conn.execute("SELECT * FROM users ORDER BY rowid")]
+        return await self._execute(query)
+
+    async def find_user_by_username(self, username: str) -> Optional[dict]:
+        """Пользователь по имени без учета регистра и @"""
+        key = username_key(username)
+        if key is None:
+            return None
+
+        def query(conn):
+            row = conn.execute(
+                "SELECT * FROM users WHERE username_key = ? ORDER BY CAST(telegram_id AS TEXT) LIMIT 1", (key,)
+            ).fetchone()
+            return self._user_row(row) if row else None
+        return await self._execute(query)
+
+    async def search_users(self, prefix: str, limit: int = 50) -> List[dict]:
+        """Пользователи, чьи имена начинаются с prefix, по алфавиту"""
+        key = username_key(prefix) or ""
+
+        def query(conn):
+            rows = conn.execute(
+                "SELECT * FROM users WHERE username_key >= ? AND username_key < ? "
+                "ORDER BY username_key, CAST(telegram_id AS TEXT) LIMIT ?",
+                (key, key + PREFIX_END, limit)
+            )
+            return [self._user_row(row) for row in rows]
+        return await self._execute(query)
+
+    async def toggle_admin_status(self, telegram_id: int) -> bool:
+        """
+        Переключает статус админа для пользователя.
+        Возвращает новый статус.
+        """
+        def query(conn):
+            conn.execute("UPDATE users SET is_admin = 1 - is_admin WHERE telegram_id = ?", (telegram_id,))
+            row = conn.execute("SELECT is_admin FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+            return bool(row["is_admin"]) if row else False
+        return await self._execute(query)
+
+    # Методы для работы с посещаемостью
+    async def get_consecutive_absences(self, user_id: int) -> int:
+        """Получить количество пропусков подряд"""
+        def query(conn):
+            row = conn.execute(
+                "SELECT status, consecutive_absences FROM attendance WHERE user_id = ? "
+                "ORDER BY session DESC LIMIT 1",
+                (str(user_id),)
+            ).fetchone()
+            if row and row["status"] == "absent":
+                return row["consecutive_absences"]
+            return 0
+        return await self._execute(query)
+
+    async def mark_attendance(self, user_id: int, status: str, marked_by: int):
+        """Отметка посещаемости"""
+        await self.mark_attendance_bulk({user_id: status}, marked_by)
+
+    async def mark_attendance_bulk(self, marks: Dict[int, str], marked_by: int) -> Dict[int, dict]:
+        """
+        Отметка посещаемости всего занятия одной транзакцией.
+        Возвращает сохраненные записи {user_id: record}.
+        """
+        current_datetime = datetime.now().isoformat()
+
+        def query(conn):
+            records = {}
+            for user_id, status in marks.items():
+                consecutive_absences = 0
+                if status == "absent":
+                    prev = conn.execute(
+                        "SELECT status, consecutive_absences FROM attendance WHERE user_id = ? "
+                        "ORDER BY session DESC LIMIT 1",
+                        (str(user_id),)
+                    ).fetchone()
+                    if prev and prev["status"] == "absent":
+                        consecutive_absences = prev["consecutive_absences"] + 1
+                    else:
+                        consecutive_absences = 1
+
+                records[user_id] = {
+                    "status": status,
+                    "marked_by": marked_by,
+                    "timestamp": current_datetime,
+                    "consecutive_absences": consecutive_absences
+                }
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO attendance "
+                "(user_id, session, status, marked_by, timestamp, consecutive_absences) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (str(user_id), current_datetime, record["status"], marked_by,
+                     current_datetime, record["consecutive_absences"])
+                    for user_id, record in records.items()
+                ]
+            )
+            return records
+        return await self._execute(query, write=True)
+
+    async def finalize_attendance(
+        self,
+        marks: Dict[int, str],
+        marked_by: int,
+        penalty: int,
+        reason: str
+    ) -> dict:
+        """
+        Завершение отметки занятия одной транзакцией: записи посещаемости,
+        пропуски подряд и списание penalty баллов у команд, где кто-то отсутствовал.
+        Возвращает {"records": {user_id: record}, "penalties": {team_id: points}}.
+        """
+        timestamp = datetime.now().isoformat()
+        user_ids = [str(user_id) for user_id in marks]
+
+        def query(conn):
+            # Пропуски подряд берутся из счетчиков: current_streak > 0, только если последняя запись - пропуск
+            streaks = {}
+            absent = []
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                streaks.update(conn.execute(
+                    f"SELECT user_id, current_streak FROM attendance_counters "
+                    f"WHERE user_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall())
+
+            records = {}
+            for user_id, status in marks.items():
+                consecutive_absences = 0
+                if status == "absent":
+                    absent.append(str(user_id))
+                    consecutive_absences = streaks.get(str(user_id), 0) + 1
+                records[user_id] = {
+                    "status": status,
+                    "marked_by": marked_by,
+                    "timestamp": timestamp,
+                    "consecutive_absences": consecutive_absences
+                }
+            conn.executemany(
+                "INSERT OR REPLACE INTO attendance "
+                "(user_id, session, status, marked_by, timestamp, consecutive_absences) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (str(user_id), timestamp, record["status"], marked_by, timestamp, record["consecutive_absences"])
+                    for user_id, record in records.items()
+                ]
+            )
+
+            team_ids = set()
+            for start in range(0, len(absent), 500):
+                chunk = absent[start:start + 500]
+                team_ids.update(row[0] for row in conn.execute(
+                    f"SELECT DISTINCT team_id FROM team_members WHERE user_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ))
+            penalties = {team_id: penalty for team_id in team_ids}
+            conn.executemany(
+                "UPDATE teams SET points = points + ? WHERE id = ?",
+                [(points, team_id) for team_id, points in penalties.items()]
+            )
+            conn.executemany(
+                "INSERT INTO points_history (team_id, points, reason, admin_id, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(team_id, points, reason, marked_by, timestamp) for team_id, points in penalties.items()]
+            )
+            return {"records": records, "penalties": penalties}
+        return await self._execute(query, write=True)
+
+    async def get_attendance(self, date: str = None) -> Dict:
+        def query(conn):
+            if date:
+                rows = conn.execute("SELECT * FROM attendance WHERE session = ?", (date,))
+                return {row["user_id"]: self._attendance_row(row) for row in rows}
+
+            attendance = {}
+            for row in conn.execute("SELECT * FROM attendance ORDER BY session"):
+                attendance.setdefault(row["session"], {})[row["user_id"]] = self._attendance_row(row)
+            return attendance
+        return await self._execute(query)
+
+    async def get_user_attendance_stats(self, user_id: int, window: int = None) -> dict:
+        """Получение статистики посещений за последние window дней (по умолчанию из конфигурации)"""
+        window = window or config.ATTENDANCE_STATS_WINDOW
+        since = (datetime.now().date() - timedelta(days=window)).isoformat()
+
+        def query(conn):
+            counts = {'total': 0}
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS cnt FROM attendance "
+                "WHERE user_id = ? AND session >= ? GROUP BY status",
+                (str(user_id), since)
+            )
+            for row in rows:
+                counts[row["status"]] = row["cnt"]
+                counts['total'] += row["cnt"]
+
+            # Пропуски подряд берем из счетчиков участника
+            row = conn.execute(
+                "SELECT current_streak FROM attendance_counters WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+            return make_stats(counts, row["current_streak"] if row else 0)
+        return await self._execute(query)
+
+    async def get_all_attendance_stats(self, window: int = None) -> Dict[str, dict]:
+        """Статистика посещений за последние window дней для всех отмеченных участников"""
+        window = window or config.ATTENDANCE_STATS_WINDOW
+        since = (datetime.now().date() - timedelta(days=window)).isoformat()
+
+        def query(conn):
+            counts = {
+                row["user_id"]: {
+                    "present": row["present"],
+                    "absent": row["absent"],
+                    "excused": row["excused"],
+                    "total": row["total"]
+                }
+                for row in conn.execute(
+                    "SELECT user_id, SUM(status = 'present') AS present, SUM(status = 'absent') AS absent, "
+                    "SUM(status = 'excused') AS excused, COUNT(*) AS total "
+                    "FROM attendance WHERE session >= ? GROUP BY user_id",
+                    (since,)
+                )
+            }
+            return {
+                row["user_id"]: make_stats(counts.get(row["user_id"], {}), row["current_streak"])
+                for row in conn.execute("SELECT user_id, current_streak FROM attendance_counters")
+            }
+        return await self._execute(query)
+
+    async def get_attendance_totals(self) -> Dict[str, dict]:
+        """Статистика посещений за все время из материализованных счетчиков"""
+        def query(conn):
+            return {
+                row["user_id"]: make_stats(
+                    {"present": row["present"], "absent": row["absent"],
+                     "excused": row["excused"], "total": row["total"]},
+                    row["current_streak"]
+                )
+                for row in conn.execute("SELECT * FROM attendance_counters")
+            }
+        return await self._execute(query)
+
+    # Методы для работы с командами
+    async def create_team(self, name: str, members: List[int]) -> dict:
+        created_at = datetime.now().isoformat()
+
+        def query(conn):
+            row = conn.execute("SELECT COALESCE(MAX(CAST(id AS INTEGER)), 0) + 1 AS next_id FROM teams").fetchone()
+            team_id = str(row["next_id"])
+            conn.execute(
+                "INSERT INTO teams (id, name, points, created_at) VALUES (?, ?, 0, ?)",
+                (team_id, name, created_at)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO team_members (team_id, user_id, position) VALUES (?, ?, ?)",
+                [(team_id, str(m), i) for i, m in enumerate(members)]
+            )
+            return team_id
+
+        team_id = await self._execute(query, write=True)
+        return {
+            "id": team_id,
+            "name": name,
+            "members": [str(m) for m in members],
+            "points": 0,
+            "created_at": created_at
+        }
+
+    async def add_team_member(self, team_id: str, user_id: int):
+        def query(conn):
+            if not conn.execute("SELECT 1 FROM teams WHERE id = ?", (team_id,)).fetchone():
+                return
+            conn.execute(
+                "INSERT OR IGNORE INTO team_members (team_id, user_id, position) "
+                "SELECT ?, ?, COALESCE(MAX(position), -1) + 1 FROM team_members WHERE team_id = ?",
+                (team_id, str(user_id), team_id)
+            )
+        await self._execute(query, write=True)
+
+    async def remove_team_member(self, team_id: str, user_id: int):
+        def query(conn):
+            conn.execute(
+                "DELETE FROM team_members WHERE team_id = ? AND user_id = ?",
+                (team_id, str(user_id))
+            )
+        await self._execute(query)
+
+    async def delete_team(self, team_id: str):
+        deleted_at = datetime.now().isoformat()
+
+        def query(conn):
+            if conn.execute("DELETE FROM teams WHERE id = ?", (team_id,)).rowcount == 0:
+                return
+            # История переносится в архив в той же транзакции, что и удаление команды
+            conn.execute(
+                "INSERT INTO points_history_archive (id, team_id, points, reason, admin_id, timestamp, deleted_at) "
+                "SELECT id, team_id, points, reason, admin_id, timestamp, ? FROM points_history WHERE team_id = ?",
+                (deleted_at, team_id)
+            )
+            conn.execute("DELETE FROM points_history WHERE team_id = ?", (team_id,))
+        await self._execute(query, write=True)
+
+    async def get_team(self, team_id: str) -> Optional[dict]:
+        def query(conn):
+            teams = self._load_teams(conn, "WHERE id = ?", (team_id,))
+            return teams[0] if teams else None
+        return await self._execute(query)
+
+    async def get_all_teams(self, season: int = None) -> List[dict]:
+        def query(conn):
+            if season is not None:
+                return self._load_teams(conn, "WHERE season = ?", (season,))
+            return self._load_teams(conn)
+        return await self._execute(query)
+
+    async def get_available_members(self) -> List[dict]:
+        """Получить список пользователей, не состоящих в командах"""
+        def query(conn):
+            rows = conn.execute(
+                "SELECT u.* FROM users u "
+                "LEFT JOIN team_members tm ON tm.user_id = CAST(u.telegram_id AS TEXT) "
+                "WHERE tm.user_id IS NULL ORDER BY u.rowid"
+            )
+            return [self._user_row(row) for row in rows]
+        return await self._execute(query)
+
+    async def get_users_outside_team(self, team_id: str) -> List[dict]:
+        """Пользователи, которых можно добавить в команду"""
+        def query(conn):
+            rows = conn.execute(
+                "SELECT u.* FROM users u WHERE NOT EXISTS ("
+                "SELECT 1 FROM team_members tm WHERE tm.team_id = ? AND tm.user_id = CAST(u.telegram_id AS TEXT)"
+                ") ORDER BY u.rowid",
+                (team_id,)
+            )
+            return [self._user_row(row) for row in rows]
+        return await self._execute(query)
+
+    async def add_team_points(self, team_id: str, points: int, reason: str, admin_id: int) -> dict:
+        timestamp = datetime.now().isoformat()
+
+        def query(conn):
+            cursor = conn.execute("UPDATE teams SET points = points + ? WHERE id = ?", (points, team_id))
+            if cursor.rowcount == 0:
+                return None
+            conn.execute(
+                "INSERT INTO points_history (team_id, points, reason, admin_id, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (team_id, points, reason, admin_id, timestamp)
+            )
+            return self._load_teams(conn, "WHERE id = ?", (team_id,))[0]
+        return await self._execute(query)
+
+    async def get_team_points_history(self, team_id: str) -> List[dict]:
+        def query(conn):
+            rows = conn.execute("SELECT * FROM points_history WHERE team_id = ? ORDER BY id", (team_id,))
+            return [self._history_row(row) for row in rows]
+        return await self._execute(query)
+
+    async def get_leaderboard_version(self) -> int:
+        """Версия данных рейтинга: меняется при изменении баллов или составов команд"""
+        def query(conn):
+            row = conn.execute("SELECT value FROM meta WHERE key = 'leaderboard_version'").fetchone()
+            return row["value"] if row else 0
+        return await self._execute(query)
+
+    async def iter_points_history(
+        self,
+        team_ids: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        chunk_size: int = 500
+    ) -> AsyncIterator[List[dict]]:
+        """
+        История начислений порциями для выгрузки. Записи дополнены полем team_id,
+        since и until - границы по времени в формате ISO (until не включается).
+        """
+        conditions, params = ["id > ?"], []
+        if team_ids is not None:
+            conditions.append(f"team_id IN ({', '.join('?' * len(team_ids))})")
+            params.extend(team_ids)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        sql = f"SELECT * FROM points_history WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+
+        last_id = 0
+        while True:
+            def query(conn, last_id=last_id):
+                return conn.execute(sql, [last_id, *params, chunk_size]).fetchall()
+            rows = await self._execute(query)
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield [dict(self._history_row(row), team_id=row["team_id"]) for row in rows]
+
+    async def verify_team_points(self) -> Dict[str, dict]:
+        """Команды, у которых баллы расходятся с суммой начислений в истории"""
+        def query(conn):
+            rows = conn.execute(
+                "SELECT t.id, t.points, COALESCE(SUM(h.points), 0) AS ledger "
+                "FROM teams t LEFT JOIN points_history h ON h.team_id = t.id "
+                "GROUP BY t.id HAVING t.points != ledger"
+            )
+            return {row["id"]: {"points": row["points"], "ledger": row["ledger"]} for row in rows}
+        return await self._execute(query)
+
+    # Миграция
+    async def import_json(self, data_dir: str) -> Dict[str, int]:
+        """
+        Импорт данных из JSON файлов и журнала начислений JsonStorage.
+        Существующие данные в базе заменяются целиком.
+        """
+        users = read_json_file(os.path.join(data_dir, "users.json"))
+        teams = read_json_file(os.path.join(data_dir, "teams.json"))
+        attendance = read_json_file(os.path.join(data_dir, "attendance.json"))
+        history = read_ledger_history(data_dir)
+
+        def query(conn):
+            for table in ["points_history", "points_history_archive", "attendance", "attendance_counters", "team_members", "teams", "users"]:
+                conn.execute(f"DELETE FROM {table}")
+
+            conn.executemany(
+                "INSERT INTO users (telegram_id, username, is_admin, created_at, username_key) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (int(user_id), user.get("username"), int(bool(user.get("is_admin"))), user.get("created_at"),
+                     username_key(user.get("username")))
+                    for user_id, user in users.items()
+                ]
+            )
+            for team_id, team in teams.items():
+                conn.execute(
+                    "INSERT INTO teams (id, name, points, season, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (team_id, team["name"], team.get("points", 0), team.get("season"), team.get("created_at"))
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO team_members (team_id, user_id, position) VALUES (?, ?, ?)",
+                    [(team_id, str(m), i) for i, m in enumerate(team.get("members", []))]
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO attendance "
+                "(user_id, session, status, marked_by, timestamp, consecutive_absences) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (user_id, session, record["status"], record.get("marked_by"),
+                     record.get("timestamp"), record.get("consecutive_absences", 0))
+                    for session, records in attendance.items()
+                    for user_id, record in records.items()
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO points_history (team_id, points, reason, admin_id, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (team_id, entry["points"], entry.get("reason"), entry.get("admin_id"), entry.get("timestamp"))
+                    for team_id, entries in history.items()
+                    for entry in entries
+                ]
+            )
+
+        await self._execute(query)
+        return {
+            "users": len(users),
+            "teams": len(teams),
+            "attendance": sum(len(records) for records in attendance.values()),
+            "points_history": sum(len(entries) for entries in history.values())
+        }
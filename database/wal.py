@@ -0,0 +1,103 @@
+import json
+import os
+from typing import BinaryIO, Dict, List, Optional
+from utils.logger import logger
+from utils.metrics import metrics
+from database.persistence import read_json_file, write_json_file, apply_ops
+
+class WriteAheadLog:
+    """
+    Журнал изменений коллекции.
+    Состояние коллекции = снапшот (обычный JSON файл) + записи из журнала.
+    Каждое изменение дописывается одной строкой, периодически журнал
+    сворачивается в новый снапшот.
+    """
+    def __init__(self, snapshot_path: str) -> None:
+        self.snapshot_path = snapshot_path
+        self.log_path = f"{snapshot_path}.log"
+        self.records = 0
+        self._file: Optional[BinaryIO] = None
+
+    def load(self) -> Dict:
+        """Загрузка снапшота и воспроизведение журнала"""
+        data = read_json_file(self.snapshot_path)
+        self.records = 0
+        torn = False
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Оборванная запись в конце журнала (сбой во время записи)
+                        logger.warning(f"Повреждена запись в журнале {self.log_path}, хвост отброшен")
+                        torn = True
+                        break
+                    apply_ops(data, record["ops"])
+                    self.records += 1
+
+        if torn:
+            self.compact(data)
+        return data
+
+    def append(self, ops: List[Dict]) -> None:
+        """Дописывает изменение в журнал и сбрасывает его на диск"""
+        if self._file is None:
+            self._file = open(self.log_path, 'ab')
+        line = (json.dumps({"ops": ops}, ensure_ascii=False) + "\n").encode('utf-8')
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records += 1
+        metrics.inc("storage_bytes_total", len(line), op="append", file=os.path.basename(self.log_path))
+
+    def compact(self, data: Dict) -> None:
+        """
+        Сворачивает журнал в снапшот.
+        Записи журнала идемпотентны, поэтому сбой между заменой снапшота
+        и очисткой журнала не приводит к повторному применению изменений.
+        """
+        write_json_file(self.snapshot_path, data)
+        self.close()
+        with open(self.log_path, 'w', encoding='utf-8'):
+            pass
+        self.records = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class RedoJournal:
+    """
+    Журнал повтора для изменений, затрагивающих несколько коллекций.
+    Запись с описанием всех изменений сбрасывается на диск до их применения
+    и удаляется после; если процесс упал посередине, при открытии хранилища
+    изменения применяются повторно.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def write(self, record: Dict) -> None:
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self) -> Optional[Dict]:
+        """Незавершенная запись или None (оборванная запись не была зафиксирована)"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            try:
+                return json.loads(f.read())
+            except json.JSONDecodeError:
+                logger.warning(f"Оборванная запись в журнале {self.path} отброшена")
+                return None
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
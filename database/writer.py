@@ -0,0 +1,81 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from utils.logger import logger
+from database.persistence import read_json_file, write_json_file, apply_ops
+
+class GroupCommitWriter:
+    """
+    Единственный писатель файла коллекции.
+    Изменения, пришедшие в течение окна window, применяются к одной загрузке
+    файла и сохраняются одной атомарной записью. Каждый вызывающий ждет
+    свой future, который завершается после записи файла на диск.
+    """
+    def __init__(self, path: str, window: float) -> None:
+        self.path = path
+        self.window = window
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, ops: List[Dict]) -> Dict:
+        """Постановка изменения в очередь, возвращает состояние коллекции после записи"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((ops, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                data, errors = await loop.run_in_executor(
+                    None, self._flush, [ops for ops, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Ошибка группового сохранения {self.path}: {e}")
+                data, errors = None, [e] * len(batch)
+
+            for (_, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(data)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _flush(self, batches: List[List[Dict]]) -> Tuple[Dict, List[Optional[Exception]]]:
+        """Одна загрузка, применение всех изменений пачки и одна запись"""
+        data = read_json_file(self.path)
+        errors = []
+        for ops in batches:
+            try:
+                apply_ops(data, ops)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        write_json_file(self.path, data)
+        return data, errors
+
+    async def close(self) -> None:
+        """Дожидается записи всех поставленных изменений и останавливает писателя"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,6 +1,6 @@
 from aiogram import Dispatcher, types
 from aiogram.dispatcher.filters import Command
-from database.json_storage import db
+from database import db
 from utils.keyboards import (
     get_admin_keyboard, 
     get_attendance_panel_keyboard, 
@@ -9,16 +9,22 @@ from utils.keyboards import (
     get_members_selection_keyboard, 
     get_teams_points_keyboard,
     get_teams_edit_keyboard,
-    get_team_edit_keyboard
+    get_team_edit_keyboard,
+    get_member_search_keyboard
 )
 from config import config
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
-from datetime import datetime
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import pandas as pd
-from io import BytesIO
+from datetime import datetime, timedelta
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputFile
+import os
 from utils.decorators import log_errors
+from utils.leaderboard import leaderboard
+from utils.edit_coalescer import edit_coalescer
+from utils.outbound import outbound, BROADCAST
+from utils.message_builder import MessageBuilder, send_chunks, edit_chunks
+from utils.export import export_points_history, FORMATS
+from utils.metrics import perf_report
 import asyncio
 from utils.logger import logger
 
@@ -53,7 +59,7 @@ async def admin_panel(message: types.Message, state: FSMContext):
     user = await db.get_user(message.from_user.id)
     if not user or not user["is_admin"]:
         logger.warning(f"Попытка доступа к админ-панели: {message.from_user.id}")
-        return await message.answer("❌ У вас нет прав администратора.")
+        return await outbound.answer(message, "❌ У вас нет прав администратора.")
     
     await state.finish()
     
@@ -65,14 +71,50 @@ async def admin_panel(message: types.Message, state: FSMContext):
     text += "📊 Рейтинг - просмотр и публикация рейтинга\n"
     text += "📈 Статистика участников - личная статистика"
     
-    await message.answer(text, reply_markup=get_admin_keyboard())
+    await outbound.answer(message, text, reply_markup=get_admin_keyboard())
+
+# Отметки в состоянии FSM хранятся однобуквенными кодами статусов
+STATUS_CODES = {"present": "p", "absent": "a", "excused": "e"}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+async def render_attendance_panel(data: dict) -> InlineKeyboardMarkup:
+    """
+    Клавиатура текущей страницы отметки.
+    В состоянии хранятся только ID: участники страницы загружаются одним запросом.
+    """
+    user_ids = data.get('user_ids', [])
+    team_id = data.get('team_id')
+    team = await db.get_team(team_id) if team_id else None
+    if team:
+        members = set(team['members'])
+        user_ids = [user_id for user_id in user_ids if str(user_id) in members]
+    
+    page_size = config.ATTENDANCE_PAGE_SIZE
+    pages = max(1, (len(user_ids) + page_size - 1) // page_size)
+    page = min(data.get('page', 0), pages - 1)
+    page_ids = user_ids[page * page_size:(page + 1) * page_size]
+    users = await db.get_users_by_ids(page_ids)
+    marked = data.get('marked', {})
+    
+    return get_attendance_panel_keyboard(
+        [users[user_id] for user_id in page_ids if user_id in users],
+        {str(user_id): STATUS_NAMES[marked[str(user_id)]] for user_id in page_ids if str(user_id) in marked},
+        page=page,
+        pages=pages,
+        team_name=team['name'] if team else None
+    )
 
 async def start_attendance_marking(callback_query: types.CallbackQuery, state: FSMContext):
     # Получаем всех пользователей (включая админов)
     users = await db.get_all_users()
     
-    # Сохраняем список пользователей в состояние
-    await state.update_data(users=users, marked={})
+    # В состоянии храним только ID участников и отметки
+    await state.update_data(
+        user_ids=[user['telegram_id'] for user in users],
+        marked={},
+        page=0,
+        team_id=None
+    )
     
     text = "📋 Отметка присутствия\n\n"
     text += "Нажмите на соответствующий значок, чтобы отметить статус:\n"
@@ -81,53 +123,75 @@ async def start_attendance_marking(callback_query: types.CallbackQuery, state: F
     text += "⚠️ - уважительная причина\n\n"
     text += "После отметки всех участников нажмите 'Завершить отметку'"
     
-    keyboard = get_attendance_panel_keyboard(users)
-    await callback_query.message.edit_text(text, reply_markup=keyboard)
+    keyboard = await render_attendance_panel(await state.get_data())
+    await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
+    edit_coalescer.remember(callback_query.message, keyboard)
     await AttendanceMarking.marking.set()
 
 async def handle_attendance_mark(callback_query: types.CallbackQuery, state: FSMContext):
     try:
         data = await state.get_data()
-        users = data.get('users', [])
+        user_ids = data.get('user_ids', [])
+        # Ключи отметок - строковые ID, чтобы состояние сериализовалось в JSON,
+        # значения - коды статусов
         marked = data.get('marked', {})
         
-        if callback_query.data.startswith("mark_"):
-            _, status, user_id = callback_query.data.split('_')
-            user_id = int(user_id)
-            marked[user_id] = status
-            await state.update_data(marked=marked)
+        if callback_query.data.startswith(("mark_", "att_")):
+            if callback_query.data.startswith("mark_"):
+                _, status, user_id = callback_query.data.split('_')
+                marked[user_id] = STATUS_CODES[status]
+                await state.update_data(marked=marked)
+            elif callback_query.data.startswith("att_page_"):
+                await state.update_data(page=int(callback_query.data.replace("att_page_", "")))
+            elif callback_query.data == "att_team":
+                # Переключаемся на следующую команду, после последней - снова все участники
+                team_ids = [team['id'] for team in await db.get_all_teams()]
+                current = data.get('team_id')
+                if current in team_ids and team_ids.index(current) + 1 < len(team_ids):
+                    team_id = team_ids[team_ids.index(current) + 1]
+                else:
+                    team_id = team_ids[0] if current is None and team_ids else None
+                await state.update_data(team_id=team_id, page=0)
+            elif callback_query.data == "att_rest_present":
+                # Неотмеченные участники текущего фильтра отмечаются присутствующими
+                team = await db.get_team(data['team_id']) if data.get('team_id') else None
+                for user_id in user_ids:
+                    if team and str(user_id) not in team['members']:
+                        continue
+                    marked.setdefault(str(user_id), STATUS_CODES["present"])
+                await state.update_data(marked=marked)
             
-            await callback_query.message.edit_reply_markup(
-                reply_markup=get_attendance_panel_keyboard(users, marked)
-            )
+            # Клавиатура обновится не чаще раза в EDIT_DEBOUNCE_INTERVAL по последнему состоянию
+            async def render():
+                return await render_attendance_panel(await state.get_data())
+            edit_coalescer.submit(callback_query.message, render)
             await callback_query.answer()
             return
         
         elif callback_query.data == "finish_attendance":
-            if len(marked) < len(users):
+            if len(marked) < len(user_ids):
                 await callback_query.answer("Пожалуйста, отметьте всех участников!")
                 return
             
-            # Получаем текущую посещаемость
-            attendance = await db.get_attendance()
-            current_datetime = datetime.now().isoformat()
+            edit_coalescer.discard(callback_query.message)
+            marked = {int(user_id): STATUS_NAMES[code] for user_id, code in marked.items()}
+            
+            # Отметки, пропуски подряд и списания командам - одно сохранение
+            result = await db.finalize_attendance(
+                marked,
+                marked_by=callback_query.from_user.id,
+                penalty=-2,
+                reason="Автоматическое снятие баллов за пропуск занятия"
+            )
+            records = result["records"]
             
             # Группируем пользователей по статусам
             present_users = []
             absent_users = []
             excused_users = []
-            
-            # Сначала отмечаем посещаемость
+            users = await db.get_users_by_ids(marked)
             for user_id, status in marked.items():
-                # Сохраняем в базу
-                await db.mark_attendance(
-                    user_id=user_id,
-                    status=status,
-                    marked_by=callback_query.from_user.id
-                )
-                
-                # Находим пользователя
-                user = next((u for u in users if u["telegram_id"] == user_id), None)
+                user = users.get(user_id)
                 if user:
                     if status == "present":
                         present_users.append(user["username"])
@@ -136,78 +200,54 @@ async def handle_attendance_mark(callback_query: types.CallbackQuery, state: FSM
                     elif status == "excused":
                         excused_users.append(user["username"])
             
-            # Затем начисляем баллы командам
-            teams = await db.get_all_teams()
-            for team in teams:
-                team_attendance = {"present": 0, "absent": 0, "excused": 0}
-                
-                for member_id in team['members']:
-                    member_status = marked.get(int(member_id))
-                    if member_status in ["present", "excused"]:
-                        team_attendance["present"] += 1
-                    elif member_status == "absent":
-                        team_attendance["absent"] += 1
-                
-                # Если хотя бы один отсутствовал - снимаем баллы
-                if team_attendance["absent"] > 0:
-                    await db.add_team_points(
-                        team_id=team['id'],
-                        points=-2,
-                        reason="Автоматическое снятие баллов за пропуск занятия",
-                        admin_id=callback_query.from_user.id
-                    )
-            
-            # Получаем обновленные данные после всех отметок
-            attendance = await db.get_attendance()
-            
             # Формируем текст с результатами
             current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
-            result_text = (
-                f"📋 ОТЧЕТ О ПОСЕЩАЕМОСТИ\n"
-                f"{'─' * 30}\n"
-                f"📅 {current_time}\n\n"
-                
-                "✅ ПРИСУТСТВОВАЛИ:\n"
-                f"{''.join(f'└ {user}\n' for user in present_users) if present_users else '└ (нет)\n'}\n"
-                
-                "❌ ОТСУТСТВОВАЛИ:\n"
-            )
+            result_text = MessageBuilder()
+            result_text.line("📋 ОТЧЕТ О ПОСЕЩАЕМОСТИ").line('─' * 30).line(f"📅 {current_time}").line()
+            
+            result_text.line("✅ ПРИСУТСТВОВАЛИ:")
+            for user in present_users:
+                result_text.line(f"└ {user}")
+            if not present_users:
+                result_text.line("└ (нет)")
+            result_text.line()
+            
+            result_text.line("❌ ОТСУТСТВОВАЛИ:")
             
             # Добавляем отсутствующих с учетом пропусков подряд
             if absent_users:
                 for user in absent_users:
-                    # Находим последнюю запись для пользователя
-                    user_records = []
-                    for date in attendance:
-                        if str(user['telegram_id']) in attendance[date]:
-                            user_records.append((date, attendance[date][str(user['telegram_id'])]))
-                    
-                    if user_records:
-                        # Берем самую последнюю запись
-                        latest_record = max(user_records, key=lambda x: x[0])
-                        consecutive = latest_record[1].get('consecutive_absences', 0)
-                        result_text += f"└ {user['username']}"
-                        if consecutive > 1:
-                            result_text += f" ⚠️ {consecutive} раз подряд"
-                        result_text += "\n"
+                    consecutive = records[user['telegram_id']]['consecutive_absences']
+                    result_text.add(f"└ {user['username']}")
+                    if consecutive > 1:
+                        result_text.add(f" ⚠️ {consecutive} раз подряд")
+                    result_text.line()
             else:
-                result_text += "└ (нет)\n"
+                result_text.line("└ (нет)")
             
-            result_text += "\n⚠️ ПО УВАЖИТЕЛЬНОЙ ПРИЧИНЕ:\n"
-            result_text += f"{''.join(f'└ {user}\n' for user in excused_users) if excused_users else '└ (нет)\n'}"
+            result_text.line().line("⚠️ ПО УВАЖИТЕЛЬНОЙ ПРИЧИНЕ:")
+            for user in excused_users:
+                result_text.line(f"└ {user}")
+            if not excused_users:
+                result_text.line("└ (нет)")
             
-            # Отправляем результаты в групповой чат
-            await callback_query.bot.send_message(config.GROUP_CHAT_ID, result_text)
+            # Отправляем результаты в групповой чат (длинный отчет - несколькими сообщениями)
+            await send_chunks(
+                callback_query.bot, config.GROUP_CHAT_ID, result_text, priority=BROADCAST, wait=False
+            )
             
             # Возвращаемся в админ-панель
-            await callback_query.message.edit_text(
+            await outbound.edit_text(
+                callback_query.message,
                 "Отметка присутствия завершена!",
                 reply_markup=get_admin_keyboard()
             )
             await state.finish()
         
         elif callback_query.data == "back_to_admin":
-            await callback_query.message.edit_text(
+            edit_coalescer.discard(callback_query.message)
+            await outbound.edit_text(
+                callback_query.message,
                 "Панель администратора:",
                 reply_markup=get_admin_keyboard()
             )
@@ -221,27 +261,27 @@ async def handle_attendance_mark(callback_query: types.CallbackQuery, state: FSM
 async def cmd_create_team(message: types.Message):
     user = await db.get_user(message.from_user.id)
     if not user or not user["is_admin"]:
-        return await message.answer("У вас нет прав администратора.")
+        return await outbound.answer(message, "У вас нет прав администратора.")
     
     await TeamCreation.waiting_for_name.set()
-    await message.answer("Введите название новой команды:")
+    await outbound.answer(message, "Введите название новой команды:")
 
 async def process_team_name(message: types.Message, state: FSMContext):
     team_name = message.text
     current_season = datetime.now().month
     
     team = await db.create_team(name=team_name, season=current_season)
-    await message.answer(f"Команда '{team_name}' успешно создана!")
+    await outbound.answer(message, f"Команда '{team_name}' успешно создана!")
     await state.finish()
 
 async def cmd_add_member(message: types.Message):
     user = await db.get_user(message.from_user.id)
     if not user or not user["is_admin"]:
-        return await message.answer("У вас нет прав администратора.")
+        return await outbound.answer(message, "У вас нет прав администратора.")
     
     teams = await db.get_all_teams(season=datetime.now().month)
     if not teams:
-        return await message.answer("Нет доступных команд. Сначала создайте команду.")
+        return await outbound.answer(message, "Нет доступных команд. Сначала создайте команду.")
     
     keyboard = InlineKeyboardMarkup(row_width=1)
     for team in teams:
@@ -251,13 +291,17 @@ async def cmd_add_member(message: types.Message):
         ))
     
     await TeamMemberAdd.waiting_for_team.set()
-    await message.answer("Выберите команду для добавления участника:", reply_markup=keyboard)
+    await outbound.answer(message, "Выберите команду для добавления участника:", reply_markup=keyboard)
 
 async def process_team_selection(callback: types.CallbackQuery, state: FSMContext):
     team_id = callback.data.split('_')[2]
     await state.update_data(team_id=team_id)
     await TeamMemberAdd.waiting_for_username.set()
-    await callback.message.answer("Введите username участника (без @):")
+    await outbound.answer(
+        callback.message,
+        "Введите username участника (без @) или найдите его по началу имени:",
+        reply_markup=get_member_search_keyboard()
+    )
     await callback.answer()
 
 async def process_member_username(message: types.Message, state: FSMContext):
@@ -266,22 +310,39 @@ async def process_member_username(message: types.Message, state: FSMContext):
     team_id = data['team_id']
     
     # Проверяем, существует ли пользователь
-    users = await db.get_all_users()
-    user = next((u for u in users if u["username"] == username), None)
+    user = await db.find_user_by_username(username)
     
     if not user:
-        await message.answer("Пользователь не найден. Убедитесь, что он уже использовал бота (/start)")
+        await outbound.answer(message, "Пользователь не найден. Убедитесь, что он уже использовал бота (/start)")
         await state.finish()
         return
     
     await db.add_team_member(team_id, user["telegram_id"])
     team = await db.get_team(team_id)
-    await message.answer(f"Участник @{username} добавлен в команду {team['name']}!")
+    await outbound.answer(message, f"Участник @{user['username']} добавлен в команду {team['name']}!")
     await state.finish()
 
+async def search_members_inline(inline_query: types.InlineQuery):
+    """Подбор участников по началу имени в inline режиме (только для админов)"""
+    user = await db.get_user(inline_query.from_user.id)
+    results = []
+    if user and user["is_admin"]:
+        users = await db.search_users(inline_query.query, limit=config.INLINE_RESULTS_LIMIT)
+        # Выбранный вариант отправляется в чат именем участника
+        results = [
+            types.InlineQueryResultArticle(
+                id=str(member["telegram_id"]),
+                title=member["username"],
+                input_message_content=types.InputTextMessageContent(member["username"])
+            )
+            for member in users
+        ]
+    await inline_query.answer(results, cache_time=config.INLINE_CACHE_TIME, is_personal=True)
+
 async def manage_admins(callback_query: types.CallbackQuery, state: FSMContext):
     if callback_query.data == "back_to_admin":
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             "Панель администратора:",
             reply_markup=get_admin_keyboard()
         )
@@ -303,7 +364,7 @@ async def manage_admins(callback_query: types.CallbackQuery, state: FSMContext):
     text += "⬜️ - обычный пользователь"
     
     keyboard = get_manage_admins_keyboard(users)
-    await callback_query.message.edit_text(text, reply_markup=keyboard)
+    await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
     await AdminManagement.managing.set()
 
 async def toggle_admin_rights(callback_query: types.CallbackQuery, state: FSMContext):
@@ -331,7 +392,7 @@ async def toggle_admin_rights(callback_query: types.CallbackQuery, state: FSMCon
         
         # Обновляем клавиатуру
         keyboard = get_manage_admins_keyboard(users)
-        await callback_query.message.edit_reply_markup(reply_markup=keyboard)
+        await outbound.edit_reply_markup(callback_query.message, reply_markup=keyboard)
         
         # Отправляем уведомление
         status_text = "назначен администратором" if new_status else "снят с прав администратора"
@@ -345,7 +406,8 @@ async def toggle_admin_rights(callback_query: types.CallbackQuery, state: FSMCon
 
 async def team_management(callback_query: types.CallbackQuery, state: FSMContext):
     if callback_query.data == "back_to_admin":
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             "Панель администратора:",
             reply_markup=get_admin_keyboard()
         )
@@ -353,7 +415,8 @@ async def team_management(callback_query: types.CallbackQuery, state: FSMContext
         return
     elif callback_query.data == "back_to_team_management":
         keyboard = get_team_management_keyboard()
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             "🏆 Управление командами\n\n"
             "Выберите действие:",
             reply_markup=keyboard
@@ -362,7 +425,8 @@ async def team_management(callback_query: types.CallbackQuery, state: FSMContext
     elif callback_query.data == "back_to_teams_list":
         teams = await db.get_all_teams()
         keyboard = get_teams_edit_keyboard(teams)
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             "✏️ Редактирование команд\n\n"
             "Выберите команду для редактирования:",
             reply_markup=keyboard
@@ -370,7 +434,8 @@ async def team_management(callback_query: types.CallbackQuery, state: FSMContext
         return
 
     keyboard = get_team_management_keyboard()
-    await callback_query.message.edit_text(
+    await outbound.edit_text(
+        callback_query.message,
         "🏆 Управление командами\n\n"
         "Выберите действие:",
         reply_markup=keyboard
@@ -385,7 +450,8 @@ async def start_team_creation(callback_query: types.CallbackQuery, state: FSMCon
         return
 
     keyboard = get_members_selection_keyboard(available_users)
-    await callback_query.message.edit_text(
+    await outbound.edit_text(
+        callback_query.message,
         "👥 Создание новой команды\n\n"
         "Выберите участников команды (минимум 2):",
         reply_markup=keyboard
@@ -408,7 +474,7 @@ async def toggle_member_selection(callback_query: types.CallbackQuery, state: FS
     available_users = await db.get_available_members()
     keyboard = get_members_selection_keyboard(available_users, selected_members)
     
-    await callback_query.message.edit_reply_markup(reply_markup=keyboard)
+    await outbound.edit_reply_markup(callback_query.message, reply_markup=keyboard)
     await callback_query.answer()
 
 async def confirm_member_selection(callback_query: types.CallbackQuery, state: FSMContext):
@@ -419,7 +485,7 @@ async def confirm_member_selection(callback_query: types.CallbackQuery, state: F
         await callback_query.answer("Выберите минимум 2 участника!", show_alert=True)
         return
 
-    await callback_query.message.edit_text("Введите название для команды:")
+    await outbound.edit_text(callback_query.message, "Введите название для команды:")
     await TeamManagement.entering_name.set()
     await callback_query.answer()
 
@@ -431,20 +497,19 @@ async def process_team_name(message: types.Message, state: FSMContext):
     team = await db.create_team(name=message.text, members=selected_members)
     
     # Получаем имена участников
-    members_names = []
-    for member_id in selected_members:
-        user = await db.get_user(member_id)
-        if user:
-            members_names.append(user['username'])
+    users = await db.get_users_by_ids(selected_members)
+    members_names = [users[int(member_id)]['username'] for member_id in selected_members if int(member_id) in users]
     
-    await message.answer(
+    await outbound.answer(
+        message,
         f"✅ Команда \"{team['name']}\" успешно создана!\n\n"
         f"Участники:\n" + "\n".join(f"👤 {name}" for name in members_names)
     )
     
     # Возвращаемся в меню управления командами
     keyboard = get_team_management_keyboard()
-    await message.answer(
+    await outbound.answer(
+        message,
         "🏆 Управление командами\n\n"
         "Выберите действие:",
         reply_markup=keyboard
@@ -459,7 +524,8 @@ async def show_teams_for_points(callback_query: types.CallbackQuery, state: FSMC
             return
 
         keyboard = get_teams_points_keyboard(teams)
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             "📊 Управление баллами команд\n\n"
             "Выберите команду для начисления/снятия баллов:",
             reply_markup=keyboard
@@ -487,7 +553,8 @@ async def show_team_points_actions(callback_query: types.CallbackQuery, state: F
         text += "• Положительное число для начисления (например: 5)\n"
         text += "• Отрицательное число для снятия (например: -3)"
         
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             text,
             reply_markup=InlineKeyboardMarkup().add(
                 InlineKeyboardButton("◀️ Назад", callback_data="back_to_teams_list")
@@ -529,7 +596,7 @@ async def handle_points_action(callback_query: types.CallbackQuery, state: FSMCo
             )
             keyboard.add(InlineKeyboardButton("◀️ Назад", callback_data="back_to_team_management"))
             
-            await callback_query.message.edit_text(text, reply_markup=keyboard)
+            await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
             
         elif action in ["add", "remove"]:
             points = int(team_id.split('_')[1])
@@ -539,7 +606,8 @@ async def handle_points_action(callback_query: types.CallbackQuery, state: FSMCo
             await TeamManagement.entering_reason.set()
             await state.update_data(team_id=team_id.split('_')[0], points=points)
             
-            await callback_query.message.edit_text(
+            await outbound.edit_text(
+                callback_query.message,
                 "Введите причину изменения баллов:",
                 reply_markup=InlineKeyboardMarkup().add(
                     InlineKeyboardButton("Отмена", callback_data="back_to_team_management")
@@ -550,7 +618,8 @@ async def handle_points_action(callback_query: types.CallbackQuery, state: FSMCo
             await TeamManagement.entering_points.set()
             await state.update_data(team_id=team_id)
             
-            await callback_query.message.edit_text(
+            await outbound.edit_text(
+                callback_query.message,
                 "Введите количество баллов (положительное или отрицательное число):",
                 reply_markup=InlineKeyboardMarkup().add(
                     InlineKeyboardButton("Отмена", callback_data="back_to_team_management")
@@ -571,24 +640,26 @@ async def process_custom_points(message: types.Message, state: FSMContext):
         team = await db.get_team(team_id)
         
         if not team:
-            await message.answer("Команда не найдена!")
+            await outbound.answer(message, "Команда не найдена!")
             await state.finish()
             return
         
         await state.update_data(points_to_add=points)
-        await message.answer(
+        await outbound.answer(
+            message,
             f"Укажите причину {'начисления' if points > 0 else 'снятия'} {abs(points)} баллов:"
         )
         await TeamManagement.entering_reason.set()
     except ValueError:
-        await message.answer(
+        await outbound.answer(
+            message,
             "Пожалуйста, введите целое число.\n"
             "• Положительное для начисления (например: 5)\n"
             "• Отрицательное для снятия (например: -3)"
         )
     except Exception as e:
         print(f"Error in process_custom_points: {e}")
-        await message.answer("Произошла ошибка. Попробуйте еще раз.")
+        await outbound.answer(message, "Произошла ошибка. Попробуйте еще раз.")
 
 async def process_points_reason(message: types.Message, state: FSMContext):
     data = await state.get_data()
@@ -604,7 +675,8 @@ async def process_points_reason(message: types.Message, state: FSMContext):
     )
     
     if team:
-        await message.answer(
+        await outbound.answer(
+            message,
             f"✅ Баллы {'начислены' if points > 0 else 'сняты'}!\n\n"
             f"Команда: {team['name']}\n"
             f"{'Начислено' if points > 0 else 'Снято'}: {abs(points)} баллов\n"
@@ -615,7 +687,8 @@ async def process_points_reason(message: types.Message, state: FSMContext):
     # Возвращаемся к списку команд
     teams = await db.get_all_teams()
     keyboard = get_teams_points_keyboard(teams)
-    await message.answer(
+    await outbound.answer(
+        message,
         "📊 Управление баллами команд\n\n"
         "Выберите команду для начисления/снятия баллов:",
         reply_markup=keyboard
@@ -633,11 +706,14 @@ async def show_points_history(callback_query: types.CallbackQuery):
         ))
     
     keyboard.add(
-        InlineKeyboardButton("📥 Выгрузить полную историю", callback_data="download_history"),
+        InlineKeyboardButton("📥 Выгрузить полную историю", callback_data="download_history_xlsx_all"),
+        InlineKeyboardButton("📥 За последние 30 дней", callback_data="download_history_xlsx_30"),
+        InlineKeyboardButton("📥 Полная история (CSV)", callback_data="download_history_csv_all"),
         InlineKeyboardButton("◀️ Назад", callback_data="back_to_team_management")
     )
     
-    await callback_query.message.edit_text(
+    await outbound.edit_text(
+        callback_query.message,
         "📋 История начислений\n\n"
         "Выберите команду для просмотра последних операций:",
         reply_markup=keyboard
@@ -670,60 +746,50 @@ async def show_team_history(callback_query: types.CallbackQuery):
         
         keyboard = InlineKeyboardMarkup(row_width=1)
         keyboard.add(
+            InlineKeyboardButton("📥 Выгрузить историю команды", callback_data=f"download_history_xlsx_all_{team_id}"),
             InlineKeyboardButton("◀️ Назад к списку команд", callback_data="points_history"),
             InlineKeyboardButton("◀️ В главное меню", callback_data="back_to_team_management")
         )
         
-        await callback_query.message.edit_text(text, reply_markup=keyboard)
+        await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
     except Exception as e:
         print(f"Error in show_team_history: {e}")
         await callback_query.answer("Произошла ошибка при загрузке истории", show_alert=True)
 
 async def download_points_history(callback_query: types.CallbackQuery):
-    teams = await db.get_all_teams()
-    if not teams:
-        await callback_query.answer("Нет данных для выгрузки!", show_alert=True)
-        return
+    """
+    Выгрузка истории начислений.
+    Формат callback: download_history[_<xlsx|csv>[_<all|дней>[_<id команды>]]]
+    """
+    parts = callback_query.data.split("_")[2:]
+    fmt = parts[0] if parts and parts[0] in FORMATS else "xlsx"
+    period = parts[1] if len(parts) > 1 else "all"
+    team_ids = [parts[2]] if len(parts) > 2 else None
+    since = None
+    if period.isdigit():
+        since = (datetime.now() - timedelta(days=int(period))).isoformat()
 
-    # Создаем данные для Excel
-    data = []
-    for team in teams:
-        history = await db.get_team_points_history(team['id'])
-        for record in history:
-            admin = await db.get_user(record['admin_id'])
-            admin_name = admin['username'] if admin else "Неизвестный"
-            data.append({
-                'Команда': team['name'],
-                'Баллы': record['points'],
-                'Причина': record['reason'],
-                'Администратор': admin_name,
-                'Дата': datetime.fromisoformat(record['timestamp']).strftime("%d.%m.%Y %H:%M")
-            })
-    
-    if not data:
-        await callback_query.answer("Нет данных для выгрузки!", show_alert=True)
+    await callback_query.answer("Готовим файл...")
+    path = await export_points_history(db, fmt=fmt, since=since, team_ids=team_ids)
+    if path is None:
+        await outbound.answer(callback_query.message, "Нет данных для выгрузки!")
         return
-    
-    # Создаем DataFrame и сохраняем в Excel
-    df = pd.DataFrame(data)
-    
-    # Создаем буфер для файла
-    excel_buffer = BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='История баллов')
-    
-    excel_buffer.seek(0)
-    
+
     # Формируем имя файла с текущей датой
     current_date = datetime.now().strftime("%Y%m%d")
-    filename = f"points_history_{current_date}.xlsx"
-    
-    # Отправляем файл
-    await callback_query.message.answer_document(
-        document=("points_history.xlsx", excel_buffer),
-        caption="📊 История начисления баллов"
-    )
-    await callback_query.answer()
+    filename = f"points_history_{current_date}.{fmt}"
+
+    # Файл отправляется с диска (при повторе после RetryAfter читается заново)
+    try:
+        await outbound.send(
+            callback_query.message.chat.id,
+            lambda: callback_query.message.answer_document(
+                document=InputFile(path, filename=filename),
+                caption="📊 История начисления баллов"
+            )
+        )
+    finally:
+        os.remove(path)
 
 async def show_teams_for_edit(callback_query: types.CallbackQuery):
     teams = await db.get_all_teams()
@@ -732,7 +798,8 @@ async def show_teams_for_edit(callback_query: types.CallbackQuery):
         return
 
     keyboard = get_teams_edit_keyboard(teams)
-    await callback_query.message.edit_text(
+    await outbound.edit_text(
+        callback_query.message,
         "✏️ Редактирование команд\n\n"
         "Выберите команду для редактирования:",
         reply_markup=keyboard
@@ -744,7 +811,8 @@ async def edit_team(callback_query: types.CallbackQuery, state: FSMContext):
     if callback_query.data == "back_to_teams_list":
         teams = await db.get_all_teams()
         keyboard = get_teams_edit_keyboard(teams)
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             "✏️ Редактирование команд\n\n"
             "Выберите команду для редактирования:",
             reply_markup=keyboard
@@ -760,18 +828,15 @@ async def edit_team(callback_query: types.CallbackQuery, state: FSMContext):
     
     await state.update_data(current_team_id=team_id)
     
-    members = []
-    for member_id in team['members']:
-        user = await db.get_user(int(member_id))
-        if user:
-            members.append(user)
+    users = await db.get_users_by_ids(int(member_id) for member_id in team['members'])
+    members = [users[int(member_id)] for member_id in team['members'] if int(member_id) in users]
     
     text = f"✏️ Редактирование команды \"{team['name']}\"\n\n"
     text += "• Нажмите на участника, чтобы удалить его\n"
     text += "• Используйте кнопки внизу для других действий"
     
     keyboard = get_team_edit_keyboard(team, members)
-    await callback_query.message.edit_text(text, reply_markup=keyboard)
+    await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
 
 async def remove_team_member(callback_query: types.CallbackQuery, state: FSMContext):
     try:
@@ -793,11 +858,8 @@ async def remove_team_member(callback_query: types.CallbackQuery, state: FSMCont
                 return
             
             # Получаем обновленный список участников
-            members = []
-            for member_id in team['members']:
-                user = await db.get_user(int(member_id))
-                if user:
-                    members.append(user)
+            users = await db.get_users_by_ids(int(member_id) for member_id in team['members'])
+            members = [users[int(member_id)] for member_id in team['members'] if int(member_id) in users]
             
             # Обновляем отображение команды
             text = f"✏️ Редактирование команды \"{team['name']}\"\n\n"
@@ -805,7 +867,7 @@ async def remove_team_member(callback_query: types.CallbackQuery, state: FSMCont
             text += "• Используйте кнопки внизу для других действий"
             
             keyboard = get_team_edit_keyboard(team, members)
-            await callback_query.message.edit_text(text, reply_markup=keyboard)
+            await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
             await callback_query.answer("Участник удален из команды")
         else:
             await callback_query.answer("Ошибка формата данных", show_alert=True)
@@ -820,7 +882,8 @@ async def delete_team(callback_query: types.CallbackQuery):
     # Возвращаемся к списку команд
     teams = await db.get_all_teams()
     keyboard = get_teams_edit_keyboard(teams)
-    await callback_query.message.edit_text(
+    await outbound.edit_text(
+        callback_query.message,
         "✏️ Редактирование команд\n\n"
         "Выберите команду для редактирования:",
         reply_markup=keyboard
@@ -837,9 +900,7 @@ async def start_add_member(callback_query: types.CallbackQuery, state: FSMContex
             return
         
         # Получаем список доступных пользователей
-        all_users = await db.get_all_users()
-        team_members = set(int(m) for m in team['members'])
-        available_users = [u for u in all_users if u['telegram_id'] not in team_members]
+        available_users = await db.get_users_outside_team(team_id)
         
         if not available_users:
             await callback_query.answer("Нет доступных участников для добавления!", show_alert=True)
@@ -848,7 +909,8 @@ async def start_add_member(callback_query: types.CallbackQuery, state: FSMContex
         await state.update_data(current_team_id=team_id)
         keyboard = get_members_selection_keyboard(available_users)
         
-        await callback_query.message.edit_text(
+        await outbound.edit_text(
+            callback_query.message,
             f"Выберите участника для добавления в команду \"{team['name']}\":",
             reply_markup=keyboard
         )
@@ -872,11 +934,8 @@ async def add_team_member(callback_query: types.CallbackQuery, state: FSMContext
         
         # Получаем обновленную информацию
         team = await db.get_team(team_id)
-        members = []
-        for member_id in team['members']:
-            user = await db.get_user(int(member_id))
-            if user:
-                members.append(user)
+        users = await db.get_users_by_ids(int(member_id) for member_id in team['members'])
+        members = [users[int(member_id)] for member_id in team['members'] if int(member_id) in users]
         
         # Обновляем отображение команды
         text = f"✏️ Редактирование команды \"{team['name']}\"\n\n"
@@ -884,7 +943,7 @@ async def add_team_member(callback_query: types.CallbackQuery, state: FSMContext
         text += "• Используйте кнопки внизу для других действий"
         
         keyboard = get_team_edit_keyboard(team, members)
-        await callback_query.message.edit_text(text, reply_markup=keyboard)
+        await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
         await callback_query.answer("Участник добавлен в команду")
         await state.finish()
     except Exception as e:
@@ -892,28 +951,11 @@ async def add_team_member(callback_query: types.CallbackQuery, state: FSMContext
         await callback_query.answer("Произошла ошибка при добавлении участника", show_alert=True)
 
 async def show_rating(callback_query: types.CallbackQuery):
-    teams = await db.get_all_teams()
-    if not teams:
+    if not await leaderboard.standings():
         await callback_query.answer("Нет доступных команд!", show_alert=True)
         return
     
-    # Сортируем команды по баллам
-    teams_sorted = sorted(teams, key=lambda x: x['points'], reverse=True)
-    
-    text = "🏆 РЕЙТИНГ КОМАНД\n\n"
-    
-    for i, team in enumerate(teams_sorted, 1):
-        # Добавляем эмодзи для топ-3
-        prefix = {1: "🥇", 2: "🥈", 3: "🥉"}.get(i, f"{i}.")
-        text += f"{prefix} {team['name']}\n"
-        text += f"└ {team['points']} баллов\n"
-        # Получаем участников команды
-        members = []
-        for member_id in team['members']:
-            user = await db.get_user(int(member_id))
-            if user:
-                members.append(user['username'])
-        text += f"👥 Участники: {', '.join(members)}\n\n"
+    chunks = await leaderboard.render("🏆 РЕЙТИНГ КОМАНД")
     
     keyboard = InlineKeyboardMarkup(row_width=1)
     keyboard.add(
@@ -921,27 +963,13 @@ async def show_rating(callback_query: types.CallbackQuery):
         InlineKeyboardButton("◀️ Назад", callback_data="back_to_admin")
     )
     
-    await callback_query.message.edit_text(text, reply_markup=keyboard)
+    await edit_chunks(callback_query.message, chunks, reply_markup=keyboard)
     await callback_query.answer()
 
 async def publish_rating(callback_query: types.CallbackQuery):
-    teams = await db.get_all_teams()
-    teams_sorted = sorted(teams, key=lambda x: x['points'], reverse=True)
-    
-    text = "📊 РЕЙТИНГ КОМАНД\n\n"
+    chunks = await leaderboard.render("📊 РЕЙТИНГ КОМАНД")
     
-    for i, team in enumerate(teams_sorted, 1):
-        prefix = {1: "🥇", 2: "🥈", 3: "🥉"}.get(i, f"{i}.")
-        text += f"{prefix} {team['name']}\n"
-        text += f"└ {team['points']} баллов\n"
-        members = []
-        for member_id in team['members']:
-            user = await db.get_user(int(member_id))
-            if user:
-                members.append(user['username'])
-        text += f"👥 Участники: {', '.join(members)}\n\n"
-    
-    await callback_query.bot.send_message(config.GROUP_CHAT_ID, text)
+    await send_chunks(callback_query.bot, config.GROUP_CHAT_ID, chunks, priority=BROADCAST, wait=False)
     await callback_query.answer("Рейтинг опубликован в общем чате!")
 
 @log_errors
@@ -949,27 +977,30 @@ async def show_members_statistics(callback_query: types.CallbackQuery):
     """Показать статистику участников"""
     try:
         users = await db.get_all_users()
+        all_stats = await db.get_all_attendance_stats()
         stats_list = []
         
         for user in users:
-            stats = await db.get_user_attendance_stats(user['telegram_id'])
+            stats = all_stats.get(str(user['telegram_id']))
+            if stats is None:
+                stats = await db.get_user_attendance_stats(user['telegram_id'])
             stats_list.append((user, stats))
         
         # Сортируем по посещаемости
         stats_list.sort(key=lambda x: x[1]['attendance_rate'], reverse=True)
         
-        text = "📊 СТАТИСТИКА УЧАСТНИКОВ\n\n"
+        text = MessageBuilder().line("📊 СТАТИСТИКА УЧАСТНИКОВ").line()
         
         for user, stats in stats_list:
-            text += f"👤 {user['username']}\n"
-            text += f"├ Посещаемость: {stats['attendance_rate']:.1f}%\n"
-            text += f"├ Присутствий: {stats['present']}\n"
-            text += f"└ Пропусков: {stats['absent']}"
+            text.line(f"👤 {user['username']}")
+            text.line(f"├ Посещаемость: {stats['attendance_rate']:.1f}%")
+            text.line(f"├ Присутствий: {stats['present']}")
+            text.add(f"└ Пропусков: {stats['absent']}")
             
             if stats['consecutive_absences'] > 1:
-                text += f" ⚠️ {stats['consecutive_absences']} раз подряд"
+                text.add(f" ⚠️ {stats['consecutive_absences']} раз подряд")
             
-            text += "\n\n"
+            text.line().line()
         
         keyboard = InlineKeyboardMarkup(row_width=1)
         keyboard.add(
@@ -977,12 +1008,24 @@ async def show_members_statistics(callback_query: types.CallbackQuery):
             InlineKeyboardButton("◀️ Назад", callback_data="back_to_admin")
         )
         
-        await callback_query.message.edit_text(text, reply_markup=keyboard)
+        await edit_chunks(callback_query.message, text, reply_markup=keyboard)
         
     except Exception as e:
         logger.error(f"Ошибка в show_members_statistics: {e}")
         await callback_query.answer("Произошла ошибка при загрузке статистики", show_alert=True)
 
+async def cmd_perf(message: types.Message):
+    """Сводка метрик процесса: время хендлеров, хранилища, кэш и очередь исходящих"""
+    user = await db.get_user(message.from_user.id)
+    if not user or not user["is_admin"]:
+        return await outbound.answer(message, "❌ У вас нет прав администратора.")
+    
+    lines = perf_report()
+    text = MessageBuilder().line("⏱ ПРОИЗВОДИТЕЛЬНОСТЬ").line()
+    for line in lines or ["Данных пока нет"]:
+        text.line(line)
+    await send_chunks(message.bot, message.chat.id, text)
+
 async def show_user_stats(callback_query: types.CallbackQuery):
     try:
         user_id = int(callback_query.data.replace("user_stats_", ""))
@@ -1024,25 +1067,22 @@ async def show_user_stats(callback_query: types.CallbackQuery):
             InlineKeyboardButton("◀️ В главное меню", callback_data="back_to_admin")
         )
         
-        await callback_query.message.edit_text(text, reply_markup=keyboard)
+        await outbound.edit_text(callback_query.message, text, reply_markup=keyboard)
     except Exception as e:
         print(f"Error in show_user_stats: {e}")
         await callback_query.answer("Произошла ошибка при загрузке статистики", show_alert=True)
 
 async def publish_attendance_rating(callback_query: types.CallbackQuery):
     users = await db.get_all_users()
-    attendance = await db.get_attendance()
+    totals = await db.get_attendance_totals()
     
     stats = []
     for user in users:
-        total_marked = 0
-        present = 0
-        
-        for date in attendance:
-            if str(user['telegram_id']) in attendance[date]:
-                total_marked += 1
-                if attendance[date][str(user['telegram_id'])]["status"] == "present":
-                    present += 1
+        user_totals = totals.get(str(user['telegram_id']))
+        if not user_totals:
+            continue
+        total_marked = user_totals['total_marked']
+        present = user_totals['present']
         
         if total_marked > 0:
             attendance_rate = (present / total_marked * 100)
@@ -1051,16 +1091,16 @@ async def publish_attendance_rating(callback_query: types.CallbackQuery):
     # Сортируем по проценту посещений
     stats.sort(key=lambda x: x[1], reverse=True)
     
-    text = "📊 РЕЙТИНГ ПОСЕЩАЕМОСТИ\n"
-    text += f"{'─' * 30}\n\n"
+    text = MessageBuilder().line("📊 РЕЙТИНГ ПОСЕЩАЕМОСТИ")
+    text.line('─' * 30).line()
     
     for i, (username, rate, present, total) in enumerate(stats, 1):
         prefix = {1: "🥇", 2: "🥈", 3: "🥉"}.get(i, f"{i}.")
         stars = "⭐️" * (5 if rate >= 90 else 4 if rate >= 75 else 3 if rate >= 60 else 2 if rate >= 40 else 1)
-        text += f"{prefix} {username}\n"
-        text += f"└ {rate:.1f}% ({present}/{total}) {stars}\n\n"
+        text.line(f"{prefix} {username}")
+        text.line(f"└ {rate:.1f}% ({present}/{total}) {stars}").line()
     
-    await callback_query.bot.send_message(config.GROUP_CHAT_ID, text)
+    await send_chunks(callback_query.bot, config.GROUP_CHAT_ID, text, priority=BROADCAST, wait=False)
     await callback_query.answer("Рейтинг посещений опубликован!")
 
 @log_errors
@@ -1071,10 +1111,11 @@ async def back_to_team_management(callback_query: types.CallbackQuery, state: FS
         "🏆 УПРАВЛЕНИЕ КОМАНДАМИ\n\n"
         "Выберите действие из меню ниже:"
     )
-    await callback_query.message.edit_text(text, reply_markup=get_team_management_keyboard())
+    await outbound.edit_text(callback_query.message, text, reply_markup=get_team_management_keyboard())
 
 def register_handlers(dp: Dispatcher):
     dp.register_message_handler(admin_panel, commands=["admin"], state="*")
+    dp.register_message_handler(cmd_perf, commands=["perf"], state="*")
     dp.register_callback_query_handler(manage_admins, text="manage_admins")
     dp.register_callback_query_handler(manage_admins, text="back_to_admin", state=AdminManagement.managing)
     dp.register_callback_query_handler(
@@ -1085,7 +1126,7 @@ def register_handlers(dp: Dispatcher):
     dp.register_callback_query_handler(start_attendance_marking, text="mark_attendance")
     dp.register_callback_query_handler(
         handle_attendance_mark,
-        lambda c: c.data.startswith(("mark_", "finish_", "back_")),
+        lambda c: c.data.startswith(("mark_", "att_", "finish_", "back_")),
         state=AttendanceMarking.marking
     )
     dp.register_message_handler(cmd_create_team, commands=["create_team"])
@@ -1095,6 +1136,7 @@ def register_handlers(dp: Dispatcher):
                                      state=TeamMemberAdd.waiting_for_team)
     dp.register_message_handler(process_member_username, 
                               state=TeamMemberAdd.waiting_for_username)
+    dp.register_inline_handler(search_members_inline, state="*")
     dp.register_callback_query_handler(team_management, text="manage_teams")
     dp.register_callback_query_handler(start_team_creation, text="create_team")
     dp.register_callback_query_handler(
@@ -1132,7 +1174,7 @@ def register_handlers(dp: Dispatcher):
     dp.register_callback_query_handler(show_points_history, text="points_history")
     dp.register_callback_query_handler(
         download_points_history,
-        text="download_history",
+        lambda c: c.data.startswith("download_history"),
         state="*"
     )
     dp.register_callback_query_handler(
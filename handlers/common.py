@@ -1,5 +1,6 @@
 from aiogram import Dispatcher, types
-from database.json_storage import db
+from database import db
+from utils.outbound import outbound
 from config import config
 
 async def cmd_start(message: types.Message):
@@ -13,9 +14,9 @@ async def cmd_start(message: types.Message):
             username=message.from_user.username,
             is_admin=message.from_user.id == config.ADMIN_ID
         )
-        await message.answer("Добро пожаловать! Вы успешно зарегистрированы в системе.")
+        await outbound.answer(message, "Добро пожаловать! Вы успешно зарегистрированы в системе.")
     else:
-        await message.answer("С возвращением!")
+        await outbound.answer(message, "С возвращением!")
 
 def register_handlers(dp: Dispatcher):
     dp.register_message_handler(cmd_start, commands=["start"]) 
\ No newline at end of file
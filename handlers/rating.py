@@ -1,5 +1,6 @@
 from aiogram import Dispatcher, types
-from database.json_storage import db
+from database import db
+from utils.outbound import outbound
 from datetime import datetime
 
 def get_current_season() -> int:
@@ -11,7 +12,7 @@ async def show_rating(message: types.Message):
     teams = await db.get_all_teams(season=get_current_season())
     
     if not teams:
-        return await message.answer("В текущем сезоне нет активных команд.")
+        return await outbound.answer(message, "В текущем сезоне нет активных команд.")
     
     rating_text = "📊 Текущий рейтинг команд:\n\n"
     
@@ -38,7 +39,7 @@ async def show_rating(message: types.Message):
         
         rating_text += f"Команда {team['name']}: {total_score} баллов\n"
     
-    await message.answer(rating_text)
+    await outbound.answer(message, rating_text)
 
 def register_handlers(dp: Dispatcher):
     dp.register_message_handler(show_rating, commands=["rating"]) 
\ No newline at end of file
@@ -1,7 +1,10 @@
 from aiogram import types, Dispatcher
 from aiogram.dispatcher import FSMContext
-from database.json_storage import db
+from database import db
+from utils.outbound import outbound
 from utils.keyboards import get_user_keyboard
+from utils.leaderboard import leaderboard
+from utils.message_builder import edit_chunks
 from datetime import datetime
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
@@ -9,7 +12,7 @@ async def user_menu(message: types.Message, state: FSMContext):
     """Обработчик команды /menu для всех пользователей"""
     user = await db.get_user(message.from_user.id)
     if not user:
-        return await message.answer("❌ Вы не зарегистрированы в системе.")
+        return await outbound.answer(message, "❌ Вы не зарегистрированы в системе.")
     
     # Получаем статистику пользователя
     stats = await db.get_user_attendance_stats(message.from_user.id)
@@ -42,29 +45,15 @@ async def user_menu(message: types.Message, state: FSMContext):
         text += "\n❗️ Низкая посещаемость"
     
     keyboard = get_user_keyboard()
-    await message.answer(text, reply_markup=keyboard)
+    await outbound.answer(message, text, reply_markup=keyboard)
 
 async def show_teams_rating(callback_query: types.CallbackQuery):
     """Показать рейтинг команд"""
-    teams = await db.get_all_teams()
-    teams_sorted = sorted(teams, key=lambda x: x['points'], reverse=True)
-    
-    text = "📊 РЕЙТИНГ КОМАНД\n\n"
-    
-    for i, team in enumerate(teams_sorted, 1):
-        prefix = {1: "🥇", 2: "🥈", 3: "🥉"}.get(i, f"{i}.")
-        text += f"{prefix} {team['name']}\n"
-        text += f"└ {team['points']} баллов\n"
-        members = []
-        for member_id in team['members']:
-            user = await db.get_user(int(member_id))
-            if user:
-                members.append(user['username'])
-        text += f"👥 Участники: {', '.join(members)}\n\n"
+    chunks = await leaderboard.render("📊 РЕЙТИНГ КОМАНД")
     
     keyboard = InlineKeyboardMarkup(row_width=1)
     keyboard.add(InlineKeyboardButton("◀️ Назад", callback_data="back_to_menu"))
-    await callback_query.message.edit_text(text, reply_markup=keyboard)
+    await edit_chunks(callback_query.message, chunks, reply_markup=keyboard)
 
 def format_user_stats(stats: dict, user: dict) -> str:
     """Форматирование статистики пользователя"""
@@ -103,7 +92,7 @@ async def back_to_menu(callback_query: types.CallbackQuery, state: FSMContext):
     
     stats = await db.get_user_attendance_stats(user['telegram_id'])
     text = format_user_stats(stats, user)
-    await callback_query.message.edit_text(text, reply_markup=get_user_keyboard())
+    await outbound.edit_text(callback_query.message, text, reply_markup=get_user_keyboard())
 
 def register_handlers(dp: Dispatcher):
     dp.register_message_handler(user_menu, commands=["menu"], state="*")
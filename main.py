@@ -1,15 +1,26 @@
+import time
+# Отсчет времени запуска до импорта тяжелых зависимостей
+_started = time.perf_counter()
+
 import asyncio
 import logging
 from typing import Optional, NoReturn
-from aiogram import Bot, Dispatcher
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram import Dispatcher
 from config import config
-from handlers import admin, common, rating, user
-from database import init_db
+from database import init_db, close_db
 from utils.logger import logger
+from utils.outbound import outbound
+from utils.export import shutdown_export
 import sys
 import signal
 from utils.process_guard import SingleInstance
+from utils.startup import StartupTimer
+from utils.metrics_server import start_metrics_server
+from utils.webhook import run_webhook
+from utils.workers import create_bot, create_dispatcher, create_fsm_storage, run_master
+
+startup_timer = StartupTimer(_started)
+startup_timer.mark("импорт")
 
 async def on_shutdown(dp: Dispatcher):
     """Действия при завершении работы"""
@@ -17,38 +28,73 @@ async def on_shutdown(dp: Dispatcher):
         logger.info("Завершение работы бота...")
         await dp.storage.close()
         await dp.storage.wait_closed()
-        session = await dp.bot.get_session()
-        if session:
-            await session.close()
-        # Сбрасываем webhook для избежания конфликтов при следующем запуске
-        await dp.bot.delete_webhook()
+        await outbound.close()
+        shutdown_export()
+        await close_db()
+        if config.BOT_MODE != "webhook":
+            # Сбрасываем webhook для избежания конфликтов при следующем запуске
+            await dp.bot.delete_webhook()
+        await dp.bot.session.close()
         logger.info("Бот успешно остановлен")
     except Exception as e:
         logger.error(f"Ошибка при остановке бота: {e}")
 
+def stop_on_signals() -> asyncio.Event:
+    """SIGTERM/SIGINT не прерывают цикл, а запускают дообработку принятых обновлений"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+def report_startup(phase: str) -> None:
+    startup_timer.mark(phase)
+    startup_timer.report()
+
 async def main() -> NoReturn:
     """Основная функция запуска бота"""
-    # Создаем объекты бота и диспетчера
-    bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(bot, storage=storage)
+    bot = create_bot()
+
+    if config.WORKERS > 1:
+        # Главный процесс только получает обновления и раздает их воркерам
+        try:
+            logger.info(f"Бот запущен с {config.WORKERS} воркерами ({config.BOT_MODE})")
+            await run_master(bot, stop_on_signals(), lambda: report_startup("запуск воркеров"))
+        finally:
+            await bot.session.close()
+        return
+
+    storage = create_fsm_storage()
+    
+    # Создаем диспетчер и регистрируем хендлеры
+    logger.info("Регистрация хендлеров...")
+    dp = create_dispatcher(bot, storage)
+    startup_timer.mark("регистрация хендлеров")
+    metrics_runner = None
     
     try:
-        # Сбрасываем webhook перед запуском polling
-        await bot.delete_webhook()
-        
-        # Регистрация хендлеров
-        logger.info("Регистрация хендлеров...")
-        user.register_handlers(dp)
-        admin.register_handlers(dp)
-        rating.register_handlers(dp)
-        common.register_handlers(dp)
-        
         # Инициализация базы данных
         logger.info("Инициализация базы данных...")
         await init_db()
+        startup_timer.mark("загрузка хранилища")
+        
+        if config.METRICS_PORT:
+            metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+        
+        if config.BOT_MODE == "webhook":
+            logger.info("Бот запущен в режиме webhook")
+            await run_webhook(bot, dp, stop_on_signals(), lambda: report_startup("запуск webhook"))
+            return
+        
+        # Отчет о запуске пишется при первом запросе обновлений
+        get_updates = bot.get_updates
+        async def first_get_updates(*args, **kwargs):
+            bot.get_updates = get_updates
+            report_startup("первый опрос")
+            return await get_updates(*args, **kwargs)
+        bot.get_updates = first_get_updates
         
-        # Запуск бота
+        # Запуск бота (webhook сбрасывается внутри start_polling)
         logger.info("Бот запущен")
         await dp.start_polling(reset_webhook=True)
         
@@ -56,6 +102,8 @@ async def main() -> NoReturn:
         logger.error(f"Критическая ошибка: {e}", exc_info=True)
         raise
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         await on_shutdown(dp)
 
 def signal_handler(sig, frame):
@@ -0,0 +1,12 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Логи и данные тестов (и запускаемых ими процессов) пишутся во временный каталог,
+# а не в logs/ и data/ репозитория. Импортируется раньше модулей тестов.
+_root = tempfile.mkdtemp(prefix="bot-tests-")
+atexit.register(shutil.rmtree, _root, True)
+os.environ["LOG_DIR"] = os.path.join(_root, "logs")
+os.environ["DATA_DIR"] = os.path.join(_root, "data")
+os.environ.setdefault("BOT_TOKEN", "123456:test")
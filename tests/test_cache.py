@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from config import config
+from database.cache import MISSING, StorageCache
+from database.json_storage import JsonStorage
+
+class StorageCacheTest(unittest.TestCase):
+    def test_pinned_entry_survives_lru_pressure(self):
+        cache = StorageCache(maxsize=2, ttl=60)
+        cache.set("users.json", "*", {"1": {}}, pinned=True)
+        for i in range(10):
+            cache.set("users.json", ("stats", i), i)
+        self.assertEqual(cache.get("users.json", "*"), {"1": {}})
+        self.assertEqual(cache.stats()["size"], 2)
+
+    def test_pinned_entry_invalidated_by_write(self):
+        cache = StorageCache(maxsize=2, ttl=60)
+        cache.set("users.json", "*", {}, pinned=True)
+        cache.bump("users.json")
+        self.assertIs(cache.get("users.json", "*"), MISSING)
+
+class JsonStorageCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_derived_entries_do_not_evict_collections(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with mock.patch.object(config, "DATA_DIR", tmp.name), mock.patch.object(config, "CACHE_MAXSIZE", 4):
+            storage = JsonStorage()
+        await storage.open()
+        for i in range(5):
+            await storage.create_user(i, f"user{i}")
+
+        await storage.get_user(1)
+        loads = mock.AsyncMock(wraps=storage._engine.load)
+        storage._engine.load = loads
+        # Статистика по участникам считается по индексу и не обращается к снимкам коллекций
+        for user_id in range(10):
+            await storage.get_user_attendance_stats(user_id)
+        await storage.get_user(1)
+        loads.assert_not_awaited()
+
+if __name__ == "__main__":
+    unittest.main()
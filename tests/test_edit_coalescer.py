@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from aiogram import types
+
+from utils.edit_coalescer import EditCoalescer
+
+def keyboard(text: str) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup().add(types.InlineKeyboardButton(text, callback_data=text))
+
+async def send_now(chat_id: int, request):
+    return await request()
+
+def panel(message_id: int) -> mock.Mock:
+    message = mock.Mock()
+    message.chat.id = 100
+    message.message_id = message_id
+    message.edit_reply_markup = mock.AsyncMock()
+    return message
+
+class EditCoalescerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.coalescer = EditCoalescer(interval=0, maxsize=3)
+        patcher = mock.patch("utils.edit_coalescer.outbound.send", new=send_now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def edit(self, message: mock.Mock, text: str) -> None:
+        async def render() -> types.InlineKeyboardMarkup:
+            return keyboard(text)
+        self.coalescer.submit(message, render)
+        await self.coalescer._tasks[self.coalescer._key(message)]
+
+    async def test_abandoned_panels_forgotten(self):
+        # Панели, которые никто не закрыл через discard, не накапливаются
+        messages = [panel(i) for i in range(10)]
+        for message in messages:
+            self.coalescer.remember(message, keyboard("a"))
+            await self.edit(message, "b")
+        self.assertEqual(len(self.coalescer._last_sent), 3)
+        self.assertEqual(set(self.coalescer._hashes), {(100, 7), (100, 8), (100, 9)})
+        self.assertEqual(self.coalescer._tasks, {})
+
+    async def test_unchanged_markup_not_sent(self):
+        message = panel(1)
+        self.coalescer.remember(message, keyboard("a"))
+        await self.edit(message, "a")
+        message.edit_reply_markup.assert_not_awaited()
+        await self.edit(message, "b")
+        message.edit_reply_markup.assert_awaited_once()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from config import config
+from database.engines import FileEngine, WalEngine
+from database.json_storage import JsonStorage
+from database.persistence import read_json_file, write_json_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class WalCrashTest(unittest.IsolatedAsyncioTestCase):
+    """Воспроизведение журнала изменений после аварийной остановки"""
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        patcher = mock.patch.object(config, "DATA_DIR", self._tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_replays_log_after_kill(self):
+        code = (
+            "import asyncio, os\n"
+            "from database.json_storage import JsonStorage\n"
+            "async def main():\n"
+            "    storage = JsonStorage()\n"
+            "    await storage.open()\n"
+            "    await storage.create_user(1, 'anna')\n"
+            "    team = await storage.create_team('A', [1])\n"
+            "    await storage.add_team_points(team['id'], 7, 'бонус', 1)\n"
+            "    os._exit(0)\n"
+            "asyncio.run(main())\n"
+        )
+        env = dict(os.environ, DATA_DIR=self._tmp.name, JSON_STORAGE_MODE="wal", WAL_COMPACT_THRESHOLD="100")
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, check=True)
+
+        # Снапшоты не сохранялись, изменения есть только в журналах
+        teams_file = os.path.join(self._tmp.name, "teams.json")
+        self.assertEqual(read_json_file(teams_file), {})
+        with mock.patch.object(config, "JSON_STORAGE_MODE", "wal"):
+            storage = JsonStorage()
+        await storage.open()
+        self.assertEqual((await storage.get_user(1))["username"], "anna")
+        self.assertEqual((await storage.get_team("1"))["points"], 7)
+        self.assertEqual(await storage.get_available_members(), [])
+        self.assertEqual(await storage.verify_team_points(), {})
+        await storage.close()
+        self.assertEqual(read_json_file(teams_file)["1"]["points"], 7)
+
+    async def test_torn_tail_discarded(self):
+        path = os.path.join(self._tmp.name, "teams.json")
+        engine = WalEngine(compact_threshold=100)
+        await engine.open([path])
+        await engine.mutate(path, [{"op": "set", "path": ["1"], "value": {"points": 1}}])
+        await engine.mutate(path, [{"op": "incr", "path": ["1", "points"], "value": 2}])
+        # Сбой посреди записи следующей строки журнала: файл журнала закрыт без сворачивания
+        engine._logs[path].close()
+        with open(f"{path}.log", "a", encoding="utf-8") as f:
+            f.write('{"ops": [{"op": "incr", "path": ["1", "po')
+
+        engine = WalEngine(compact_threshold=100)
+        await engine.open([path])
+        self.assertEqual(await engine.load(path), {"1": {"points": 3}})
+        # Оборванная запись отброшена сворачиванием, новые записи читаются после нее
+        self.assertEqual(os.path.getsize(f"{path}.log"), 0)
+        await engine.mutate(path, [{"op": "incr", "path": ["1", "points"], "value": 4}])
+        engine._logs[path].close()
+        engine = WalEngine(compact_threshold=100)
+        await engine.open([path])
+        self.assertEqual(await engine.load(path), {"1": {"points": 7}})
+        await engine.close()
+
+class GroupCommitTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_writes_batched(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "users.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({}, f)
+
+        engine = FileEngine(commit_window=0.01)
+        with mock.patch("database.writer.write_json_file", wraps=write_json_file) as write:
+            results = await asyncio.gather(*(
+                engine.mutate(path, [{"op": "set", "path": [str(i)], "value": i}]) for i in range(20)
+            ))
+            await engine.close()
+        # Все изменения на диске, а записей файла меньше, чем изменений
+        self.assertEqual(read_json_file(path), {str(i): i for i in range(20)})
+        self.assertEqual(results[0], read_json_file(path))
+        self.assertLess(write.call_count, 20)
+
+if __name__ == "__main__":
+    unittest.main()
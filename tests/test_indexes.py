@@ -0,0 +1,21 @@
+import unittest
+from datetime import date, timedelta
+
+from database.indexes import DayBuckets
+
+class DayBucketsTest(unittest.TestCase):
+    def test_window_within_horizon(self):
+        today = date.today()
+        buckets = DayBuckets(120)
+        buckets.add(today - timedelta(days=100), "absent")
+        buckets.add(today - timedelta(days=10), "present")
+        self.assertEqual(buckets.window(today, 120), {"total": 2, "absent": 1, "present": 1})
+        self.assertEqual(buckets.window(today, 30), {"total": 1, "present": 1})
+
+    def test_window_longer_than_horizon(self):
+        buckets = DayBuckets(90)
+        with self.assertRaises(ValueError):
+            buckets.window(date.today(), 120)
+
+if __name__ == "__main__":
+    unittest.main()
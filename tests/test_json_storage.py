@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from config import config
+from database.json_storage import JsonStorage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PENALTY = {"points": -2, "reason": "Отсутствие", "admin_id": 1, "timestamp": "2026-01-01T10:00:00"}
+
+class FinalizeRecoveryTest(unittest.IsolatedAsyncioTestCase):
+    """Повтор незавершенного завершения отметки при открытии хранилища"""
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        patcher = mock.patch.object(config, "DATA_DIR", self._tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with open(os.path.join(self._tmp.name, "teams.json"), "w", encoding="utf-8") as f:
+            json.dump({"1": {"id": "1", "name": "Команда", "members": ["111"], "points": 38}}, f)
+
+    async def reopen(self, record: dict) -> JsonStorage:
+        JsonStorage()._finalize_journal.write(record)
+        storage = JsonStorage()
+        await storage.open()
+        return storage
+
+    async def test_replays_penalty_not_applied(self):
+        storage = await self.reopen({"attendance": [], "ledger": {"1": PENALTY}, "points": {"1": 38}})
+        self.assertEqual((await storage.get_team("1"))["points"], 36)
+        self.assertEqual(await storage.get_team_points_history("1"), [PENALTY])
+        self.assertIsNone(storage._finalize_journal.read())
+
+    async def test_skips_penalty_already_applied(self):
+        storage = await self.reopen({"attendance": [], "ledger": {"1": PENALTY}, "points": {"1": 40}})
+        self.assertEqual((await storage.get_team("1"))["points"], 38)
+        self.assertEqual(await storage.get_team_points_history("1"), [PENALTY])
+
+class TeamsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        patcher = mock.patch.object(config, "DATA_DIR", self._tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.storage = JsonStorage()
+        await self.storage.open()
+
+    async def test_new_team_does_not_overwrite_existing(self):
+        for name, members in (("A", [1]), ("B", [2]), ("C", [3])):
+            await self.storage.create_team(name, members)
+        await self.storage.add_team_points("3", 5, "бонус", 1)
+        await self.storage.delete_team("2")
+
+        team = await self.storage.create_team("D", [4])
+        self.assertEqual(team["id"], "4")
+        self.assertEqual((await self.storage.get_team("3"))["name"], "C")
+        self.assertEqual((await self.storage.get_team("3"))["points"], 5)
+        self.assertEqual(await self.storage.get_team_points_history("4"), [])
+        self.assertEqual((await self.storage._get_membership_index()).teams_of("3"), ["3"])
+
+class MemoryModeCrashTest(unittest.IsolatedAsyncioTestCase):
+    """Завершение отметки в режиме memory и аварийная остановка до фонового сброса"""
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        patcher = mock.patch.object(config, "DATA_DIR", self._tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with open(os.path.join(self._tmp.name, "teams.json"), "w", encoding="utf-8") as f:
+            json.dump({"1": {"id": "1", "name": "Команда", "members": ["111"], "points": 38}}, f)
+
+    async def test_finalize_survives_kill_before_flush(self):
+        code = (
+            "import asyncio, os\n"
+            "from database.json_storage import JsonStorage\n"
+            "async def main():\n"
+            "    storage = JsonStorage()\n"
+            "    await storage.open()\n"
+            "    await storage.finalize_attendance({111: 'absent'}, 1, -2, 'Отсутствие')\n"
+            "    os._exit(0)\n"
+            "asyncio.run(main())\n"
+        )
+        env = dict(os.environ, DATA_DIR=self._tmp.name, JSON_STORAGE_MODE="memory", MEMORY_FLUSH_INTERVAL="3600")
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, check=True)
+
+        storage = JsonStorage()
+        await storage.open()
+        attendance = await storage.get_attendance()
+        self.assertEqual([day["111"]["status"] for day in attendance.values()], ["absent"])
+        self.assertEqual((await storage.get_team("1"))["points"], 36)
+        self.assertEqual([entry["points"] for entry in await storage.get_team_points_history("1")], [-2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from utils.message_builder import MESSAGE_LIMIT, split_text, utf16_len
+
+class SplitTextTest(unittest.TestCase):
+    def assert_fits(self, text: str) -> None:
+        chunks = split_text(text)
+        for chunk in chunks:
+            self.assertLessEqual(utf16_len(chunk), MESSAGE_LIMIT)
+        # Разбиение теряет только переводы строк на границах частей
+        self.assertEqual("".join(chunks).replace("\n", ""), text.replace("\n", ""))
+
+    def test_tail_after_paragraph_break_is_split(self):
+        self.assert_fits('a\n\n' + ('x' * 100 + '\n') * 45)
+
+    def test_long_line_after_paragraph_break(self):
+        self.assert_fits('a\n\n' + 'b' * 4000 + '\n' + 'c' * 200)
+
+    def test_line_longer_than_limit(self):
+        self.assert_fits('😀' * 5000)
+
+    def test_paragraphs_are_kept_together(self):
+        block = ('y' * 50 + '\n') * 10
+        chunks = split_text('\n\n'.join([block] * 20))
+        self.assertTrue(all(chunk.endswith('y') for chunk in chunks))
+        self.assertTrue(all(utf16_len(chunk) <= MESSAGE_LIMIT for chunk in chunks))
+
+if __name__ == '__main__':
+    unittest.main()
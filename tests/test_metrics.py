@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from utils.metrics import Metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class MetricsTest(unittest.TestCase):
+    def test_render(self):
+        metrics = Metrics()
+        metrics.inc("storage_bytes_total", 10, op="read", file="users.json")
+        metrics.observe("storage_seconds", 0.002, op="load", collection="users.json")
+        text = metrics.render()
+        self.assertIn('storage_bytes_total{file="users.json",op="read"} 10', text)
+        self.assertIn('storage_seconds_bucket{collection="users.json",op="load",le="0.005"} 1', text)
+        self.assertIn('storage_seconds_count{collection="users.json",op="load"} 1', text)
+
+    def test_storage_does_not_load_bot_framework(self):
+        """Хранилище, миграция и выгрузки пишут метрики без aiogram и aiohttp"""
+        code = (
+            "import sys, database.json_storage, database.migrate, utils.export; "
+            "print(','.join(m for m in ('aiogram', 'aiohttp') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import unittest
+
+from aiogram import Bot, types
+from aiogram.bot.api import TelegramAPIServer
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.outbound import BROADCAST, OutboundQueue
+
+GROUP_CHAT_ID = -100
+USER_CHAT_ID = 111
+
+class FakeBotAPI:
+    """Локальный Bot API: запоминает запросы, на первую отправку в группу отвечает 429"""
+    def __init__(self) -> None:
+        self.calls = []
+        self.throttle = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = dict(await request.post())
+        chat_id = int(data["chat_id"])
+        if chat_id in self.throttle:
+            self.throttle.discard(chat_id)
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1}
+            }, status=429)
+        self.calls.append((method, chat_id, data.get("text")))
+        message = {
+            "message_id": len(self.calls), "date": 0, "text": data.get("text"),
+            "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"}
+        }
+        return web.json_response({"ok": True, "result": message})
+
+class OutboundQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.api = FakeBotAPI()
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.api.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        base = str(self.server.make_url("")).rstrip("/")
+        self.bot = Bot("123:abc", server=TelegramAPIServer.from_base(base))
+        Bot.set_current(self.bot)
+        self.queue = OutboundQueue(global_rate=100, chat_rate=100, group_rate=100)
+
+    async def asyncTearDown(self) -> None:
+        await self.bot.session.close()
+        await self.server.close()
+
+    def texts(self, chat_id: int) -> list:
+        return [text for _, chat, text in self.api.calls if chat == chat_id]
+
+    async def test_interactive_before_broadcast(self):
+        for text in ("a", "b"):
+            await self.queue.send(
+                USER_CHAT_ID, lambda text=text: self.bot.send_message(USER_CHAT_ID, text),
+                priority=BROADCAST, wait=False
+            )
+        await self.queue.send(USER_CHAT_ID, lambda: self.bot.send_message(USER_CHAT_ID, "c"), wait=False)
+        await self.queue.close()
+        self.assertEqual(self.texts(USER_CHAT_ID), ["c", "a", "b"])
+        self.assertEqual(self.queue.stats()["sent"], 3)
+
+    async def test_retry_after_pauses_only_its_chat(self):
+        self.api.throttle.add(GROUP_CHAT_ID)
+        for text in ("first", "second"):
+            await self.queue.send(
+                GROUP_CHAT_ID, lambda text=text: self.bot.send_message(GROUP_CHAT_ID, text),
+                priority=BROADCAST, wait=False
+            )
+        # Личный чат обслуживается, пока группа ждет retry_after
+        await self.queue.send(USER_CHAT_ID, lambda: self.bot.send_message(USER_CHAT_ID, "reply"))
+        self.assertEqual(self.api.calls, [("sendMessage", USER_CHAT_ID, "reply")])
+
+        await self.queue.close()
+        self.assertEqual(self.texts(GROUP_CHAT_ID), ["first", "second"])
+        stats = self.queue.stats()
+        self.assertEqual((stats["sent"], stats["retries"], stats["failed"]), (3, 1, 0))
+        self.assertEqual(stats["depth"], {"interactive": 0, "broadcast": 0})
+
+    async def test_idle_lanes_removed(self):
+        for chat_id in range(1, 6):
+            await self.queue.send(chat_id, lambda chat_id=chat_id: self.bot.send_message(chat_id, "hi"))
+        self.assertIn(5, self.queue._lanes)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.queue._lanes, {})
+
+    async def test_cancelled_request_skips_rate_limit(self):
+        queue = OutboundQueue(global_rate=100, chat_rate=2, group_rate=2)
+        started = asyncio.get_running_loop().time()
+        await queue.send(USER_CHAT_ID, lambda: self.bot.send_message(USER_CHAT_ID, "a"), wait=False)
+        cancelled = asyncio.create_task(queue.send(USER_CHAT_ID, lambda: self.bot.send_message(USER_CHAT_ID, "b")))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        # Отмененный запрос не ждет токен: следующий уходит через один интервал лимита, а не через два
+        await queue.send(USER_CHAT_ID, lambda: self.bot.send_message(USER_CHAT_ID, "c"))
+        self.assertLess(asyncio.get_running_loop().time() - started, 0.9)
+        self.assertEqual(self.texts(USER_CHAT_ID), ["a", "c"])
+        self.assertEqual(queue.stats()["depth"], {"interactive": 0, "broadcast": 0})
+
+    async def test_message_helpers(self):
+        message = types.Message(**{
+            "message_id": 7, "date": 0, "text": "panel",
+            "chat": {"id": USER_CHAT_ID, "type": "private"}
+        })
+        sent = await self.queue.answer(message, "answer")
+        await self.queue.edit_text(message, "edited")
+        self.assertEqual(sent.text, "answer")
+        self.assertEqual(self.api.calls, [
+            ("sendMessage", USER_CHAT_ID, "answer"),
+            ("editMessageText", USER_CHAT_ID, "edited")
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
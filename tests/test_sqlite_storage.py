@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+from database.sqlite_storage import SqliteStorage
+
+class SqliteTeamsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.storage = SqliteStorage(os.path.join(self._tmp.name, "bot.sqlite3"))
+        await self.storage.open()
+
+    async def asyncTearDown(self) -> None:
+        await self.storage.close()
+        self._tmp.cleanup()
+
+    async def test_deleted_team_history_not_inherited(self):
+        await self.storage.create_team("A", [])
+        team = await self.storage.create_team("B", [])
+        await self.storage.add_team_points(team["id"], 7, "бонус", 1)
+        await self.storage.delete_team(team["id"])
+
+        # Новая команда получает освободившийся id, но не историю удаленной
+        new_team = await self.storage.create_team("C", [])
+        self.assertEqual(new_team["id"], team["id"])
+        self.assertEqual(await self.storage.get_team_points_history(new_team["id"]), [])
+        self.assertEqual(await self.storage.verify_team_points(), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from utils import startup, workers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ColdStartTest(unittest.TestCase):
+    def test_within_budget(self):
+        """Импорт и регистрация хендлеров укладываются в STARTUP_BUDGET (в новом процессе)"""
+        result = subprocess.run(
+            [sys.executable, "-m", "utils.startup"], cwd=ROOT, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    def test_uses_production_dispatcher(self):
+        """Проверка собирает диспетчер тем же create_dispatcher, что и запуск бота"""
+        with mock.patch.object(workers, "create_dispatcher", wraps=workers.create_dispatcher) as create:
+            startup.check_cold_start()
+        create.assert_called_once()
+
+if __name__ == "__main__":
+    unittest.main()
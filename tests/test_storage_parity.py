@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from config import config
+from database.json_storage import JsonStorage
+from database.sqlite_storage import SqliteStorage
+
+USERS = {1: "anna", 2: "boris", 3: "vera", 4: "gleb", 5: "dina"}
+BACKENDS = ("json-file", "json-wal", "json-memory", "sqlite")
+
+async def scenario(storage) -> None:
+    """Одни и те же действия для каждого хранилища"""
+    for telegram_id, username in USERS.items():
+        await storage.create_user(telegram_id, username)
+    await storage.toggle_admin_status(2)
+    for name, members in (("A", [1, 2]), ("B", [3]), ("C", [4])):
+        await storage.create_team(name, members)
+    await storage.add_team_points("1", 10, "бонус", 2)
+    await storage.add_team_points("2", 5, "бонус", 2)
+    await storage.delete_team("2")
+    await storage.create_team("D", [3])
+    await storage.finalize_attendance({1: "absent", 3: "absent", 4: "present", 5: "absent"}, 2, -2, "Отсутствие")
+    await storage.finalize_attendance({1: "absent", 4: "excused"}, 2, -2, "Отсутствие")
+
+async def summary(storage) -> dict:
+    """Наблюдаемое состояние хранилища без зависящих от реализации полей"""
+    teams = await storage.get_all_teams()
+    return {
+        "users": sorted(
+            (user["telegram_id"], user["username"], user["is_admin"]) for user in await storage.get_all_users()
+        ),
+        "teams": sorted((team["id"], team["name"], sorted(team["members"]), team["points"]) for team in teams),
+        "history": {
+            team["id"]: [
+                (entry["points"], entry["reason"]) for entry in await storage.get_team_points_history(team["id"])
+            ]
+            for team in teams
+        },
+        "deleted_history": await storage.get_team_points_history("2"),
+        "available": sorted(user["telegram_id"] for user in await storage.get_available_members()),
+        "outside_a": sorted(user["telegram_id"] for user in await storage.get_users_outside_team("1")),
+        "verify": await storage.verify_team_points(),
+        "found": (await storage.find_user_by_username("@VERA"))["telegram_id"],
+        "search": [user["username"] for user in await storage.search_users("b")],
+        "absences": {user_id: await storage.get_consecutive_absences(user_id) for user_id in USERS},
+        "stats": {user_id: await storage.get_user_attendance_stats(user_id) for user_id in USERS},
+        "all_stats": await storage.get_all_attendance_stats(),
+        "totals": await storage.get_attendance_totals(),
+        "sessions": sorted(sorted(day) for day in (await storage.get_attendance()).values()),
+    }
+
+class StorageParityTest(unittest.IsolatedAsyncioTestCase):
+    """JSON в режимах file, wal и memory и SQLite дают одинаковый результат"""
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def open_storage(self, backend: str):
+        data_dir = os.path.join(self._tmp.name, backend)
+        if backend == "sqlite":
+            return SqliteStorage(os.path.join(data_dir, "bot.sqlite3"))
+        mode = backend.split("-")[1]
+        with mock.patch.object(config, "DATA_DIR", data_dir), mock.patch.object(config, "JSON_STORAGE_MODE", mode):
+            return JsonStorage()
+
+    async def run_backend(self, backend: str) -> dict:
+        storage = self.open_storage(backend)
+        await storage.open()
+        await scenario(storage)
+        before = await summary(storage)
+        await storage.close()
+
+        # После повторного открытия состояние то же: все изменения дошли до диска
+        storage = self.open_storage(backend)
+        await storage.open()
+        after = await summary(storage)
+        await storage.close()
+        self.assertEqual(after, before, backend)
+        return before
+
+    async def test_backends_agree(self):
+        reference = await self.run_backend(BACKENDS[0])
+        self.assertEqual(reference["teams"], [
+            ("1", "A", ["1", "2"], 6), ("3", "C", ["4"], 0), ("4", "D", ["3"], -2)
+        ])
+        self.assertEqual(reference["history"]["1"], [(10, "бонус"), (-2, "Отсутствие"), (-2, "Отсутствие")])
+        self.assertEqual(reference["deleted_history"], [])
+        self.assertEqual(reference["available"], [5])
+        self.assertEqual(reference["verify"], {})
+        self.assertEqual(reference["absences"], {1: 2, 2: 0, 3: 1, 4: 0, 5: 1})
+
+        for backend in BACKENDS[1:]:
+            with self.subTest(backend=backend):
+                self.assertEqual(await self.run_backend(backend), reference)
+
+if __name__ == "__main__":
+    unittest.main()
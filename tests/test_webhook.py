@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp.test_utils import TestClient, TestServer
+
+from utils.webhook import SECRET_HEADER, UpdateProcessor, WebhookServer, update_chat_id
+
+SECRET = "s3cret"
+
+def message_update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "/start",
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "user"}
+        }
+    }
+
+class RecordingDispatcher(Dispatcher):
+    """Диспетчер, который только записывает начало и конец обработки"""
+    def __init__(self, bot: Bot) -> None:
+        super().__init__(bot)
+        self.events = []
+
+    async def process_update(self, update: types.Update):
+        self.events.append(("start", update.update_id))
+        # Первое обновление обрабатывается дольше следующих
+        await asyncio.sleep(0.05 if update.update_id == 1 else 0)
+        self.events.append(("end", update.update_id))
+
+class UpdateProcessorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.bot = Bot("123:abc")
+        self.dp = RecordingDispatcher(self.bot)
+        self.processor = UpdateProcessor(self.dp, max_concurrency=10)
+
+    async def asyncTearDown(self) -> None:
+        await self.bot.session.close()
+
+    async def submit(self, *updates: dict) -> None:
+        for data in updates:
+            self.processor.submit(types.Update(**data), update_chat_id(data))
+        await self.processor.drain(timeout=1)
+
+    async def test_same_chat_in_order(self):
+        await self.submit(message_update(1, 100), message_update(2, 100), message_update(3, 100))
+        self.assertEqual(self.dp.events, [
+            ("start", 1), ("end", 1), ("start", 2), ("end", 2), ("start", 3), ("end", 3)
+        ])
+        self.assertEqual(self.processor._chats, {})
+
+    async def test_other_chats_in_parallel(self):
+        await self.submit(message_update(1, 100), message_update(2, 200))
+        self.assertLess(self.dp.events.index(("start", 2)), self.dp.events.index(("end", 1)))
+
+class WebhookServerTest(unittest.IsolatedAsyncioTestCase):
+    """Записанные обновления, отправленные на локальный webhook сервер"""
+    async def asyncSetUp(self) -> None:
+        self.bot = Bot("123:abc")
+        self.dp = RecordingDispatcher(self.bot)
+        self.server = WebhookServer(self.dp, "/webhook", SECRET, max_concurrency=10)
+        self.client = TestClient(TestServer(self.server.make_app()))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        await self.bot.session.close()
+
+    async def post(self, data: dict, headers: dict) -> int:
+        response = await self.client.post("/webhook", json=data, headers=headers)
+        return response.status
+
+    async def test_accepts_update_with_secret(self):
+        self.assertEqual(await self.post(message_update(1, 100), {SECRET_HEADER: SECRET}), 200)
+        await self.server.drain(timeout=1)
+        self.assertEqual(self.dp.events, [("start", 1), ("end", 1)])
+
+    async def test_rejects_missing_or_wrong_secret(self):
+        self.assertEqual(await self.post(message_update(1, 100), {}), 401)
+        self.assertEqual(await self.post(message_update(2, 100), {SECRET_HEADER: "wrong"}), 401)
+        await self.server.drain(timeout=1)
+        self.assertEqual(self.dp.events, [])
+
+    async def test_requires_secret(self):
+        for secret in (None, ""):
+            with self.assertRaises(ValueError):
+                WebhookServer(self.dp, "/webhook", secret, max_concurrency=10)
+
+if __name__ == "__main__":
+    unittest.main()
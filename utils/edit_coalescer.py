@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Tuple
+from aiogram import types
+from aiogram.utils.exceptions import MessageNotModified, RetryAfter
+from config import config
+from utils.logger import logger
+from utils.outbound import outbound
+
+MessageKey = Tuple[int, int]
+Renderer = Callable[[], Awaitable[types.InlineKeyboardMarkup]]
+
+def markup_hash(markup: types.InlineKeyboardMarkup) -> str:
+    return hashlib.sha1(
+        json.dumps(markup.to_python(), sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+
+class EditCoalescer:
+    """
+    Объединение частых изменений клавиатуры одного сообщения.
+    Нажатия сразу меняют состояние, а клавиатура сообщения обновляется
+    не чаще раза в interval секунд по последнему состоянию.
+    Если отрисованная клавиатура не изменилась, запрос не отправляется.
+    Отправленные клавиатуры помнятся для maxsize последних сообщений:
+    брошенные панели никто не отменяет через discard.
+    """
+    def __init__(self, interval: float, maxsize: int) -> None:
+        self.interval = interval
+        self.maxsize = maxsize
+        self._pending: Dict[MessageKey, Tuple[types.Message, Renderer]] = {}
+        self._tasks: Dict[MessageKey, asyncio.Task] = {}
+        self._hashes: Dict[MessageKey, str] = {}
+        self._last_sent: "OrderedDict[MessageKey, float]" = OrderedDict()
+
+    @staticmethod
+    def _key(message: types.Message) -> MessageKey:
+        return (message.chat.id, message.message_id)
+
+    def remember(self, message: types.Message, markup: types.InlineKeyboardMarkup) -> None:
+        """Запоминает клавиатуру, уже отправленную вместе с сообщением"""
+        key = self._key(message)
+        self._hashes[key] = markup_hash(markup)
+        self._mark_sent(key, time.monotonic())
+
+    def _mark_sent(self, key: MessageKey, sent_at: float) -> None:
+        """Время изменения сообщения; самые давние сообщения забываются сверх maxsize"""
+        self._last_sent[key] = sent_at
+        self._last_sent.move_to_end(key)
+        while len(self._last_sent) > self.maxsize:
+            expired, _ = self._last_sent.popitem(last=False)
+            self._hashes.pop(expired, None)
+
+    def submit(self, message: types.Message, render: Renderer) -> None:
+        """Запрос на обновление клавиатуры; render вызывается в момент отправки"""
+        key = self._key(message)
+        self._pending[key] = (message, render)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    def discard(self, message: types.Message) -> None:
+        """Отмена отложенного обновления (например, сообщение заменено другим текстом)"""
+        key = self._key(message)
+        self._pending.pop(key, None)
+        self._hashes.pop(key, None)
+        self._last_sent.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    async def _run(self, key: MessageKey) -> None:
+        try:
+            while key in self._pending:
+                delay = self._last_sent.get(key, 0) + self.interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                message, render = self._pending.pop(key)
+                await self._send(key, message, render)
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    async def _send(self, key: MessageKey, message: types.Message, render: Renderer) -> None:
+        try:
+            markup = await render()
+            digest = markup_hash(markup)
+            if digest == self._hashes.get(key):
+                return
+            await outbound.send(message.chat.id, lambda: message.edit_reply_markup(reply_markup=markup))
+            self._hashes[key] = digest
+        except MessageNotModified:
+            pass
+        except RetryAfter as e:
+            logger.warning(f"Ограничение частоты запросов, повтор через {e.timeout} с")
+            # Повторяем с последним состоянием, если за это время не пришло новое
+            self._pending.setdefault(key, (message, render))
+            self._mark_sent(key, time.monotonic() + e.timeout - self.interval)
+            return
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении клавиатуры: {e}")
+        self._mark_sent(key, time.monotonic())
+
+edit_coalescer = EditCoalescer(config.EDIT_DEBOUNCE_INTERVAL, config.EDIT_TRACKED_MESSAGES)
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+from utils.logger import logger
+
+HEADERS = ["Команда", "Баллы", "Причина", "Администратор", "Дата"]
+FORMATS = ("xlsx", "csv")
+
+# Пул процессов создается при первой выгрузке, модуль импортируется без лишних зависимостей
+_executor = None
+
+def _get_executor():
+    """Отдельный процесс для сборки файлов, чтобы не занимать цикл событий"""
+    global _executor
+    if _executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def write_export(spool_path: str, out_path: str, fmt: str) -> int:
+    """
+    Выполняется в рабочем процессе: построчно читает промежуточный файл
+    и пишет xlsx (режим write-only openpyxl) или CSV. Возвращает число строк.
+    """
+    rows = 0
+    with open(spool_path, 'r', encoding='utf-8') as spool:
+        if fmt == "csv":
+            import csv
+            # utf-8-sig, чтобы Excel правильно открыл кириллицу
+            with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f, delimiter=';')
+                writer.writerow(HEADERS)
+                for line in spool:
+                    writer.writerow(json.loads(line))
+                    rows += 1
+        else:
+            from openpyxl import Workbook
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('История баллов')
+            sheet.append(HEADERS)
+            for line in spool:
+                sheet.append(json.loads(line))
+                rows += 1
+            workbook.save(out_path)
+    return rows
+
+async def export_points_history(
+    storage,
+    fmt: str = "xlsx",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    team_ids: Optional[List[str]] = None,
+    chunk_size: int = 500
+) -> Optional[str]:
+    """
+    Выгрузка истории начислений во временный файл.
+    Записи читаются из хранилища порциями и сразу дописываются в
+    промежуточный файл, файл выгрузки собирается в отдельном процессе.
+    Возвращает путь к файлу или None, если записей нет.
+    """
+    teams = {team['id']: team['name'] for team in await storage.get_all_teams()}
+    loop = asyncio.get_running_loop()
+    spool_fd, spool_path = tempfile.mkstemp(prefix="export_", suffix=".jsonl")
+    out_fd, out_path = tempfile.mkstemp(prefix="points_history_", suffix=f".{fmt}")
+    os.close(out_fd)
+    rows = 0
+    try:
+        with os.fdopen(spool_fd, 'w', encoding='utf-8') as spool:
+            async for chunk in storage.iter_points_history(team_ids=team_ids, since=since, until=until, chunk_size=chunk_size):
+                admins = await storage.get_users_by_ids(record['admin_id'] for record in chunk)
+                lines = []
+                for record in chunk:
+                    admin = admins.get(record['admin_id'])
+                    lines.append(json.dumps([
+                        teams.get(record['team_id'], record['team_id']),
+                        record['points'],
+                        record['reason'],
+                        admin['username'] if admin else "Неизвестный",
+                        datetime.fromisoformat(record['timestamp']).strftime("%d.%m.%Y %H:%M")
+                    ], ensure_ascii=False) + "\n")
+                await loop.run_in_executor(None, spool.writelines, lines)
+                rows += len(lines)
+
+        if rows == 0:
+            os.remove(out_path)
+            return None
+        await loop.run_in_executor(_get_executor(), write_export, spool_path, out_path, fmt)
+        logger.info(f"Выгрузка истории начислений: {rows} записей, {out_path}")
+        return out_path
+    except Exception:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    finally:
+        os.remove(spool_path)
+
+def shutdown_export() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
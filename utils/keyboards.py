@@ -21,7 +21,17 @@ def get_attendance_status_keyboard(user_id: int) -> InlineKeyboardMarkup:
     )
     return keyboard
 
-def get_attendance_panel_keyboard(users: list, marked: dict = None) -> InlineKeyboardMarkup:
+def get_attendance_panel_keyboard(
+    users: list,
+    marked: dict = None,
+    page: int = 0,
+    pages: int = 1,
+    team_name: str = None
+) -> InlineKeyboardMarkup:
+    """
+    Одна страница панели отметки: users - участники текущей страницы,
+    marked - отметки всех участников по строковому ID
+    """
     if marked is None:
         marked = {}
     
@@ -40,7 +50,7 @@ def get_attendance_panel_keyboard(users: list, marked: dict = None) -> InlineKey
     # Добавляем пользователей с кнопками статуса в одной строке
     for user in users:
         user_id = str(user['telegram_id'])
-        status = marked.get(int(user_id))
+        status = marked.get(user_id)
         
         # Создаем строку с именем и тремя кнопками статуса
         row = [
@@ -54,6 +64,20 @@ def get_attendance_panel_keyboard(users: list, marked: dict = None) -> InlineKey
     # Добавляем разделительную линию
     keyboard.row(InlineKeyboardButton("─" * 40, callback_data="divider"))
     
+    # Переключение страниц
+    if pages > 1:
+        keyboard.row(
+            InlineKeyboardButton("◀️", callback_data=f"att_page_{(page - 1) % pages}"),
+            InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="divider"),
+            InlineKeyboardButton("▶️", callback_data=f"att_page_{(page + 1) % pages}")
+        )
+    
+    # Фильтр по команде и отметка остальных
+    keyboard.row(
+        InlineKeyboardButton(f"👥 {team_name or 'Все участники'}", callback_data="att_team"),
+        InlineKeyboardButton("Остальные присутствуют ✅", callback_data="att_rest_present")
+    )
+    
     # Добавляем кнопки управления
     keyboard.row(
         InlineKeyboardButton("Завершить отметку ✅", callback_data="finish_attendance"),
@@ -152,4 +176,12 @@ def get_user_keyboard() -> InlineKeyboardMarkup:
     keyboard.add(
         InlineKeyboardButton("📊 Рейтинг команд", callback_data="show_teams_rating")
     )
-    return keyboard 
\ No newline at end of file
+    return keyboard
+
+def get_member_search_keyboard() -> InlineKeyboardMarkup:
+    """Кнопка поиска участника по началу имени в inline режиме"""
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    keyboard.add(
+        InlineKeyboardButton("🔍 Найти участника", switch_inline_query_current_chat="")
+    )
+    return keyboard
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Dict, Hashable, List, Optional
+from database import db
+from utils.message_builder import MessageBuilder
+
+class Leaderboard:
+    """
+    Рейтинг команд, общий для всех экранов.
+    Отсортированная таблица и готовые тексты хранятся в памяти и
+    пересобираются только после изменения версии данных в хранилище
+    (начисление баллов, изменение составов или имен участников).
+    """
+    def __init__(self, storage) -> None:
+        self._storage = storage
+        self._version: Optional[Hashable] = None
+        self._standings: List[dict] = []
+        self._texts: Dict[str, List[str]] = {}
+        self._lock = asyncio.Lock()
+
+    async def standings(self) -> List[dict]:
+        """Команды по убыванию баллов с именами участников"""
+        version = await self._storage.get_leaderboard_version()
+        if version == self._version:
+            return self._standings
+
+        async with self._lock:
+            # Пока ждали блокировку, таблицу мог пересобрать другой обработчик
+            version = await self._storage.get_leaderboard_version()
+            if version != self._version:
+                await self._rebuild(version)
+        return self._standings
+
+    async def _rebuild(self, version: Hashable) -> None:
+        teams = await self._storage.get_all_teams()
+        users = await self._storage.get_users_by_ids(
+            int(member_id) for team in teams for member_id in team['members']
+        )
+        teams_sorted = sorted(teams, key=lambda x: x['points'], reverse=True)
+        self._standings = [
+            {
+                "place": i,
+                "team": team,
+                "members": [users[int(m)]['username'] for m in team['members'] if int(m) in users]
+            }
+            for i, team in enumerate(teams_sorted, 1)
+        ]
+        self._texts = {}
+        self._version = version
+
+    async def render(self, title: str) -> List[str]:
+        """Текст рейтинга с заголовком title, разбитый на сообщения"""
+        standings = await self.standings()
+        chunks = self._texts.get(title)
+        if chunks is None:
+            builder = MessageBuilder().line(title).line()
+            for entry in standings:
+                # Добавляем эмодзи для топ-3
+                prefix = {1: "🥇", 2: "🥈", 3: "🥉"}.get(entry['place'], f"{entry['place']}.")
+                builder.line(f"{prefix} {entry['team']['name']}")
+                builder.line(f"└ {entry['team']['points']} баллов")
+                builder.line(f"👥 Участники: {', '.join(entry['members'])}").line()
+            chunks = self._texts[title] = builder.chunks()
+        return chunks
+
+leaderboard = Leaderboard(db)
@@ -5,7 +5,7 @@ from datetime import datetime
 # Настраиваем логирование
 def setup_logger():
     # Создаем директорию для логов если её нет
-    log_dir = 'logs'
+    log_dir = os.getenv('LOG_DIR', 'logs')
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
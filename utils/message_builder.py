@@ -0,0 +1,127 @@
+from typing import List, Optional, Union
+from aiogram import Bot, types
+from utils.outbound import outbound, INTERACTIVE
+
+# Ограничение Telegram на длину сообщения (в единицах UTF-16)
+MESSAGE_LIMIT = 4096
+
+def utf16_len(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Разбиение текста на части не длиннее limit по границам строк.
+    По возможности часть заканчивается на пустой строке, чтобы не
+    разрывать блоки вроде карточки участника. Строка длиннее limit
+    разрезается посимвольно.
+    """
+    chunks = []
+    lines: List[str] = []
+    sizes: List[int] = []
+    size = 0
+    paragraph_end = 0
+
+    def flush(cut: int) -> None:
+        nonlocal lines, sizes, size
+        chunk = "".join(lines[:cut]).rstrip("\n")
+        if chunk:
+            chunks.append(chunk)
+        lines, sizes = lines[cut:], sizes[cut:]
+        # Пустые строки в начале следующей части не нужны
+        while lines and not lines[0].strip():
+            lines.pop(0)
+            sizes.pop(0)
+        size = sum(sizes)
+
+    for line in text.splitlines(keepends=True):
+        length = utf16_len(line)
+        while length > limit:
+            # Суррогатные пары занимают две единицы UTF-16, поэтому берем с запасом
+            piece, line = line[:limit // 2], line[limit // 2:]
+            if lines:
+                flush(len(lines))
+                paragraph_end = 0
+            chunks.append(piece)
+            length = utf16_len(line)
+
+        if size + length > limit and lines:
+            flush(paragraph_end or len(lines))
+            paragraph_end = 0
+            # Хвост после пустой строки вместе с новой строкой тоже может не поместиться
+            if size + length > limit and lines:
+                flush(len(lines))
+        lines.append(line)
+        sizes.append(length)
+        size += length
+        if not line.strip():
+            paragraph_end = len(lines)
+
+    flush(len(lines))
+    return chunks or [text]
+
+class MessageBuilder:
+    """
+    Сборка длинного сообщения из фрагментов за линейное время.
+    Фрагменты накапливаются в списке и склеиваются один раз,
+    chunks() возвращает готовые к отправке части.
+    """
+    def __init__(self, limit: int = MESSAGE_LIMIT) -> None:
+        self.limit = limit
+        self._parts: List[str] = []
+
+    def add(self, *fragments: str) -> "MessageBuilder":
+        self._parts.extend(fragments)
+        return self
+
+    def line(self, text: str = "") -> "MessageBuilder":
+        self._parts.append(text)
+        self._parts.append("\n")
+        return self
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def chunks(self) -> List[str]:
+        return split_text(self.text(), self.limit)
+
+Chunks = Union[MessageBuilder, List[str]]
+
+def _as_chunks(chunks: Chunks) -> List[str]:
+    return chunks.chunks() if isinstance(chunks, MessageBuilder) else chunks
+
+async def send_chunks(
+    bot: Bot,
+    chat_id: Union[int, str],
+    chunks: Chunks,
+    reply_markup: Optional[types.InlineKeyboardMarkup] = None,
+    priority: int = INTERACTIVE,
+    wait: bool = True
+) -> None:
+    """Отправка частей сообщения по порядку; клавиатура прикрепляется к последней"""
+    chunks = _as_chunks(chunks)
+    for i, chunk in enumerate(chunks):
+        markup = reply_markup if i == len(chunks) - 1 else None
+        await outbound.send(
+            chat_id,
+            lambda chunk=chunk, markup=markup: bot.send_message(chat_id, chunk, reply_markup=markup),
+            priority=priority,
+            wait=wait
+        )
+
+async def edit_chunks(
+    message: types.Message,
+    chunks: Chunks,
+    reply_markup: Optional[types.InlineKeyboardMarkup] = None
+) -> None:
+    """
+    Замена текста сообщения первой частью, остальные части отправляются
+    следом новыми сообщениями; клавиатура прикрепляется к последней части
+    """
+    chunks = _as_chunks(chunks)
+    first_markup = reply_markup if len(chunks) == 1 else None
+    await outbound.send(
+        message.chat.id,
+        lambda: message.edit_text(chunks[0], reply_markup=first_markup)
+    )
+    if len(chunks) > 1:
+        await send_chunks(message.bot, message.chat.id, chunks[1:], reply_markup=reply_markup)
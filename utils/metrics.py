@@ -0,0 +1,203 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+from utils.logger import logger
+
+# Границы корзин гистограмм времени (секунды)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Описания метрик для формата Prometheus
+HELP = {
+    "bot_update_seconds": "Время обработки обновления с фильтрами",
+    "bot_handler_seconds": "Время работы хендлера",
+    "storage_seconds": "Время операции хранилища",
+    "storage_bytes_total": "Прочитано и записано байт файлов хранилища",
+    "storage_cache_hits_total": "Попадания в кэш хранилища",
+    "storage_cache_misses_total": "Промахи кэша хранилища",
+    "storage_cache_evictions_total": "Вытеснения из кэша хранилища",
+    "storage_cache_size": "Записей в кэше хранилища",
+    "outbound_requests_total": "Запросы к Bot API из очереди исходящих",
+    "outbound_queue_depth": "Запросов в очереди исходящих",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: счетчики, сумма и число наблюдений"""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+class Metrics:
+    """
+    Реестр метрик процесса: счетчики, гистограммы и функции, которые
+    отдают текущие значения (статистика кэша, очереди исходящих).
+    Счетчики байт обновляются и из потоков чтения файлов, поэтому под блокировкой.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, Dict[str, str], float]]]] = []
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector: Callable[[], List[Tuple[str, str, Dict[str, str], float]]]) -> None:
+        """collector возвращает список (имя, тип counter/gauge, метки, значение)"""
+        self._collectors.append(collector)
+
+    def histograms(self, name: str) -> Dict[Labels, Histogram]:
+        with self._lock:
+            return {labels: h for (metric, labels), h in self._histograms.items() if metric == name}
+
+    def counters(self, name: str) -> Dict[Labels, float]:
+        with self._lock:
+            return {labels: v for (metric, labels), v in self._counters.items() if metric == name}
+
+    def collect(self) -> List[Tuple[str, str, Dict[str, str], float]]:
+        samples = []
+        for collector in self._collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрик: {e}")
+        return samples
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus"""
+        lines: List[str] = []
+        typed = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            )
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{format_labels(labels)} {value:g}")
+        for (name, labels), counts, total, count in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name, kind, labels, value in sorted(self.collect(), key=lambda s: s[0]):
+            header(name, kind)
+            lines.append(f"{name}{format_labels(tuple(sorted(labels.items())))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+metrics = Metrics()
+
+def perf_report(top: int = 10) -> List[str]:
+    """Строки отчета для команды /perf: самые затратные хендлеры и операции хранилища"""
+    lines = []
+    for labels, h in sorted(metrics.histograms("bot_update_seconds").items()):
+        lines.append(
+            f"Обновления {dict(labels)['event']}: {h.count}, среднее {h.sum / h.count * 1000:.1f} мс, "
+            f"p95 {h.quantile(0.95) * 1000:.1f} мс"
+        )
+
+    for title, name, label in (("Хендлеры", "bot_handler_seconds", "handler"), ("Хранилище", "storage_seconds", None)):
+        histograms = metrics.histograms(name)
+        if not histograms:
+            continue
+        lines.append("")
+        lines.append(f"{title} (по суммарному времени):")
+        ranked = sorted(histograms.items(), key=lambda item: item[1].sum, reverse=True)[:top]
+        for labels, h in ranked:
+            values = dict(labels)
+            caption = values[label] if label else f"{values['op']} {values['collection']}"
+            lines.append(
+                f"└ {caption}: {h.count} раз, среднее {h.sum / h.count * 1000:.1f} мс, "
+                f"p95 {h.quantile(0.95) * 1000:.1f} мс"
+            )
+
+    transferred: Dict[str, float] = {}
+    for labels, value in metrics.counters("storage_bytes_total").items():
+        op = dict(labels)["op"]
+        transferred[op] = transferred.get(op, 0) + value
+    if transferred:
+        lines.append("")
+        lines.append("Файлы: " + ", ".join(f"{op} {value / 1024:.1f} КБ" for op, value in sorted(transferred.items())))
+
+    collected = metrics.collect()
+    cache = {name: value for name, _, labels, value in collected if name.startswith("storage_cache_")}
+    lookups = cache.get("storage_cache_hits_total", 0) + cache.get("storage_cache_misses_total", 0)
+    if lookups:
+        hits = cache["storage_cache_hits_total"]
+        lines.append(f"Кэш: попаданий {hits / lookups * 100:.1f}% ({hits:g} из {lookups:g})")
+    requests = {labels["result"]: value for name, _, labels, value in collected if name == "outbound_requests_total"}
+    if requests:
+        lines.append(
+            f"Исходящие: отправлено {requests['sent']:g}, повторов {requests['retries']:g}, "
+            f"ошибок {requests['failed']:g}"
+        )
+    return lines
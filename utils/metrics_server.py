@@ -0,0 +1,87 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Начало обработки текущего обновления: тип события, хендлер, время получения и запуска хендлера
+_current: ContextVar[Optional[list]] = ContextVar("metrics_current", default=None)
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Время обработки обновлений по типам событий (с фильтрами и чтением
+    состояния FSM) и отдельно время хендлера с меткой по имени его функции.
+    Отметки хранятся в контексте задачи, а не в data: data передается
+    хендлерам с **kwargs.
+    """
+    SKIP = ("update", "error")
+
+    async def trigger(self, action: str, args) -> None:
+        stage, _, event = action.partition("process_")
+        if event in self.SKIP:
+            return
+        now = time.perf_counter()
+        if stage == "pre_":
+            _current.set([event, None, now, None])
+        elif stage == "":
+            # Вызывается после прохождения фильтров, перед самим хендлером
+            current = _current.get()
+            if current is not None:
+                current[1] = getattr(current_handler.get(None), "__name__", "unknown")
+                current[3] = now
+        elif stage == "post_":
+            current = _current.get()
+            if current is None:
+                return
+            _current.set(None)
+            event, handler, received, started = current
+            metrics.observe("bot_update_seconds", now - received, event=event)
+            if started is not None:
+                metrics.observe("bot_handler_seconds", now - started, event=event, handler=handler)
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Локальный HTTP сервер с метриками в формате Prometheus: GET /metrics"""
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
+
+def storage_samples(storage) -> List[Tuple[str, str, Dict[str, str], float]]:
+    """Счетчики кэша хранилища (у SQLite кэша нет)"""
+    if not hasattr(storage, "cache_stats"):
+        return []
+    stats = storage.cache_stats()
+    return [
+        ("storage_cache_hits_total", "counter", {}, stats["hits"]),
+        ("storage_cache_misses_total", "counter", {}, stats["misses"]),
+        ("storage_cache_evictions_total", "counter", {}, stats["evictions"]),
+        ("storage_cache_size", "gauge", {}, stats["size"]),
+    ]
+
+def outbound_samples(queue) -> List[Tuple[str, str, Dict[str, str], float]]:
+    stats = queue.stats()
+    samples = [
+        ("outbound_requests_total", "counter", {"result": result}, stats[result])
+        for result in ("sent", "retries", "failed")
+    ]
+    samples.extend(
+        ("outbound_queue_depth", "gauge", {"lane": lane}, depth) for lane, depth in stats["depth"].items()
+    )
+    return samples
+
+def setup_metrics(dp) -> None:
+    """Замер хендлеров диспетчера и сбор статистики кэша и очереди исходящих"""
+    from database import db
+    from utils.outbound import outbound
+    dp.middleware.setup(MetricsMiddleware())
+    metrics.add_collector(lambda: storage_samples(db))
+    metrics.add_collector(lambda: outbound_samples(outbound))
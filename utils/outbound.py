@@ -0,0 +1,204 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+from aiogram import types
+from aiogram.utils.exceptions import RetryAfter
+from config import config
+from utils.logger import logger
+
+# Приоритеты: меньше - раньше
+INTERACTIVE = 0
+BROADCAST = 1
+LANES = {INTERACTIVE: "interactive", BROADCAST: "broadcast"}
+
+class TokenBucket:
+    """Ограничение частоты: rate запросов в секунду с запасом capacity"""
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class ChatLane:
+    """Очередь запросов одного чата и ее ограничение частоты"""
+    def __init__(self, rate: float) -> None:
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.bucket = TokenBucket(rate, 1)
+        self.blocked_until = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+class OutboundQueue:
+    """
+    Очередь исходящих запросов к Bot API.
+    У каждого чата своя очередь и свой лимит частоты, поэтому медленная
+    рассылка в общий чат не задерживает ответы в личных чатах; общий лимит
+    бота делится между всеми чатами. Внутри чата изменения интерфейса идут
+    раньше рассылок, а запросы одного приоритета - по порядку постановки.
+    При RetryAfter чат ставится на паузу и запрос повторяется.
+    """
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        group_rate: float,
+        max_retries: int = 5
+    ) -> None:
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._lanes: Dict[Union[int, str], ChatLane] = {}
+        self._seq = itertools.count()
+        self._depth = {lane: 0 for lane in LANES}
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def _lane(self, chat_id: Union[int, str]) -> ChatLane:
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            # Отрицательные ID - группы и каналы, для них лимит ниже
+            rate = self.group_rate if str(chat_id).startswith("-") else self.chat_rate
+            lane = self._lanes[chat_id] = ChatLane(rate)
+        return lane
+
+    async def send(
+        self,
+        chat_id: Union[int, str],
+        request: Callable[[], Awaitable[Any]],
+        priority: int = INTERACTIVE,
+        wait: bool = True
+    ) -> Any:
+        """
+        Постановка запроса в очередь чата. request - функция без аргументов,
+        создающая корутину запроса (например, lambda: bot.send_message(...)).
+        При wait=False результат не ожидается.
+        """
+        lane = self._lane(chat_id)
+        future = asyncio.get_running_loop().create_future()
+        self._depth[priority] += 1
+        lane.queue.put_nowait((priority, next(self._seq), request, future, 0))
+        if lane.task is None or lane.task.done():
+            lane.task = asyncio.create_task(self._drain(chat_id, lane))
+        if not wait:
+            return None
+        return await future
+
+    async def answer(self, message: types.Message, text: str, **kwargs) -> types.Message:
+        """message.answer через очередь чата сообщения"""
+        return await self.send(message.chat.id, lambda: message.answer(text, **kwargs))
+
+    async def edit_text(self, message: types.Message, text: str, **kwargs) -> Any:
+        """message.edit_text через очередь чата сообщения"""
+        return await self.send(message.chat.id, lambda: message.edit_text(text, **kwargs))
+
+    async def edit_reply_markup(self, message: types.Message, **kwargs) -> Any:
+        """message.edit_reply_markup через очередь чата сообщения"""
+        return await self.send(message.chat.id, lambda: message.edit_reply_markup(**kwargs))
+
+    async def _drain(self, chat_id: Union[int, str], lane: ChatLane) -> None:
+        """Отправка запросов чата, пока его очередь не опустеет"""
+        while not lane.queue.empty():
+            priority, seq, request, future, attempt = lane.queue.get_nowait()
+            if future.cancelled():
+                # Ожидавший результат отменен (например, отложенное изменение клавиатуры):
+                # такой запрос не расходует лимит частоты
+                self._depth[priority] -= 1
+                continue
+            delay = lane.blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await lane.bucket.acquire()
+            await self._global.acquire()
+            self._depth[priority] -= 1
+            if future.cancelled():
+                # Отменен, пока ждал лимита: токены возвращаются
+                lane.bucket.tokens += 1
+                self._global.tokens += 1
+                continue
+            try:
+                result = await request()
+            except RetryAfter as e:
+                lane.blocked_until = time.monotonic() + e.timeout
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    logger.warning(f"Ограничение Bot API для чата {chat_id}, повтор через {e.timeout} с")
+                    # Прежний порядковый номер сохраняет порядок запросов чата
+                    self._depth[priority] += 1
+                    lane.queue.put_nowait((priority, seq, request, future, attempt + 1))
+                else:
+                    self._fail(future, e)
+                continue
+            except Exception as e:
+                self._fail(future, e)
+                continue
+
+            self.sent += 1
+            if not future.done():
+                future.set_result(result)
+
+        # Очередь чата опустела: очередь удаляется, когда истекут пауза и интервал лимита,
+        # иначе словарь рос бы с каждым чатом, которому бот когда-либо писал
+        delay = max(lane.blocked_until - time.monotonic(), 1 / lane.bucket.rate)
+        asyncio.get_running_loop().call_later(delay, self._forget, chat_id, lane)
+
+    def _forget(self, chat_id: Union[int, str], lane: ChatLane) -> None:
+        """Удаление очереди чата, если в нее ничего не поставили за время ожидания"""
+        if self._lanes.get(chat_id) is not lane or not lane.queue.empty():
+            return
+        if lane.task is not None and not lane.task.done():
+            return
+        delay = lane.blocked_until - time.monotonic()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._forget, chat_id, lane)
+            return
+        del self._lanes[chat_id]
+
+    def split(self, workers: int) -> None:
+        """Общий лимит бота и лимит групп делятся между workers процессами"""
+        rate = self._global.rate / workers
+        self._global = TokenBucket(rate, max(rate, 1))
+        self.group_rate /= workers
+
+    def _fail(self, future: asyncio.Future, error: Exception) -> None:
+        self.failed += 1
+        logger.error(f"Ошибка отправки запроса к Bot API: {error}")
+        if not future.done():
+            future.set_exception(error)
+            # Никто не ждет результат (wait=False) - не выводим предупреждение asyncio
+            future.exception()
+
+    def stats(self) -> dict:
+        """Глубина очередей по приоритетам и счетчики запросов"""
+        return {
+            "depth": {name: self._depth[lane] for lane, name in LANES.items()},
+            "chats": sum(1 for lane in self._lanes.values() if not lane.queue.empty()),
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed
+        }
+
+    async def close(self) -> None:
+        """Дожидается отправки поставленных запросов"""
+        tasks = [lane.task for lane in self._lanes.values() if lane.task is not None]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+outbound = OutboundQueue(
+    global_rate=config.OUTBOUND_GLOBAL_RATE,
+    chat_rate=config.OUTBOUND_CHAT_RATE,
+    group_rate=config.OUTBOUND_GROUP_RATE
+)
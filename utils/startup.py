@@ -0,0 +1,52 @@
+import sys
+import time
+from typing import List, Tuple
+from config import config
+from utils.logger import logger
+
+class StartupTimer:
+    """Замер этапов запуска бота: импорт, регистрация хендлеров, хранилище, первый опрос"""
+    def __init__(self, started: float = None) -> None:
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        """Завершение этапа phase: длительность считается от предыдущей отметки"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def report(self) -> bool:
+        """Пишет отчет в лог, возвращает False, если запуск не уложился в бюджет"""
+        phases = ", ".join(f"{phase} {duration:.3f} с" for phase, duration in self.phases)
+        logger.info(f"Запуск: {phases}, всего {self.total:.3f} с")
+        if config.STARTUP_BUDGET and self.total > config.STARTUP_BUDGET:
+            logger.warning(f"Запуск занял {self.total:.3f} с, бюджет {config.STARTUP_BUDGET} с")
+            return False
+        return True
+
+def check_cold_start() -> int:
+    """
+    Проверка бюджета холодного запуска без подключения к Telegram:
+    python -m utils.startup (запускать в новом процессе, код возврата 1 при превышении)
+    """
+    timer = StartupTimer()
+    from aiogram import Bot
+    from aiogram.contrib.fsm_storage.memory import MemoryStorage
+    from utils.workers import create_dispatcher
+    timer.mark("импорт")
+
+    # Диспетчер собирается так же, как при запуске бота (хендлеры импортируются здесь же).
+    # Токен нужен только для создания объекта бота, запросы не отправляются;
+    # состояния в памяти, чтобы проверка не создавала файлов
+    create_dispatcher(Bot(token=config.BOT_TOKEN or "123456:startup-check"), MemoryStorage())
+    timer.mark("регистрация хендлеров")
+    return 0 if timer.report() else 1
+
+if __name__ == '__main__':
+    sys.exit(check_cold_start())
@@ -0,0 +1,181 @@
+import asyncio
+import hmac
+import json
+import sys
+from typing import Callable, Dict, List, Optional, Set
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+from config import config
+from utils.logger import logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def update_chat_id(data: dict) -> int:
+    """ID чата обновления (для запросов без чата - ID пользователя)"""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post", "my_chat_member", "chat_member"):
+        if key in data:
+            return data[key]["chat"]["id"]
+    callback_query = data.get("callback_query")
+    if callback_query is not None:
+        message = callback_query.get("message")
+        return message["chat"]["id"] if message else callback_query["from"]["id"]
+    for key in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query"):
+        if key in data:
+            return data[key]["from"]["id"]
+    if "poll_answer" in data:
+        return data["poll_answer"]["user"]["id"]
+    return 0
+
+class UpdateProcessor:
+    """
+    Обработка обновлений в отдельных задачах с ограничением их числа.
+    Обновления одного чата обрабатываются по очереди в порядке поступления,
+    разные чаты - параллельно.
+    """
+    def __init__(self, dp: Dispatcher, max_concurrency: int) -> None:
+        self.dp = dp
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        # Блокировка чата и число его обновлений в обработке
+        self._chats: Dict[int, List] = {}
+
+    def submit(self, update: types.Update, chat_id: int) -> None:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = [asyncio.Lock(), 0]
+        chat[1] += 1
+        task = asyncio.create_task(self._process(update, chat_id, chat[0]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update: types.Update, chat_id: int, lock: asyncio.Lock) -> None:
+        Dispatcher.set_current(self.dp)
+        Bot.set_current(self.dp.bot)
+        try:
+            # Ожидающие блокировку получают ее в порядке постановки задач
+            async with lock, self._semaphore:
+                try:
+                    await self.dp.process_update(update)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+        finally:
+            chat = self._chats[chat_id]
+            chat[1] -= 1
+            if not chat[1]:
+                del self._chats[chat_id]
+
+    async def drain(self, timeout: float) -> None:
+        """Ожидание обработки принятых обновлений, не успевшие за timeout отменяются"""
+        if not self._tasks:
+            return
+        logger.info(f"Ожидание обработки {len(self._tasks)} обновлений...")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"Не дождались обработки {len(pending)} обновлений")
+            for task in pending:
+                task.cancel()
+
+class WebhookServer:
+    """
+    Прием обновлений через webhook за обратным прокси.
+    Запрос проверяется по секретному заголовку, обновление обрабатывается
+    в отдельной задаче, а Telegram сразу получает ответ 200, поэтому
+    медленный хендлер не задерживает доставку следующих обновлений.
+    Если задан route, обновления не обрабатываются, а передаются в него
+    (режим нескольких воркеров).
+    """
+    def __init__(
+        self,
+        dp: Optional[Dispatcher],
+        path: str,
+        secret: Optional[str],
+        max_concurrency: int,
+        route: Optional[Callable[[dict], None]] = None
+    ) -> None:
+        if not secret:
+            # Без секрета любой, кто достучится до порта, может прислать обновление от имени администратора
+            raise ValueError("Для режима webhook нужен WEBHOOK_SECRET")
+        self.path = path
+        self.secret = secret
+        self.route = route
+        self.processor = UpdateProcessor(dp, max_concurrency) if route is None else None
+        self._accepting = True
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        if not self._accepting:
+            # Telegram повторит доставку после перезапуска
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+            if self.route is not None:
+                self.route(data)
+            else:
+                self.processor.submit(types.Update(**data), update_chat_id(data))
+        except (ValueError, TypeError, KeyError):
+            return web.Response(status=400)
+        return web.Response(status=200)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self, host: str, port: int) -> None:
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook сервер слушает {host}:{port}{self.path}")
+
+    async def set_webhook(self, bot: Bot, url: str) -> None:
+        """Регистрация адреса в Telegram (secret_token передается напрямую, его нет в set_webhook aiogram 2.11)"""
+        await bot.request("setWebhook", {"url": url, "secret_token": self.secret})
+        logger.info(f"Webhook установлен: {url}")
+
+    async def drain(self, timeout: float) -> None:
+        """Перестает принимать обновления и дожидается обработки уже принятых"""
+        self._accepting = False
+        if self.processor is not None:
+            await self.processor.drain(timeout)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def run_webhook(
+    bot: Bot,
+    dp: Optional[Dispatcher],
+    stop: asyncio.Event,
+    on_started=None,
+    route: Optional[Callable[[dict], None]] = None
+) -> None:
+    """Запуск webhook сервера до сигнала stop с корректным завершением"""
+    server = WebhookServer(dp, config.WEBHOOK_PATH, config.WEBHOOK_SECRET, config.WEBHOOK_MAX_CONCURRENCY, route)
+    await server.start(config.WEBAPP_HOST, config.WEBAPP_PORT)
+    if config.WEBHOOK_URL:
+        await server.set_webhook(bot, config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH)
+    if on_started is not None:
+        on_started()
+    await stop.wait()
+    await server.drain(config.SHUTDOWN_DRAIN_TIMEOUT)
+
+async def replay(path: str, url: str) -> None:
+    """
+    Отправка записанных обновлений (по одному JSON на строку) на локальный сервер:
+    python -m utils.webhook updates.jsonl [http://127.0.0.1:8080/webhook]
+    """
+    import aiohttp
+    headers = {SECRET_HEADER: config.WEBHOOK_SECRET or ""}
+    async with aiohttp.ClientSession() as session:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                update = json.loads(line)
+                async with session.post(url, json=update, headers=headers) as response:
+                    print(f"{update.get('update_id')}: {response.status}")
+
+if __name__ == '__main__':
+    default_url = f"http://127.0.0.1:{config.WEBAPP_PORT}{config.WEBHOOK_PATH}"
+    asyncio.run(replay(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else default_url))
@@ -0,0 +1,168 @@
+import asyncio
+import multiprocessing
+import queue
+import signal
+from typing import List
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer
+from aiogram.dispatcher.storage import BaseStorage
+from config import config
+from utils.logger import logger
+from utils.error_handler import DatabaseError
+from utils.webhook import UpdateProcessor, update_chat_id
+
+def create_bot() -> Bot:
+    if config.TELEGRAM_API_URL:
+        # Например, локальный сервер Bot API или тестовая заглушка
+        return Bot(token=config.BOT_TOKEN, server=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    return Bot(token=config.BOT_TOKEN)
+
+def create_fsm_storage() -> BaseStorage:
+    if config.FSM_STORAGE == "memory":
+        from aiogram.contrib.fsm_storage.memory import MemoryStorage
+        return MemoryStorage()
+    from database.fsm_storage import SqliteFSMStorage
+    return SqliteFSMStorage(config.FSM_SQLITE_PATH, ttl=config.FSM_TTL)
+
+def create_dispatcher(bot: Bot, storage: BaseStorage) -> Dispatcher:
+    """Диспетчер с зарегистрированными хендлерами"""
+    from handlers import admin, common, rating, user
+    from utils.metrics_server import setup_metrics
+    dp = Dispatcher(bot, storage=storage)
+    setup_metrics(dp)
+    user.register_handlers(dp)
+    admin.register_handlers(dp)
+    rating.register_handlers(dp)
+    common.register_handlers(dp)
+    return dp
+
+def run_worker(index: int, count: int, updates: multiprocessing.Queue) -> None:
+    """Точка входа процесса-воркера"""
+    # Сигналы получает главный процесс, воркер останавливается по его команде
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, count, updates))
+
+async def _worker_main(index: int, count: int, updates: multiprocessing.Queue) -> None:
+    from database import init_db, close_db
+    from utils.outbound import outbound
+    from utils.export import shutdown_export
+    from utils.metrics_server import start_metrics_server
+
+    outbound.split(count)
+    bot = create_bot()
+    dp = create_dispatcher(bot, create_fsm_storage())
+    await init_db()
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT + index)
+    processor = UpdateProcessor(dp, config.WEBHOOK_MAX_CONCURRENCY)
+    logger.info(f"Воркер {index} запущен")
+
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            try:
+                data = await loop.run_in_executor(None, updates.get, True, 1)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.warning(f"Воркер {index}: главный процесс завершился")
+                    break
+                continue
+            if data is None:
+                break
+            processor.submit(types.Update(**data), update_chat_id(data))
+    finally:
+        await processor.drain(config.SHUTDOWN_DRAIN_TIMEOUT)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await outbound.close()
+        shutdown_export()
+        await dp.storage.close()
+        await close_db()
+        await bot.session.close()
+        logger.info(f"Воркер {index} остановлен")
+
+class WorkerPool:
+    """
+    Процессы-воркеры, между которыми распределяются обновления.
+    Обновления одного чата всегда попадают в один воркер, поэтому их порядок
+    и состояние FSM чата не делятся между процессами. Данные и состояния FSM
+    хранятся в общих базах SQLite.
+    """
+    def __init__(self, count: int) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.queues: List[multiprocessing.Queue] = [context.Queue() for _ in range(count)]
+        self.processes = [
+            context.Process(target=run_worker, args=(index, count, updates), name=f"worker-{index}")
+            for index, updates in enumerate(self.queues)
+        ]
+
+    def start(self) -> None:
+        for process in self.processes:
+            process.start()
+        logger.info(f"Запущено воркеров: {len(self.processes)}")
+
+    def route(self, data: dict) -> None:
+        self.queues[update_chat_id(data) % len(self.queues)].put(data)
+
+    async def stop(self, timeout: float) -> None:
+        """Воркеры дообрабатывают полученные обновления и завершаются"""
+        for updates in self.queues:
+            updates.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            # Ожидание с запасом на закрытие хранилища после дообработки
+            await loop.run_in_executor(None, process.join, timeout + 5)
+            if process.is_alive():
+                logger.warning(f"Воркер {process.name} не завершился, принудительная остановка")
+                process.terminate()
+
+async def poll_updates(bot: Bot, route, stop: asyncio.Event) -> None:
+    """Long polling в главном процессе с передачей обновлений воркерам"""
+    offset = None
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        while not stop.is_set():
+            request = asyncio.create_task(bot.get_updates(offset=offset, timeout=20))
+            await asyncio.wait({request, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if not request.done():
+                request.cancel()
+                break
+            try:
+                updates = request.result()
+            except Exception as e:
+                logger.error(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                route(update.to_python())
+                offset = update.update_id + 1
+    finally:
+        stopped.cancel()
+
+async def run_master(bot: Bot, stop: asyncio.Event, on_started=None) -> None:
+    """
+    Главный процесс режима нескольких воркеров: получает обновления
+    (polling или webhook) и распределяет их по воркерам по ID чата.
+    """
+    if config.STORAGE_BACKEND != "sqlite":
+        # JSON файлы рассчитаны на один процесс-владелец каталога data/
+        raise DatabaseError("Режим нескольких воркеров требует STORAGE_BACKEND=sqlite")
+    if config.FSM_STORAGE != "sqlite":
+        raise DatabaseError("Режим нескольких воркеров требует FSM_STORAGE=sqlite")
+
+    pool = WorkerPool(config.WORKERS)
+    pool.start()
+    try:
+        if config.BOT_MODE == "webhook":
+            from utils.webhook import run_webhook
+            await run_webhook(bot, None, stop, on_started, route=pool.route)
+        else:
+            await bot.delete_webhook()
+            if on_started is not None:
+                on_started()
+            await poll_updates(bot, pool.route, stop)
+    finally:
+        await pool.stop(config.SHUTDOWN_DRAIN_TIMEOUT)